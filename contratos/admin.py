@@ -20,9 +20,9 @@ class ContratoAdmin(admin.ModelAdmin):
         "convenio",
         "empresa",
         "valor_contratado",
-        "valor_atualizado",
-        "total_pago",
-        "saldo",
+        "col_valor_atualizado",
+        "col_total_pago",
+        "col_saldo",
         "status",
     )
     list_filter = ("status", "empresa")
@@ -35,3 +35,29 @@ class ContratoAdmin(admin.ModelAdmin):
         "convenio__numero_indicacao",
     )
     inlines = [AditivoInline]
+    # convenio/empresa no mesmo SELECT (__str__ de cada linha sem query extra)
+    list_select_related = ("convenio", "empresa")
+
+    def get_queryset(self, request):
+        # valor_atualizado / total_pago / saldo anotados (evita aggregate por linha)
+        return super().get_queryset(request).with_financials()
+
+    # colunas sobre as anotações de with_financials(): ordenáveis no banco
+
+    def col_valor_atualizado(self, obj: Contrato):
+        return obj.valor_atualizado
+
+    col_valor_atualizado.short_description = "Valor atualizado"
+    col_valor_atualizado.admin_order_field = "_valor_atualizado"
+
+    def col_total_pago(self, obj: Contrato):
+        return obj.total_pago
+
+    col_total_pago.short_description = "Total pago"
+    col_total_pago.admin_order_field = "_total_pago"
+
+    def col_saldo(self, obj: Contrato):
+        return obj.saldo
+
+    col_saldo.short_description = "Saldo"
+    col_saldo.admin_order_field = "_saldo"
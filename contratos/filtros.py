@@ -0,0 +1,69 @@
+"""
+Filtros da listagem de contratos por parâmetros de URL (contratos/lista.html).
+"""
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+
+from .models import Contrato
+
+FILTROS_CAMPOS = (
+    "convenio",
+    "empresa",
+    "status",
+    "data_ini",
+    "data_fim",
+    "q",
+)
+
+
+def filtros_dict(params) -> dict:
+    """Somente os filtros conhecidos e preenchidos (seguem nos links de paginação)."""
+    filtros = {}
+    for campo in FILTROS_CAMPOS:
+        valor = (params.get(campo) or "").strip()
+        if valor:
+            filtros[campo] = valor
+    return filtros
+
+
+def aplicar_filtros(params, qs):
+    """
+    Aplica os filtros no queryset de contratos:
+      - convenio: id do convênio (links do convênio/extrato) ou parte do número;
+      - empresa: razão social / nome fantasia (sem acento) ou início do CNPJ;
+      - status: código (ATIVO, ENCERRADO, RESCINDIDO);
+      - data_ini / data_fim: período de início do contrato (data_inicio);
+      - q: número do contrato ou do processo.
+    """
+    convenio = (params.get("convenio") or "").strip()
+    empresa = (params.get("empresa") or "").strip()
+    status = (params.get("status") or "").strip().upper()
+    data_ini = parse_date((params.get("data_ini") or "").strip())
+    data_fim = parse_date((params.get("data_fim") or "").strip())
+    termo = (params.get("q") or "").strip()
+
+    if convenio:
+        if convenio.isdigit():
+            qs = qs.filter(Q(convenio_id=int(convenio)) | Q(convenio__numero_convenio__busca=convenio))
+        else:
+            qs = qs.filter(convenio__numero_convenio__busca=convenio)
+
+    if empresa:
+        qs = qs.filter(
+            Q(empresa__razao_social__busca=empresa)
+            | Q(empresa__nome_fantasia__busca=empresa)
+            | Q(empresa__cnpj__startswith=empresa)
+        )
+
+    if status in Contrato.Status.values:
+        qs = qs.filter(status=status)
+
+    if data_ini:
+        qs = qs.filter(data_inicio__gte=data_ini)
+    if data_fim:
+        qs = qs.filter(data_inicio__lte=data_fim)
+
+    if termo:
+        qs = qs.filter(Q(numero_contrato__busca=termo) | Q(numero_processo__busca=termo))
+
+    return qs
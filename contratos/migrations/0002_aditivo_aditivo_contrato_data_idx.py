@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contratos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aditivo',
+            index=models.Index(fields=['contrato', 'data'], name='aditivo_contrato_data_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contratos', '0002_aditivo_aditivo_contrato_data_idx'),
+        ('convenios', '0007_exclusaojob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aditivo',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='contrato',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='aditivo',
+            index=models.Index(fields=['updated_at'], name='aditivo_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contrato',
+            index=models.Index(fields=['updated_at'], name='contrato_updated_idx'),
+        ),
+    ]
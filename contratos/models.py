@@ -1,5 +1,7 @@
 from django.db import models
-from django.db.models import Sum
+from django.db.models import F, OuterRef, Sum
+
+from core.db import MONEY, soma_subquery
 
 
 class Empresa(models.Model):
@@ -14,6 +16,31 @@ class Empresa(models.Model):
         return self.nome_fantasia or self.razao_social
 
 
+class ContratoQuerySet(models.QuerySet):
+    def with_financials(self):
+        """
+        Anota os totais financeiros de cada contrato em uma única query
+        (subqueries correlacionadas), evitando os aggregate() por objeto.
+        As properties (total_pago, acrescimos, ...) usam esses valores quando presentes.
+        """
+        from financeiro.models import Pagamento
+
+        aditivos = Aditivo.objects.filter(contrato=OuterRef("pk"))
+        return self.annotate(
+            _total_pago=soma_subquery(
+                Pagamento.objects.filter(contrato=OuterRef("pk")), "valor_pago", "contrato"
+            ),
+            _acrescimos=soma_subquery(aditivos, "valor_acrescimo", "contrato"),
+            _supressoes=soma_subquery(aditivos, "valor_supressao", "contrato"),
+        ).annotate(
+            _valor_atualizado=models.ExpressionWrapper(
+                F("valor_contratado") + F("_acrescimos") - F("_supressoes"), output_field=MONEY
+            ),
+        ).annotate(
+            _saldo=models.ExpressionWrapper(F("_valor_atualizado") - F("_total_pago"), output_field=MONEY),
+        )
+
+
 class Contrato(models.Model):
     convenio = models.ForeignKey("convenios.Convenio", on_delete=models.CASCADE, related_name="contratos")
     empresa = models.ForeignKey(Empresa, on_delete=models.PROTECT, related_name="contratos")
@@ -34,31 +61,50 @@ class Contrato(models.Model):
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.ATIVO)
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # modo incremental do check_consistencia (financeiro/consistencia.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ContratoQuerySet.as_manager()
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["updated_at"], name="contrato_updated_idx"),
+        ]
 
     def __str__(self):
         return f"{self.numero_contrato} - {self.empresa}"
 
+    # Properties: usam os valores anotados por with_financials() quando existirem
+
     @property
     def total_pago(self):
+        if hasattr(self, "_total_pago"):
+            return self._total_pago
         return self.pagamentos.aggregate(s=Sum("valor_pago"))["s"] or 0
 
     @property
     def acrescimos(self):
+        if hasattr(self, "_acrescimos"):
+            return self._acrescimos
         return self.aditivos.aggregate(s=Sum("valor_acrescimo"))["s"] or 0
 
     @property
     def supressoes(self):
+        if hasattr(self, "_supressoes"):
+            return self._supressoes
         return self.aditivos.aggregate(s=Sum("valor_supressao"))["s"] or 0
 
     @property
     def valor_atualizado(self):
+        if hasattr(self, "_valor_atualizado"):
+            return self._valor_atualizado
         return (self.valor_contratado or 0) + self.acrescimos - self.supressoes
 
     @property
     def saldo(self):
+        if hasattr(self, "_saldo"):
+            return self._saldo
         return self.valor_atualizado - self.total_pago
 
 
@@ -82,8 +128,15 @@ class Aditivo(models.Model):
 
     justificativa = models.TextField(blank=True, null=True)
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     class Meta:
         ordering = ["-data"]
+        indexes = [
+            # rollups por contrato (acréscimos/supressões) e listagem por data
+            models.Index(fields=["contrato", "data"], name="aditivo_contrato_data_idx"),
+            models.Index(fields=["updated_at"], name="aditivo_updated_idx"),
+        ]
 
     def __str__(self):
         return f"{self.numero_aditivo} ({self.get_tipo_display()})"
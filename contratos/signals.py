@@ -0,0 +1,60 @@
+"""
+Marca o contrato como alterado (updated_at) quando um aditivo é apagado: o modo
+incremental do check_consistencia (financeiro/consistencia.py) só enxerga linhas com
+updated_at recente, e o aditivo apagado já não está lá para ser encontrado.
+
+Como em convenios/signals.py, os contratos são acumulados na transação e marcados com
+um único UPDATE no commit. Apagar o próprio contrato (o coletor apaga os aditivos antes)
+tira o id da lista: nada a marcar.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Aditivo, Contrato
+
+_pendentes = threading.local()
+
+
+def _processar_pendentes():
+    ids = getattr(_pendentes, "contratos", set())
+    _pendentes.contratos, _pendentes.agendado = set(), False
+    if ids:
+        # update() direto: sem disparar os signals de Contrato (resumo, cubo)
+        Contrato.objects.filter(pk__in=ids).update(updated_at=timezone.now())
+
+
+def _pendentes_da_thread():
+    if not hasattr(_pendentes, "contratos"):
+        _pendentes.contratos, _pendentes.agendado = set(), False
+    return _pendentes.contratos
+
+
+def marcar_alterado(contrato_id):
+    _pendentes_da_thread().add(contrato_id)
+
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _processar_pendentes()
+        return
+
+    # após rollback o callback some da fila: agenda de novo
+    agendado = _pendentes.agendado and any(
+        func is _processar_pendentes for _, func, _ in connection.run_on_commit
+    )
+    if not agendado:
+        _pendentes.agendado = True
+        transaction.on_commit(_processar_pendentes)
+
+
+@receiver(post_delete, sender=Aditivo)
+def _aditivo_apagado(sender, instance, **kwargs):
+    marcar_alterado(instance.contrato_id)
+
+
+@receiver(post_delete, sender=Contrato)
+def _contrato_apagado(sender, instance, **kwargs):
+    _pendentes_da_thread().discard(instance.pk)
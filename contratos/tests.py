@@ -1,3 +1,230 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from convenios.models import Convenio
+from financeiro.models import Pagamento
+
+from .models import Aditivo, Contrato, Empresa
+
+
+class ContratoFinancialsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        empresa = Empresa.objects.create(cnpj="00.000.000/0001-00", razao_social="Empresa Teste")
+        convenio = Convenio.objects.create(
+            tipo=Convenio.Tipo.FEDERAL,
+            orgao_concedente="Ministério da Saúde",
+            objeto="Objeto",
+            vigencia_inicio=date(2025, 1, 1),
+            vigencia_fim=date(2026, 12, 31),
+        )
+        for n in range(4):
+            contrato = Contrato.objects.create(
+                convenio=convenio,
+                empresa=empresa,
+                numero_contrato=f"CT-{n}",
+                objeto_contratado="Obra",
+                valor_contratado=Decimal("1000.00"),
+                data_inicio=date(2025, 2, 1),
+            )
+            Aditivo.objects.create(
+                contrato=contrato,
+                tipo=Aditivo.Tipo.VALOR,
+                numero_aditivo="1",
+                data=date(2025, 3, 1),
+                valor_acrescimo=Decimal("200.00"),
+            )
+            Aditivo.objects.create(
+                contrato=contrato,
+                tipo=Aditivo.Tipo.SUPRESSAO,
+                numero_aditivo="2",
+                data=date(2025, 3, 2),
+                valor_supressao=Decimal("50.00"),
+            )
+            Pagamento.objects.create(contrato=contrato, data=date(2025, 4, 1), valor_pago=Decimal("400.00"))
+
+        Contrato.objects.create(
+            convenio=convenio,
+            empresa=empresa,
+            numero_contrato="CT-VAZIO",
+            objeto_contratado="Obra",
+            valor_contratado=Decimal("10.00"),
+            data_inicio=date(2025, 2, 1),
+        )
+
+    def test_with_financials_values(self):
+        c = Contrato.objects.with_financials().get(numero_contrato="CT-0")
+        self.assertEqual(c.total_pago, Decimal("400.00"))
+        self.assertEqual(c.acrescimos, Decimal("200.00"))
+        self.assertEqual(c.supressoes, Decimal("50.00"))
+        self.assertEqual(c.valor_atualizado, Decimal("1150.00"))
+        self.assertEqual(c.saldo, Decimal("750.00"))
+
+        vazio = Contrato.objects.with_financials().get(numero_contrato="CT-VAZIO")
+        self.assertEqual(vazio.total_pago, 0)
+        self.assertEqual(vazio.valor_atualizado, Decimal("10.00"))
+        self.assertEqual(vazio.saldo, Decimal("10.00"))
+
+    def test_with_financials_matches_properties(self):
+        anotados = {c.pk: c for c in Contrato.objects.with_financials()}
+        for c in Contrato.objects.all():
+            self.assertEqual(anotados[c.pk].valor_atualizado, c.valor_atualizado)
+            self.assertEqual(anotados[c.pk].saldo, c.saldo)
+
+    def test_with_financials_single_query(self):
+        with self.assertNumQueries(1):
+            for c in Contrato.objects.with_financials():
+                c.total_pago
+                c.acrescimos
+                c.supressoes
+                c.valor_atualizado
+                c.saldo
+
+
+class ContratoAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "senha")
+        cls.convenio = Convenio.objects.create(
+            tipo=Convenio.Tipo.FEDERAL,
+            orgao_concedente="Ministério da Saúde",
+            objeto="Objeto",
+            vigencia_inicio=date(2025, 1, 1),
+            vigencia_fim=date(2026, 12, 31),
+        )
+
+    def _criar(self, n):
+        inicio = Contrato.objects.count()
+        empresas = Empresa.objects.bulk_create(
+            Empresa(cnpj=f"{inicio + i:014d}", razao_social=f"Empresa {inicio + i}") for i in range(n)
+        )
+        contratos = Contrato.objects.bulk_create(
+            Contrato(
+                convenio=self.convenio, empresa=empresa, numero_contrato=f"CT-{empresa.pk}",
+                objeto_contratado="Obra", valor_contratado=Decimal("100.00"), data_inicio=date(2025, 1, 1),
+            )
+            for empresa in empresas
+        )
+        Pagamento.objects.bulk_create(
+            Pagamento(contrato=c, data=date(2025, 2, 1), valor_pago=Decimal("10.00")) for c in contratos
+        )
+        Aditivo.objects.bulk_create(
+            Aditivo(contrato=c, tipo=Aditivo.Tipo.VALOR, numero_aditivo="1", data=date(2025, 3, 1),
+                    valor_acrescimo=Decimal("5.00")) for c in contratos
+        )
+
+    def _queries(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_queries_constantes_por_pagina(self):
+        self.client.force_login(self.admin)
+        contratos = reverse("admin:contratos_contrato_changelist")
+        pagamentos = reverse("admin:financeiro_pagamento_changelist")
+        self._criar(10)
+        poucos = (self._queries(contratos), self._queries(pagamentos))
+        self._criar(90)
+        self.assertEqual((self._queries(contratos), self._queries(pagamentos)), poucos)
+
+    def test_ordena_por_colunas_anotadas(self):
+        self.client.force_login(self.admin)
+        self._criar(3)
+        Pagamento.objects.create(
+            contrato=Contrato.objects.order_by("pk").first(), data=date(2025, 5, 1), valor_pago=Decimal("50.00")
+        )
+        # "o" é a posição (1-based) em list_display: -6 = total pago decrescente
+        response = self.client.get(reverse("admin:contratos_contrato_changelist"), {"o": "-6"})
+        linhas = list(response.context["cl"].result_list)
+        self.assertEqual(linhas[0].total_pago, Decimal("60.00"))
+        self.assertEqual(linhas[0].saldo, Decimal("45.00"))
+
+
+class ContratoViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.empresa = Empresa.objects.create(cnpj="11.111.111/0001-11", razao_social="Construtora Alfa")
+        cls.outra = Empresa.objects.create(cnpj="22.222.222/0001-22", razao_social="Beta Serviços")
+        cls.convenio = Convenio.objects.create(
+            tipo=Convenio.Tipo.FEDERAL,
+            numero_convenio="777/2025",
+            orgao_concedente="Ministério da Saúde",
+            objeto="Objeto",
+            vigencia_inicio=date(2025, 1, 1),
+            vigencia_fim=date(2026, 12, 31),
+        )
+        cls.contrato = Contrato.objects.create(
+            convenio=cls.convenio, empresa=cls.empresa, numero_contrato="CT-ALFA",
+            objeto_contratado="Obra", valor_contratado=Decimal("1000.00"), data_inicio=date(2025, 2, 1),
+        )
+        Aditivo.objects.create(
+            contrato=cls.contrato, tipo=Aditivo.Tipo.VALOR, numero_aditivo="1", data=date(2025, 3, 1),
+            valor_acrescimo=Decimal("200.00"),
+        )
+        for mes in range(1, 6):
+            Pagamento.objects.create(contrato=cls.contrato, data=date(2025, mes, 10), valor_pago=Decimal("100.00"))
+        Contrato.objects.create(
+            convenio=cls.convenio, empresa=cls.outra, numero_contrato="CT-BETA", status=Contrato.Status.ENCERRADO,
+            objeto_contratado="Obra", valor_contratado=Decimal("50.00"), data_inicio=date(2025, 6, 1),
+        )
+
+    def _criar(self, n):
+        Contrato.objects.bulk_create(
+            Contrato(
+                convenio=self.convenio, empresa=self.empresa, numero_contrato=f"CT-LOTE-{Contrato.objects.count()}-{i}",
+                objeto_contratado="Obra", valor_contratado=Decimal("100.00"), data_inicio=date(2025, 1, 1),
+            )
+            for i in range(n)
+        )
+
+    def _numeros(self, **params):
+        response = self.client.get(reverse("contratos:list"), params)
+        return {c.numero_contrato for c in response.context["contratos"]}
+
+    def test_lista_uma_query_por_pagina(self):
+        url = reverse("contratos:list")
+        self._criar(10)
+        with CaptureQueriesContext(connection) as poucos:
+            self.client.get(url)
+        self._criar(90)
+        with CaptureQueriesContext(connection) as muitos:
+            response = self.client.get(url, {"tamanho": 100})
+        self.assertEqual(len(response.context["contratos"]), 100)
+        self.assertEqual(len(poucos.captured_queries), 1)
+        self.assertEqual(len(muitos.captured_queries), 1)
+
+    def test_lista_totais_e_filtros(self):
+        response = self.client.get(reverse("contratos:list"), {"q": "CT-ALFA"})
+        (contrato,) = response.context["contratos"]
+        self.assertEqual(contrato.valor_atualizado, Decimal("1200.00"))
+        self.assertEqual(contrato.saldo, Decimal("700.00"))
+        self.assertContains(response, reverse("contratos:detalhe", args=[self.contrato.pk]))
+
+        self.assertEqual(self._numeros(empresa="beta"), {"CT-BETA"})
+        self.assertEqual(self._numeros(empresa="11.111"), {"CT-ALFA"})
+        self.assertEqual(self._numeros(status=Contrato.Status.ENCERRADO), {"CT-BETA"})
+        self.assertEqual(self._numeros(convenio=self.convenio.pk), {"CT-ALFA", "CT-BETA"})
+        self.assertEqual(self._numeros(convenio="777"), {"CT-ALFA", "CT-BETA"})
+        self.assertEqual(self._numeros(data_ini="2025-03-01"), {"CT-BETA"})
+        self.assertEqual(self._numeros(data_fim="2025-03-01"), {"CT-ALFA"})
+
+    def test_detalhe_tres_queries(self):
+        url = reverse("contratos:detalhe", args=[self.contrato.pk])
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(len(ctx.captured_queries), 3)
+        ultimos = response.context["contrato"].ultimos_pagamentos
+        # mais recentes primeiro, com o acumulado de todo o histórico do contrato
+        self.assertEqual([p.acumulado for p in ultimos], [Decimal(v) for v in (500, 400, 300, 200, 100)])
+        self.assertEqual(ultimos[0].saldo_contrato, Decimal("700.00"))
+        self.assertContains(response, reverse("financeiro:extrato_contrato", args=[self.contrato.pk]))
 
-# Create your tests here.
+    def test_detalhe_inexistente(self):
+        self.assertEqual(self.client.get(reverse("contratos:detalhe", args=[999999])).status_code, 404)
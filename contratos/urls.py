@@ -4,6 +4,6 @@ from . import views
 app_name = "contratos"
 
 urlpatterns = [
-    # ajuste para sua view real (exemplo)
-    path("", views.contratos_home, name="home"),
+    path("", views.contratos_list, name="list"),
+    path("<int:pk>/", views.contrato_detalhe, name="detalhe"),
 ]
@@ -1,4 +1,78 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404, render
+from django.utils.http import urlencode
 
-def contratos_home(request):
-    return render(request, "contratos/home.html")
+from core.paginacao import paginar_keyset, tamanho_pagina
+from financeiro.models import Pagamento
+
+from .filtros import aplicar_filtros, filtros_dict
+from .models import Aditivo, Contrato
+
+# pagamentos mostrados no detalhe (o histórico completo fica no extrato do financeiro)
+ULTIMOS_PAGAMENTOS = 20
+
+
+def contratos_list(request):
+    """
+    Lista paginada por keyset em -id, com convênio/empresa no mesmo SELECT e os totais
+    (valor atualizado, pago, saldo) anotados: 1 query por página, qualquer que seja o tamanho.
+    """
+    qs = (
+        aplicar_filtros(request.GET, Contrato.objects.all())
+        .select_related("convenio", "empresa")
+        .only(
+            "id", "numero_contrato", "valor_contratado", "data_inicio", "data_fim", "status",
+            "convenio__id", "convenio__numero_convenio", "convenio__orgao_concedente",
+            "empresa__id", "empresa__razao_social", "empresa__nome_fantasia", "empresa__cnpj",
+        )
+        .with_financials()
+    )
+    tamanho = tamanho_pagina(request.GET, settings.CONVENIOS_PAGINA_TAMANHO, settings.CONVENIOS_PAGINA_MAX)
+    pagina = paginar_keyset(
+        qs,
+        ("-id",),
+        depois=request.GET.get("depois"),
+        antes=request.GET.get("antes"),
+        tamanho=tamanho,
+    )
+
+    base = filtros_dict(request.GET)
+    if "tamanho" in request.GET:
+        base["tamanho"] = tamanho
+
+    return render(
+        request,
+        "contratos/lista.html",
+        {
+            "contratos": pagina.itens,
+            "pagina": pagina,
+            "filtros": base,
+            "status_choices": Contrato.Status.choices,
+            "url_proximo": f"?{urlencode({**base, 'depois': pagina.proximo})}" if pagina.tem_proximo else "",
+            "url_anterior": f"?{urlencode({**base, 'antes': pagina.anterior})}" if pagina.tem_anterior else "",
+        },
+    )
+
+
+def contrato_detalhe(request, pk):
+    """
+    Contrato com convênio/empresa e totais anotados, aditivos e os últimos pagamentos
+    (com acumulado e saldo por janela) em Prefetch: 3 queries.
+    """
+    contrato = get_object_or_404(
+        Contrato.objects.select_related("convenio", "empresa")
+        .with_financials()
+        .prefetch_related(
+            Prefetch("aditivos", queryset=Aditivo.objects.order_by("data", "id")),
+            Prefetch(
+                "pagamentos",
+                # o recorte do Prefetch vira ROW_NUMBER() OVER (... ORDER BY <ordering>): ordena pelas
+                # colunas, não pelas anotações de janela (janela dentro de janela não existe em SQL)
+                queryset=Pagamento.objects.with_saldo_corrente().order_by("-data", "-id")[:ULTIMOS_PAGAMENTOS],
+                to_attr="ultimos_pagamentos",
+            ),
+        ),
+        pk=pk,
+    )
+    return render(request, "contratos/detalhe.html", {"contrato": contrato, "ultimos": ULTIMOS_PAGAMENTOS})
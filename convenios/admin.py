@@ -1,7 +1,42 @@
 from django.contrib import admin
+from django.core.cache import cache
 from django.utils.html import format_html
+
+from core.cache import dashboard_versao
+
+from .busca import filtro_busca
 from .models import Convenio
 
+# TTL (segundos) da lista de órgãos do filtro lateral; a chave também muda a cada save/delete de Convenio
+ORGAOS_CACHE_TTL = 3600
+
+
+class OrgaoConcedenteFilter(admin.SimpleListFilter):
+    """
+    Filtro por órgão concedente com a lista de órgãos (SELECT DISTINCT na tabela toda)
+    em cache, versionada como o dashboard (core/cache.py).
+    """
+
+    title = "órgão concedente"
+    parameter_name = "orgao_concedente"
+
+    def lookups(self, request, model_admin):
+        chave = f"admin:convenios:orgaos:{dashboard_versao()}"
+        orgaos = cache.get(chave)
+        if orgaos is None:
+            orgaos = list(
+                Convenio.objects.order_by("orgao_concedente")
+                .values_list("orgao_concedente", flat=True)
+                .distinct()
+            )
+            cache.set(chave, orgaos, ORGAOS_CACHE_TTL)
+        return [(orgao, orgao) for orgao in orgaos]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(orgao_concedente=self.value())
+        return queryset
+
 
 @admin.register(Convenio)
 class ConvenioAdmin(admin.ModelAdmin):
@@ -18,10 +53,10 @@ class ConvenioAdmin(admin.ModelAdmin):
         "valor_repasse",
         "valor_contrapartida",
         "valor_total",
-        "total_pago",
-        "saldo_financeiro",
+        "resumo_total_pago",
+        "resumo_saldo",
     )
-    list_filter = ("tipo", "status", "foi_licitado", "orgao_concedente")
+    list_filter = ("tipo", "status", "foi_licitado", OrgaoConcedenteFilter)
     search_fields = (
         "numero_convenio",
         "numero_proposta",
@@ -31,6 +66,32 @@ class ConvenioAdmin(admin.ModelAdmin):
         "objeto",
     )
     readonly_fields = ("created_at", "updated_at")
+    # totais financeiros vêm do ConvenioResumo (1 JOIN, sem aggregate por linha)
+    list_select_related = ("resumo",)
+
+    def get_search_results(self, request, queryset, search_term):
+        # um único OR sobre os índices trigram/full-text (ver convenios/busca.py),
+        # em vez do icontains por palavra x campo do admin; sem JOIN, não duplica linhas
+        search_term = (search_term or "").strip()
+        if not search_term:
+            return queryset, False
+        return queryset.filter(filtro_busca(search_term)), False
+
+    # sem fallback por linha: a migração 0003 popula os resumos dos convênios existentes e os
+    # signals os mantêm; só fica vazia por instantes, até o commit que cria o convênio
+    def resumo_total_pago(self, obj: Convenio):
+        resumo = getattr(obj, "resumo", None)
+        return resumo.total_pago if resumo else None
+
+    resumo_total_pago.short_description = "Total pago"
+    resumo_total_pago.admin_order_field = "resumo__total_pago"
+
+    def resumo_saldo(self, obj: Convenio):
+        resumo = getattr(obj, "resumo", None)
+        return resumo.saldo if resumo else None
+
+    resumo_saldo.short_description = "Saldo financeiro"
+    resumo_saldo.admin_order_field = "resumo__saldo"
 
     def badge_vigencia(self, obj: Convenio):
         d = obj.dias_para_vencer
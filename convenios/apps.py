@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class ConveniosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'convenios'
+
+    def ready(self):
+        from django.db.models import CharField, TextField
+
+        from . import signals  # noqa: F401
+        from .busca import BuscaContem
+
+        CharField.register_lookup(BuscaContem)
+        TextField.register_lookup(BuscaContem)
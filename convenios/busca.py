@@ -0,0 +1,58 @@
+"""
+Busca textual de convênios.
+
+PostgreSQL (migração 0005_convenio_busca):
+  - lookup `__busca` = substring sem acento/maiúsculas: f_unaccent(UPPER(campo)) LIKE ...,
+    servido pelos índices GIN pg_trgm criados sobre essa mesma expressão;
+  - `Convenio.busca` (SearchVectorField) com o `objeto` em full-text, configuração
+    portuguesa sem acentos (pt_unaccent), mantido por trigger no banco.
+
+Outros bancos (SQLite nos testes): `__busca` vira icontains e o objeto usa icontains.
+"""
+from django.contrib.postgres.search import SearchQuery
+from django.db import connection
+from django.db.models import Lookup, Q
+from django.db.models.lookups import IContains
+
+CONFIG_FTS = "public.pt_unaccent"
+
+# campos curtos buscados por substring (índice trigram no PostgreSQL)
+CAMPOS_SUBSTRING = (
+    "numero_convenio",
+    "numero_proposta",
+    "numero_indicacao",
+    "orgao_concedente",
+    "parlamentar_nome",
+)
+
+
+class BuscaContem(Lookup):
+    """campo__busca="termo": contém o termo, ignorando maiúsculas e (no PostgreSQL) acentos."""
+
+    lookup_name = "busca"
+    prepare_rhs = False
+
+    def as_sql(self, compiler, connection):
+        return compiler.compile(IContains(self.lhs, self.rhs))
+
+    def as_postgresql(self, compiler, connection):
+        lhs, lhs_params = compiler.compile(self.lhs)
+        padrao = f"%{connection.ops.prep_for_like_query(self.rhs)}%"
+        return (
+            f"public.f_unaccent(UPPER({lhs})) LIKE public.f_unaccent(UPPER(%s))",
+            (*lhs_params, padrao),
+        )
+
+
+def filtro_busca(termo) -> Q:
+    """Busca livre: números, órgão e parlamentar (substring) ou objeto (full-text)."""
+    termo = (termo or "").strip()
+    q = Q()
+    for campo in CAMPOS_SUBSTRING:
+        q |= Q(**{f"{campo}__busca": termo})
+
+    if connection.vendor == "postgresql":
+        q |= Q(busca=SearchQuery(termo, config=CONFIG_FTS, search_type="websearch"))
+    else:
+        q |= Q(objeto__icontains=termo)
+    return q
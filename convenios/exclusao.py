@@ -0,0 +1,224 @@
+"""
+Exclusão em massa de convênios em lotes.
+
+Cada lote (CONVENIOS_EXCLUSAO_LOTE ids) roda na sua própria transação, então nenhuma
+transação longa segura as tabelas e o progresso fica visível entre um lote e outro.
+
+Quando todas as relações que apontam para Convenio/Contrato são conhecidas e CASCADE,
+o lote é apagado com DELETEs diretos na ordem das FKs (pagamentos, aditivos, contratos,
+resumos, convênios), sem o coletor do Django carregar cada objeto em memória.
+Esses DELETEs não disparam signals: o ConvenioResumo entra na cascata, os meses do
+cubo dos relatórios são recalculados e o cache do dashboard é invalidado aqui. Se surgir uma relação não coberta, volta ao .delete() normal.
+
+Seleções grandes (> CONVENIOS_EXCLUSAO_SINCRONA_MAX) viram um ExclusaoJob, processado
+como os ReportJob (relatorios/jobs.py): thread no processo web ou `manage.py processar_exclusoes`.
+No modo thread, manter_fila() (ao enfileirar e ao consultar o status) devolve à fila os jobs
+interrompidos por um reinício, que retomam de `processados`.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, models, transaction
+from django.utils import timezone
+
+from contratos.models import Aditivo, Contrato
+from core.cache import invalidar_dashboard
+from financeiro.models import Pagamento
+from relatorios import cubo
+
+from .models import Convenio, ConvenioResumo, ExclusaoJob
+
+logger = logging.getLogger(__name__)
+
+# (model, filtro pelos ids de convênio) na ordem das FKs: filhos antes dos pais
+CASCATA = (
+    (Pagamento, "contrato__convenio_id__in"),
+    (Aditivo, "contrato__convenio_id__in"),
+    (Contrato, "convenio_id__in"),
+    (ConvenioResumo, "convenio_id__in"),
+    (Convenio, "pk__in"),
+)
+
+
+def cascata_segura() -> bool:
+    """True se CASCATA cobre toda relação (CASCADE) que aponta para os models apagados."""
+    cobertos = {model for model, _ in CASCATA}
+    for model in cobertos:
+        for rel in model._meta.related_objects:
+            if rel.related_model not in cobertos or rel.on_delete is not models.CASCADE:
+                return False
+    return True
+
+
+def _apagar_lote(ids) -> int:
+    with transaction.atomic():
+        if not cascata_segura():
+            # coletor do Django: signals disparam e mantêm resumo/dashboard
+            return Convenio.objects.filter(pk__in=ids).delete()[1].get(Convenio._meta.label, 0)
+
+        meses = list(Convenio.objects.filter(pk__in=ids).dates("vigencia_inicio", "month"))
+        apagados = 0
+        for model, filtro in CASCATA:
+            qs = model.objects.filter(**{filtro: ids})
+            linhas = qs._raw_delete(qs.db)
+            # conta só os convênios, em qualquer posição da cascata
+            if model is Convenio:
+                apagados = linhas
+        cubo.atualizar_meses(meses)
+        return apagados
+
+
+def apagar_convenios(ids, chunk_size=None, progresso=None) -> int:
+    """
+    Apaga os convênios (e contratos, aditivos, pagamentos e resumos) em lotes.
+    `progresso(processados, apagados)` é chamado após cada lote confirmado.
+    Retorna a quantidade de convênios apagados.
+    """
+    ids = sorted({int(i) for i in ids})
+    chunk_size = chunk_size or settings.CONVENIOS_EXCLUSAO_LOTE
+
+    apagados = 0
+    for inicio in range(0, len(ids), chunk_size):
+        lote = ids[inicio:inicio + chunk_size]
+        apagados += _apagar_lote(lote)
+        invalidar_dashboard()
+        if progresso is not None:
+            progresso(inicio + len(lote), apagados)
+    return apagados
+
+
+# =========================
+# Segundo plano (ExclusaoJob)
+# =========================
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# modo thread: intervalo mínimo entre manutenções da fila em cada processo
+MANUTENCAO_SEGUNDOS = 60
+_ultima_manutencao = None
+_manutencao_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="exclusao")
+        return _executor
+
+
+def enfileirar(ids, user=None) -> ExclusaoJob:
+    ids = sorted({int(i) for i in ids})
+    job = ExclusaoJob.objects.create(
+        ids=ids,
+        total=len(ids),
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+    if settings.CONVENIOS_EXCLUSAO_EXECUTOR == "thread":
+        transaction.on_commit(lambda: _get_executor().submit(_processar_em_thread, job.pk))
+        manter_fila()
+    return job
+
+
+def manter_fila():
+    """Modo thread: agenda manutencao() no executor, no máximo 1x por MANUTENCAO_SEGUNDOS por processo."""
+    global _ultima_manutencao
+    if settings.CONVENIOS_EXCLUSAO_EXECUTOR != "thread":
+        return
+    agora = time.monotonic()
+    with _manutencao_lock:
+        if _ultima_manutencao is not None and agora - _ultima_manutencao < MANUTENCAO_SEGUNDOS:
+            return
+        _ultima_manutencao = agora
+    _get_executor().submit(_manutencao_em_thread)
+
+
+def manutencao() -> int:
+    """Devolve os travados à fila e envia ao executor os pendentes. Retorna os enviados."""
+    recuperar_travados()
+    ids = list(
+        ExclusaoJob.objects.filter(status=ExclusaoJob.Status.PENDENTE)
+        .order_by("created_at", "pk")
+        .values_list("pk", flat=True)
+    )
+    for job_id in ids:
+        _get_executor().submit(_processar_em_thread, job_id)
+    return len(ids)
+
+
+def _manutencao_em_thread():
+    try:
+        manutencao()
+    except Exception:
+        logger.exception("Falha na manutenção da fila de exclusões")
+    finally:
+        close_old_connections()
+
+
+def _processar_em_thread(job_id):
+    try:
+        processar(job_id)
+    finally:
+        close_old_connections()
+
+
+def reservar(job_id) -> bool:
+    return bool(
+        ExclusaoJob.objects.filter(pk=job_id, status=ExclusaoJob.Status.PENDENTE).update(
+            status=ExclusaoJob.Status.PROCESSANDO, iniciado_em=timezone.now()
+        )
+    )
+
+
+def processar(job_id) -> bool:
+    """
+    Apaga os ids do job a partir de onde parou (`processados`), registrando o progresso
+    a cada lote. Retorna False se outro worker já o pegou.
+    """
+    if not reservar(job_id):
+        return False
+
+    job = ExclusaoJob.objects.get(pk=job_id)
+    ja_feitos, ja_apagados = job.processados, job.apagados
+
+    def progresso(processados, apagados):
+        ExclusaoJob.objects.filter(pk=job_id).update(
+            processados=ja_feitos + processados, apagados=ja_apagados + apagados
+        )
+
+    try:
+        apagar_convenios(job.ids[ja_feitos:], progresso=progresso)
+    except Exception as e:
+        logger.exception("Falha na exclusão em massa #%s", job_id)
+        ExclusaoJob.objects.filter(pk=job_id).update(
+            status=ExclusaoJob.Status.ERRO, erro=str(e), concluido_em=timezone.now()
+        )
+        return True
+
+    ExclusaoJob.objects.filter(pk=job_id).update(
+        status=ExclusaoJob.Status.CONCLUIDO, concluido_em=timezone.now()
+    )
+    return True
+
+
+def processar_pendentes(limite=None) -> int:
+    recuperar_travados()
+    processados = 0
+    ids = ExclusaoJob.objects.filter(status=ExclusaoJob.Status.PENDENTE).order_by("created_at", "pk")
+    for job_id in ids.values_list("pk", flat=True)[:limite]:
+        if processar(job_id):
+            processados += 1
+    return processados
+
+
+def recuperar_travados() -> int:
+    """Devolve para a fila jobs em PROCESSANDO há muito tempo; retomam de `processados`."""
+    limite = timezone.now() - timedelta(minutes=settings.CONVENIOS_EXCLUSAO_TIMEOUT_MINUTOS)
+    return ExclusaoJob.objects.filter(status=ExclusaoJob.Status.PROCESSANDO, iniciado_em__lt=limite).update(
+        status=ExclusaoJob.Status.PENDENTE, iniciado_em=None
+    )
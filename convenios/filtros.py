@@ -0,0 +1,130 @@
+"""
+Filtros de convênios por parâmetros de URL/formulário.
+
+Compartilhados pelos relatórios (tela, JSON, PDF, CSV, jobs) e pela listagem de convênios.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .busca import filtro_busca
+from .models import Convenio
+
+
+# Parâmetros de filtro aceitos (mesmos names dos formulários de relatorios/home.html e convenios/lista.html)
+FILTROS_CAMPOS = (
+    "data_ini",
+    "data_fim",
+    "status",
+    "orgao",
+    "tipo",
+    "modalidade",
+    "parlamentar",
+    "repasse_recebido",
+    "q",
+)
+
+
+def filtros_dict(params) -> dict:
+    """Somente os filtros conhecidos e preenchidos (para guardar em jobs, chaves de cache...)."""
+    filtros = {}
+    for campo in FILTROS_CAMPOS:
+        valor = (params.get(campo) or "").strip()
+        if valor:
+            filtros[campo] = valor
+    return filtros
+
+
+def aplicar_filtros(params, qs):
+    """
+    Aplica filtros (request.GET ou dict equivalente) no queryset de convênios.
+    Compatível com DateField ou DateTimeField.
+    Suporta filtro especial de "status":
+      - OK / Vencendo / Vencidos  -> baseado em vigencia_fim
+    E filtro por:
+      - repasse_recebido (1/0)
+      - parlamentar (texto)
+      - q (busca livre em números, órgão, parlamentar e objeto)
+    Os filtros de texto usam o lookup __busca (sem acento, índice trigram no PostgreSQL).
+    """
+    data_ini = parse_date((params.get("data_ini") or "").strip())
+    data_fim = parse_date((params.get("data_fim") or "").strip())
+
+    status = (params.get("status") or "").strip()
+    orgao = (params.get("orgao") or "").strip()  # input name="orgao"
+    tipo = (params.get("tipo") or "").strip()
+    modalidade = (params.get("modalidade") or "").strip()
+
+    # ✅ parlamentar (input name="parlamentar")
+    parlamentar = (params.get("parlamentar") or "").strip()
+
+    # ✅ repasse_recebido (select name="repasse_recebido")
+    repasse_recebido = (params.get("repasse_recebido") or "").strip()
+
+    termo = (params.get("q") or "").strip()
+
+    ini_is_dt = Convenio._meta.get_field("vigencia_inicio").get_internal_type() == "DateTimeField"
+    fim_is_dt = Convenio._meta.get_field("vigencia_fim").get_internal_type() == "DateTimeField"
+
+    # Datas (mantendo NULL também, se a coluna aceitar NULL; o "OR IS NULL" impede o uso do índice)
+    if data_ini:
+        if ini_is_dt:
+            data_ini = timezone.make_aware(datetime.combine(data_ini, time.min))
+        cond = Q(vigencia_inicio__gte=data_ini)
+        if Convenio._meta.get_field("vigencia_inicio").null:
+            cond |= Q(vigencia_inicio__isnull=True)
+        qs = qs.filter(cond)
+
+    if data_fim:
+        if fim_is_dt:
+            data_fim = timezone.make_aware(datetime.combine(data_fim, time.max))
+        cond = Q(vigencia_fim__lte=data_fim)
+        if Convenio._meta.get_field("vigencia_fim").null:
+            cond |= Q(vigencia_fim__isnull=True)
+        qs = qs.filter(cond)
+
+    # Status especial ou status do banco
+    if status:
+        hoje = timezone.localdate()
+        st = status.upper()
+        if st == "VENCIDOS":
+            qs = qs.filter(vigencia_fim__lt=hoje)
+        elif st == "VENCENDO":
+            qs = qs.filter(vigencia_fim__gte=hoje, vigencia_fim__lte=hoje + timedelta(days=30))
+        elif st == "OK":
+            qs = qs.filter(vigencia_fim__gt=hoje + timedelta(days=30))
+        elif st in Convenio.Status.values:
+            # código exato (índice); equivale ao iexact, já que os códigos são maiúsculos
+            qs = qs.filter(status=st)
+        else:
+            qs = qs.filter(status__iexact=status)
+
+    if orgao:
+        qs = qs.filter(orgao_concedente__busca=orgao)
+
+    if tipo:
+        if tipo.upper() in Convenio.Tipo.values:
+            qs = qs.filter(tipo=tipo.upper())
+        else:
+            qs = qs.filter(tipo__icontains=tipo)
+
+    if modalidade:
+        qs = qs.filter(modalidade__busca=modalidade)
+
+    if parlamentar:
+        qs = qs.filter(parlamentar_nome__busca=parlamentar)
+
+    if termo:
+        qs = qs.filter(filtro_busca(termo))
+
+    if repasse_recebido == "1":
+        qs = qs.filter(repasse_recebido=True)
+    elif repasse_recebido == "0":
+        qs = qs.filter(repasse_recebido=False)
+
+    # DISTINCT só é necessário se algum filtro fizer JOIN (linhas duplicadas)
+    if len(qs.query.alias_map) > 1:
+        qs = qs.distinct()
+    return qs
@@ -33,3 +33,22 @@ class ConvenioForm(forms.ModelForm):
             # ✅ checkbox com bootstrap
             "repasse_recebido": forms.CheckboxInput(attrs={"class": "form-check-input"}),
         }
+
+
+class ImportacaoForm(forms.Form):
+    TIPOS = [
+        ("convenios", "Convênios"),
+        ("contratos", "Contratos"),
+        ("pagamentos", "Pagamentos"),
+    ]
+
+    tipo = forms.ChoiceField(choices=TIPOS, widget=forms.Select(attrs={"class": "form-select"}))
+    arquivo = forms.FileField(
+        help_text="CSV (separador ; ou ,) ou XLSX, com cabeçalho na primeira linha.",
+        widget=forms.ClearableFileInput(attrs={"class": "form-control", "accept": ".csv,.xlsx"}),
+    )
+    dry_run = forms.BooleanField(
+        label="Só validar (não grava nada)",
+        required=False,
+        widget=forms.CheckboxInput(attrs={"class": "form-check-input"}),
+    )
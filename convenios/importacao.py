@@ -0,0 +1,581 @@
+"""
+Importação em massa de convênios, contratos e pagamentos a partir de CSV/XLSX
+(ex.: exportações do Transferegov/SICONV).
+
+- A planilha é lida em streaming (csv.reader / openpyxl read_only), nunca inteira em memória.
+- Cada linha é convertida e validada pelos próprios campos do model (Field.clean);
+  as consultas ao banco (chaves existentes, convênio/contrato/empresa de referência)
+  são feitas uma vez por lote.
+- Gravação por lote com bulk_create/bulk_update, cada lote commitado na sua própria
+  transação: um lote rejeitado pelo banco vira erro nas suas linhas e a importação
+  continua; os lotes já gravados permanecem se a importação parar no meio.
+- Upsert: convênio por numero_convenio, contrato por (convênio, numero_contrato).
+  Pagamentos são sempre inseridos.
+- Empresa (contratos) resolvida pelo CNPJ só com dígitos, num mapa em memória
+  carregado uma vez; CNPJ novo com razão social cria a empresa.
+
+bulk_create/bulk_update não disparam signals: ao fim de cada lote o ConvenioResumo
+dos convênios afetados e os meses afetados do cubo dos relatórios (relatorios/cubo.py)
+são recalculados e o cache do dashboard é invalidado no commit do lote.
+"""
+import contextlib
+import csv
+import functools
+import io
+import itertools
+import re
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, models, transaction
+from django.utils import timezone
+
+from contratos.models import Contrato, Empresa
+from core.cache import invalidar_dashboard
+from financeiro.models import Pagamento
+from relatorios import cubo
+
+from .models import Convenio, ConvenioResumo
+
+# erros guardados para o relatório (os demais só entram na contagem)
+MAX_ERROS_GUARDADOS = 10000
+
+
+class ImportacaoErro(Exception):
+    """Problema que impede a importação do arquivo inteiro (formato, colunas obrigatórias...)."""
+
+
+def normalizar_nome(texto) -> str:
+    """'Nº do Convênio' -> 'n_do_convenio' (sem acento, minúsculo, separado por _)."""
+    texto = unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "_", texto.lower()).strip("_")
+
+
+def so_digitos(texto) -> str:
+    return re.sub(r"\D", "", str(texto or ""))
+
+
+def formatar_cnpj(digitos) -> str:
+    return f"{digitos[:2]}.{digitos[2:5]}.{digitos[5:8]}/{digitos[8:12]}-{digitos[12:]}"
+
+
+# =========================
+# Leitura (streaming)
+# =========================
+
+def _abrir_binario(arquivo):
+    if isinstance(arquivo, (str, Path)):
+        return open(arquivo, "rb")
+    if hasattr(arquivo, "seek"):
+        arquivo.seek(0)
+    return arquivo
+
+
+def ler_csv(arquivo, encoding="utf-8-sig"):
+    """Linhas do CSV (listas de str). Separador detectado na 1ª linha: ';', ',' ou tab."""
+    binario = _abrir_binario(arquivo)
+    texto = io.TextIOWrapper(binario, encoding=encoding, newline="")
+    try:
+        primeira = texto.readline()
+        separador = max((";", ",", "\t"), key=primeira.count)
+        yield from csv.reader(itertools.chain([primeira], texto), delimiter=separador)
+    except UnicodeDecodeError as exc:
+        raise ImportacaoErro(f"Arquivo não está em {encoding}; informe a codificação correta.") from exc
+    finally:
+        if binario is arquivo:
+            texto.detach()  # arquivo do chamador (ex.: upload) continua aberto
+        else:
+            texto.close()
+
+
+def ler_xlsx(arquivo):
+    """Linhas da primeira planilha do XLSX (valores já tipados pelo openpyxl)."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError as exc:
+        raise ImportacaoErro("Importação de XLSX requer o pacote openpyxl.") from exc
+
+    if not isinstance(arquivo, (str, Path)):
+        arquivo = _abrir_binario(arquivo)
+    wb = load_workbook(arquivo, read_only=True, data_only=True)
+    try:
+        yield from wb.worksheets[0].iter_rows(values_only=True)
+    finally:
+        wb.close()
+
+
+def ler_linhas(arquivo, nome=None, encoding="utf-8-sig"):
+    nome = str(nome or getattr(arquivo, "name", None) or arquivo)
+    extensao = Path(nome).suffix.lower()
+    if extensao == ".csv":
+        return ler_csv(arquivo, encoding)
+    if extensao in (".xlsx", ".xlsm"):
+        return ler_xlsx(arquivo)
+    raise ImportacaoErro(f"Formato não suportado: {extensao or nome} (use .csv ou .xlsx).")
+
+
+# =========================
+# Conversão de valores
+# =========================
+
+def _vazio(valor) -> bool:
+    return valor is None or (isinstance(valor, str) and not valor.strip())
+
+
+def _texto(valor) -> str:
+    if isinstance(valor, float) and valor.is_integer():
+        # números lidos do XLSX em colunas de texto (ex.: nº do convênio)
+        return str(int(valor))
+    return str(valor).strip()
+
+
+def _decimal(valor, casas=2):
+    if isinstance(valor, float):
+        # células numéricas do XLSX: arredonda para as casas do campo
+        return round(Decimal(str(valor)), casas)
+    if isinstance(valor, (int, Decimal)):
+        return Decimal(valor)
+    texto = str(valor).strip().replace("R$", "").replace(" ", "")
+    if "," in texto:
+        # formato brasileiro: 1.234.567,89
+        texto = texto.replace(".", "").replace(",", ".")
+    try:
+        return Decimal(texto)
+    except InvalidOperation:
+        raise ValidationError(f"Valor numérico inválido: {valor}")
+
+
+def _data(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = str(valor).strip()
+    for formato in ("%d/%m/%Y", "%Y-%m-%d", "%d/%m/%y", "%d-%m-%Y", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ValidationError(f"Data inválida: {valor}")
+
+
+VERDADEIROS = {"1", "s", "sim", "true", "t", "x", "y", "yes"}
+FALSOS = {"0", "n", "nao", "false", "f", "no"}
+
+
+def _booleano(valor):
+    if isinstance(valor, bool):
+        return valor
+    texto = normalizar_nome(valor)
+    if texto in VERDADEIROS:
+        return True
+    if texto in FALSOS:
+        return False
+    raise ValidationError(f"Valor sim/não inválido: {valor}")
+
+
+@functools.cache
+def _mapa_escolhas(campo):
+    mapa = {}
+    for codigo, rotulo in campo.choices:
+        mapa[normalizar_nome(rotulo)] = codigo
+        mapa[normalizar_nome(codigo)] = codigo
+    return mapa
+
+
+def _escolha(campo, valor):
+    """Aceita o código ou o rótulo da choice, sem diferenciar maiúsculas/acentos."""
+    codigo = _mapa_escolhas(campo).get(normalizar_nome(valor))
+    if codigo is None:
+        raise ValidationError(f"Opção inválida para {campo.verbose_name}: {valor}")
+    return codigo
+
+
+def converter(campo, valor):
+    """Valor bruto da planilha -> valor Python validado pelo campo do model."""
+    if _vazio(valor):
+        if campo.has_default():
+            return campo.get_default()
+        valor = None if campo.null else ""
+    elif campo.choices:
+        valor = _escolha(campo, valor)
+    elif isinstance(campo, models.DecimalField):
+        valor = _decimal(valor, campo.decimal_places)
+    elif isinstance(campo, models.DateField):
+        valor = _data(valor)
+    elif isinstance(campo, models.BooleanField):
+        valor = _booleano(valor)
+    else:
+        valor = _texto(valor)
+    return campo.clean(valor, None)
+
+
+# =========================
+# Importadores
+# =========================
+
+@dataclass
+class Resultado:
+    linhas: int = 0
+    criados: int = 0
+    atualizados: int = 0
+    qtd_erros: int = 0
+    erros: list = field(default_factory=list)  # (linha, coluna, mensagem)
+    segundos: float = 0.0
+
+    def erro(self, linha, coluna, mensagem):
+        self.qtd_erros += 1
+        if len(self.erros) < MAX_ERROS_GUARDADOS:
+            self.erros.append((linha, coluna, mensagem))
+
+    @property
+    def linhas_por_segundo(self) -> float:
+        return self.linhas / self.segundos if self.segundos else 0.0
+
+
+class Importador:
+    model = None
+    # campos do model aceitos na planilha e obrigatórios no cabeçalho
+    campos = ()
+    obrigatorios = ()
+    # colunas auxiliares (não são campos do model), ex.: CNPJ da empresa
+    extras = ()
+    # cabeçalhos alternativos (normalizados) -> nome do campo
+    apelidos = {}
+
+    def __init__(self, resultado):
+        self.resultado = resultado
+        self.convenios_afetados = set()
+        # meses de vigencia_inicio (antes e depois) dos convênios gravados, para o cubo
+        self.meses_afetados = set()
+
+    def mapear_cabecalho(self, cabecalho):
+        """Índice da coluna -> nome do campo; colunas desconhecidas são ignoradas."""
+        conhecidos = set(self.campos) | set(self.extras)
+        mapa = {}
+        for i, nome in enumerate(cabecalho):
+            nome = normalizar_nome(nome)
+            nome = self.apelidos.get(nome, nome)
+            if nome in conhecidos and nome not in mapa.values():
+                mapa[i] = nome
+        faltando = [c for c in self.obrigatorios if c not in mapa.values()]
+        if faltando:
+            raise ImportacaoErro(f"Coluna(s) obrigatória(s) ausente(s): {', '.join(faltando)}")
+        self.colunas = [c for c in mapa.values() if c in self.campos]
+        return mapa
+
+    def validar(self, numero, bruto):
+        """Dict de valores convertidos, ou None (erros registrados no resultado)."""
+        dados, ok = {}, True
+        for nome, valor in bruto.items():
+            if nome in self.extras:
+                dados[nome] = "" if _vazio(valor) else _texto(valor)
+                continue
+            try:
+                dados[nome] = converter(self.model._meta.get_field(nome), valor)
+            except ValidationError as exc:
+                self.resultado.erro(numero, nome, "; ".join(exc.messages))
+                ok = False
+        return dados if ok else None
+
+    def gravar(self, lote):
+        """Grava o lote [(linha, dados)] (chamado dentro de um savepoint)."""
+        raise NotImplementedError
+
+    def _upsert(self, novos, existentes):
+        if novos:
+            self.model.objects.bulk_create(novos)
+        if existentes:
+            # INSERT ... ON CONFLICT (pk) DO UPDATE: um comando por lote, em vez do
+            # UPDATE com CASE WHEN por linha x coluna do bulk_update (lento com lotes grandes)
+            self.model.objects.bulk_create(
+                existentes,
+                update_conflicts=True,
+                unique_fields=[self.model._meta.pk.name],
+                update_fields=self.colunas_update(),
+            )
+        self.resultado.criados += len(novos)
+        self.resultado.atualizados += len(existentes)
+
+    def colunas_update(self):
+        return self.colunas
+
+
+class ImportadorConvenios(Importador):
+    model = Convenio
+    campos = (
+        "tipo", "numero_indicacao", "numero_proposta", "numero_convenio", "parlamentar_nome",
+        "orgao_concedente", "objeto", "valor_repasse", "valor_contrapartida", "vigencia_inicio",
+        "vigencia_fim", "repasse_recebido", "foi_licitado", "modalidade",
+        "numero_processo_licitatorio", "status", "observacoes",
+    )
+    obrigatorios = ("tipo", "orgao_concedente", "objeto", "vigencia_inicio", "vigencia_fim")
+    apelidos = {
+        # nomes usuais das exportações do Transferegov/SICONV
+        "nr_convenio": "numero_convenio",
+        "n_convenio": "numero_convenio",
+        "no_convenio": "numero_convenio",
+        "no_do_convenio": "numero_convenio",
+        "numero_do_convenio": "numero_convenio",
+        "nr_proposta": "numero_proposta",
+        "id_proposta": "numero_proposta",
+        "nr_emenda": "numero_indicacao",
+        "numero_emenda": "numero_indicacao",
+        "nome_parlamentar": "parlamentar_nome",
+        "parlamentar": "parlamentar_nome",
+        "desc_orgao": "orgao_concedente",
+        "orgao": "orgao_concedente",
+        "objeto_proposta": "objeto",
+        "vl_repasse_conv": "valor_repasse",
+        "vl_repasse": "valor_repasse",
+        "vl_contrapartida_conv": "valor_contrapartida",
+        "vl_contrapartida": "valor_contrapartida",
+        "dia_inic_vigenc_conv": "vigencia_inicio",
+        "dia_fim_vigenc_conv": "vigencia_fim",
+        "sit_convenio": "status",
+        "situacao": "status",
+    }
+
+    def colunas_update(self):
+        return [*self.colunas, "updated_at"]
+
+    def gravar(self, lote):
+        # mesma chave repetida no lote: vale a última linha
+        por_numero, sem_numero = {}, []
+        for numero, dados in lote:
+            if dados.get("numero_convenio"):
+                por_numero[dados["numero_convenio"]] = dados
+            else:
+                sem_numero.append(dados)
+
+        # duplicados já no banco: atualiza o mais antigo
+        no_banco = list(
+            Convenio.objects.filter(numero_convenio__in=list(por_numero))
+            .order_by("-pk")
+            .values_list("numero_convenio", "pk", "vigencia_inicio")
+        )
+        existentes_ids = {numero: pk for numero, pk, _ in no_banco}
+        self.meses_afetados.update(inicio for _, _, inicio in no_banco)
+        self.meses_afetados.update(dados.get("vigencia_inicio") for dados in [*sem_numero, *por_numero.values()])
+
+        agora = timezone.now()
+        novos = [Convenio(**dados) for dados in sem_numero]
+        existentes = []
+        for chave, dados in por_numero.items():
+            if chave in existentes_ids:
+                existentes.append(Convenio(pk=existentes_ids[chave], updated_at=agora, **dados))
+            else:
+                novos.append(Convenio(**dados))
+
+        self._upsert(novos, existentes)
+        self.convenios_afetados.update(c.pk for c in novos + existentes)
+
+
+class ImportadorContratos(Importador):
+    model = Contrato
+    campos = (
+        "numero_contrato", "numero_processo", "objeto_contratado", "valor_contratado",
+        "data_inicio", "data_fim", "status",
+    )
+    obrigatorios = ("numero_convenio", "cnpj", "numero_contrato", "objeto_contratado",
+                    "valor_contratado", "data_inicio")
+    extras = ("numero_convenio", "cnpj", "razao_social", "nome_fantasia")
+    apelidos = {
+        "nr_convenio": "numero_convenio",
+        "nr_contrato": "numero_contrato",
+        "cnpj_fornecedor": "cnpj",
+        "cnpj_empresa": "cnpj",
+        "fornecedor": "razao_social",
+        "empresa": "razao_social",
+        "objeto": "objeto_contratado",
+        "valor": "valor_contratado",
+        "vl_contrato": "valor_contratado",
+    }
+
+    def __init__(self, resultado):
+        super().__init__(resultado)
+        # mapa em memória: CNPJ só com dígitos -> id da empresa (carregado uma vez)
+        self.empresas = {
+            so_digitos(cnpj): pk for pk, cnpj in Empresa.objects.values_list("pk", "cnpj").iterator()
+        }
+
+    def _resolver_empresas(self, lote):
+        novas = {}
+        for numero, dados in lote:
+            cnpj = so_digitos(dados["cnpj"])
+            if cnpj in self.empresas or cnpj in novas:
+                continue
+            if len(cnpj) == 14 and dados.get("razao_social"):
+                novas[cnpj] = Empresa(
+                    cnpj=formatar_cnpj(cnpj),
+                    razao_social=dados["razao_social"],
+                    nome_fantasia=dados.get("nome_fantasia") or None,
+                )
+        if novas:
+            Empresa.objects.bulk_create(novas.values(), ignore_conflicts=True)
+            # ids das recém-criadas (ignore_conflicts não devolve pk)
+            for pk, cnpj in Empresa.objects.filter(
+                cnpj__in=[e.cnpj for e in novas.values()]
+            ).values_list("pk", "cnpj"):
+                self.empresas[so_digitos(cnpj)] = pk
+
+    def gravar(self, lote):
+        convenios = dict(
+            Convenio.objects.filter(numero_convenio__in={d["numero_convenio"] for _, d in lote})
+            .order_by("-pk")
+            .values_list("numero_convenio", "pk")
+        )
+        self._resolver_empresas(lote)
+
+        por_chave = {}
+        for numero, dados in lote:
+            convenio_id = convenios.get(dados["numero_convenio"])
+            empresa_id = self.empresas.get(so_digitos(dados["cnpj"]))
+            if convenio_id is None:
+                self.resultado.erro(numero, "numero_convenio", f"Convênio não encontrado: {dados['numero_convenio']}")
+            elif empresa_id is None:
+                self.resultado.erro(numero, "cnpj", f"Empresa não cadastrada (informe a razão social): {dados['cnpj']}")
+            else:
+                valores = {c: dados[c] for c in self.colunas}
+                por_chave[(convenio_id, dados["numero_contrato"])] = dict(
+                    valores, convenio_id=convenio_id, empresa_id=empresa_id
+                )
+
+        existentes_ids = {
+            (convenio_id, numero_contrato): pk
+            for pk, convenio_id, numero_contrato in Contrato.objects.filter(
+                convenio_id__in={c for c, _ in por_chave},
+                numero_contrato__in={n for _, n in por_chave},
+            ).order_by("-pk").values_list("pk", "convenio_id", "numero_contrato")
+        }
+
+        novos, existentes = [], []
+        for chave, valores in por_chave.items():
+            if chave in existentes_ids:
+                existentes.append(Contrato(pk=existentes_ids[chave], **valores))
+            else:
+                novos.append(Contrato(**valores))
+
+        self._upsert(novos, existentes)
+        self.convenios_afetados.update(convenio_id for convenio_id, _ in por_chave)
+
+    def colunas_update(self):
+        return [*self.colunas, "empresa", "updated_at"]
+
+
+class ImportadorPagamentos(Importador):
+    model = Pagamento
+    campos = ("data", "valor_pago", "numero_empenho", "numero_ob", "numero_nf", "observacao")
+    obrigatorios = ("numero_convenio", "numero_contrato", "data", "valor_pago")
+    extras = ("numero_convenio", "numero_contrato")
+    apelidos = {
+        "nr_convenio": "numero_convenio",
+        "nr_contrato": "numero_contrato",
+        "data_pagamento": "data",
+        "dt_pagamento": "data",
+        "valor": "valor_pago",
+        "vl_pago": "valor_pago",
+        "nr_empenho": "numero_empenho",
+        "nr_ob": "numero_ob",
+        "ordem_bancaria": "numero_ob",
+        "nr_nf": "numero_nf",
+        "nota_fiscal": "numero_nf",
+    }
+
+    def gravar(self, lote):
+        contratos = {
+            (numero_convenio, numero_contrato): (pk, convenio_id)
+            for pk, convenio_id, numero_convenio, numero_contrato in Contrato.objects.filter(
+                convenio__numero_convenio__in={d["numero_convenio"] for _, d in lote},
+                numero_contrato__in={d["numero_contrato"] for _, d in lote},
+            ).order_by("-pk").values_list("pk", "convenio_id", "convenio__numero_convenio", "numero_contrato")
+        }
+
+        novos = []
+        for numero, dados in lote:
+            contrato = contratos.get((dados["numero_convenio"], dados["numero_contrato"]))
+            if contrato is None:
+                self.resultado.erro(
+                    numero,
+                    "numero_contrato",
+                    f"Contrato {dados['numero_contrato']} não encontrado no convênio {dados['numero_convenio']}",
+                )
+                continue
+            novos.append(Pagamento(contrato_id=contrato[0], **{c: dados[c] for c in self.colunas}))
+            self.convenios_afetados.add(contrato[1])
+
+        self._upsert(novos, [])
+
+
+IMPORTADORES = {
+    "convenios": ImportadorConvenios,
+    "contratos": ImportadorContratos,
+    "pagamentos": ImportadorPagamentos,
+}
+
+
+def importar(arquivo, tipo="convenios", nome=None, chunk_size=1000, encoding="utf-8-sig", dry_run=False):
+    """
+    Importa o arquivo (caminho ou arquivo binário aberto, ex.: upload) e devolve o Resultado.
+    Cada lote de chunk_size linhas é commitado separadamente.
+    dry_run: valida e grava tudo numa transação que é desfeita no fim (contagens reais, nada persiste).
+    """
+    if tipo not in IMPORTADORES:
+        raise ImportacaoErro(f"Tipo de importação desconhecido: {tipo}")
+
+    resultado = Resultado()
+    inicio = time.perf_counter()
+    linhas = iter(ler_linhas(arquivo, nome, encoding))
+
+    # cada lote é commitado na sua própria transação: nenhum lock fica preso até o fim do
+    # arquivo. Só o dry_run envolve tudo numa transação externa, desfeita no fim.
+    with transaction.atomic() if dry_run else contextlib.nullcontext():
+        importador = IMPORTADORES[tipo](resultado)
+        mapa = importador.mapear_cabecalho(next(linhas, None) or [])
+
+        def gravar(lote):
+            try:
+                with transaction.atomic():
+                    importador.gravar(lote)
+                    ConvenioResumo.atualizar(importador.convenios_afetados)
+                    cubo.atualizar_meses(importador.meses_afetados)
+                    transaction.on_commit(invalidar_dashboard)
+            except DatabaseError as exc:
+                for numero, _ in lote:
+                    resultado.erro(numero, "", f"Lote rejeitado pelo banco: {exc}")
+            importador.convenios_afetados.clear()
+            importador.meses_afetados.clear()
+
+        lote = []
+        for numero, linha in enumerate(linhas, start=2):
+            bruto = {nome: linha[i] for i, nome in mapa.items() if i < len(linha)}
+            if all(_vazio(v) for v in bruto.values()):
+                continue
+            resultado.linhas += 1
+            dados = importador.validar(numero, bruto)
+            if dados is not None:
+                lote.append((numero, dados))
+            if len(lote) >= chunk_size:
+                gravar(lote)
+                lote = []
+        if lote:
+            gravar(lote)
+
+        if dry_run:
+            transaction.set_rollback(True)
+
+    resultado.segundos = time.perf_counter() - inicio
+    return resultado
+
+
+def escrever_erros_csv(resultado, destino):
+    """Relatório de erros por linha (mesmo padrão do CSV dos relatórios: ';' e BOM)."""
+    destino.write("\ufeff")
+    writer = csv.writer(destino, delimiter=";")
+    writer.writerow(["linha", "coluna", "erro"])
+    writer.writerows(resultado.erros)
@@ -0,0 +1,67 @@
+import io
+import json
+import random
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from convenios.importacao import importar
+from convenios.models import Convenio
+
+CABECALHO = [
+    "tipo", "numero_convenio", "orgao_concedente", "parlamentar_nome", "objeto",
+    "valor_repasse", "valor_contrapartida", "vigencia_inicio", "vigencia_fim", "status",
+]
+
+
+def gerar_csv(n, seed):
+    """CSV sintético no formato das exportações (';', datas dd/mm/aaaa, valores 1.234,56)."""
+    rnd = random.Random(seed)
+    orgaos = ["Ministério da Saúde", "Ministério da Educação", "Secretaria de Obras"]
+    linhas = [";".join(CABECALHO)]
+    for i in range(n):
+        inicio = date(2024, 1, 1) + timedelta(days=rnd.randint(0, 700))
+        linhas.append(";".join([
+            rnd.choice(Convenio.Tipo.values),
+            f"BENCH-{i}",
+            rnd.choice(orgaos),
+            f"Parlamentar {rnd.randint(1, 50)}",
+            "Objeto sintético",
+            f"{rnd.randint(10_000, 5_000_000):,}".replace(",", ".") + ",00",
+            f"{rnd.randint(0, 500_000)},50",
+            inicio.strftime("%d/%m/%Y"),
+            (inicio + timedelta(days=rnd.randint(90, 1200))).strftime("%d/%m/%Y"),
+            rnd.choice(Convenio.Status.labels),
+        ]))
+    return "\n".join(linhas).encode("utf-8")
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark do import_convenios: importa um CSV sintético duas vezes "
+        "(inserção e upsert) numa transação desfeita no fim e mede linhas/s."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--linhas", type=int, default=20000, help="Linhas do CSV sintético (padrão: 20000)")
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        dados = gerar_csv(options["linhas"], options["seed"])
+        resultado = {"linhas": options["linhas"], "chunk_size": options["chunk_size"]}
+
+        with transaction.atomic():
+            for etapa in ("insercao", "upsert"):
+                r = importar(io.BytesIO(dados), nome="bench.csv", chunk_size=options["chunk_size"])
+                resultado[etapa] = {
+                    "criados": r.criados,
+                    "atualizados": r.atualizados,
+                    "erros": r.qtd_erros,
+                    "segundos": round(r.segundos, 3),
+                    "linhas_por_segundo": round(r.linhas_por_segundo),
+                }
+            transaction.set_rollback(True)
+
+        self.stdout.write(json.dumps(resultado, indent=2, ensure_ascii=False))
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from convenios.importacao import IMPORTADORES, ImportacaoErro, escrever_erros_csv, importar
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa convênios, contratos ou pagamentos de um CSV/XLSX (leitura em streaming, "
+        "gravação em lote com upsert). Erros por linha podem ser salvos em CSV."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo", help="Caminho do .csv ou .xlsx")
+        parser.add_argument("--tipo", choices=sorted(IMPORTADORES), default="convenios")
+        parser.add_argument("--chunk-size", type=int, default=1000, help="Linhas por lote (padrão: 1000)")
+        parser.add_argument("--encoding", default="utf-8-sig", help="Codificação do CSV (padrão: utf-8-sig)")
+        parser.add_argument("--dry-run", action="store_true", help="Valida e desfaz tudo no fim")
+        parser.add_argument("--erros", help="Grava o relatório de erros por linha neste CSV")
+
+    def handle(self, *args, **options):
+        try:
+            resultado = importar(
+                options["arquivo"],
+                tipo=options["tipo"],
+                chunk_size=options["chunk_size"],
+                encoding=options["encoding"],
+                dry_run=options["dry_run"],
+            )
+        except (ImportacaoErro, OSError) as exc:
+            raise CommandError(str(exc))
+
+        if options["erros"]:
+            with open(options["erros"], "w", encoding="utf-8", newline="") as destino:
+                escrever_erros_csv(resultado, destino)
+        else:
+            for linha, coluna, mensagem in resultado.erros[:20]:
+                self.stderr.write(f"linha {linha} [{coluna}]: {mensagem}")
+            if resultado.qtd_erros > 20:
+                self.stderr.write(f"... e mais {resultado.qtd_erros - 20} erro(s) (use --erros arquivo.csv)")
+
+        prefixo = "[dry-run] " if options["dry_run"] else ""
+        estilo = self.style.WARNING if resultado.qtd_erros else self.style.SUCCESS
+        self.stdout.write(estilo(
+            f"{prefixo}{resultado.linhas} linha(s): {resultado.criados} criado(s), "
+            f"{resultado.atualizados} atualizado(s), {resultado.qtd_erros} erro(s) "
+            f"em {resultado.segundos:.2f}s ({resultado.linhas_por_segundo:.0f} linhas/s)."
+        ))
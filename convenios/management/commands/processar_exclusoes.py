@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from convenios import exclusao
+
+
+class Command(BaseCommand):
+    help = "Worker das exclusões em massa de convênios (ExclusaoJob): processa as pendentes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Processa o que estiver pendente e sai")
+        parser.add_argument("--intervalo", type=float, default=5, help="Segundos entre verificações (padrão: 5)")
+
+    def handle(self, *args, **options):
+        while True:
+            processados = exclusao.processar_pendentes()
+            if processados:
+                self.stdout.write(f"{processados} exclusão(ões) processada(s).")
+            if options["once"]:
+                break
+            time.sleep(options["intervalo"])
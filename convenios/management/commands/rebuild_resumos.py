@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from convenios.models import Convenio, ConvenioResumo
+
+
+class Command(BaseCommand):
+    help = "Reconstrói a tabela ConvenioResumo (resumo financeiro por convênio) em lote."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Convênios por lote (padrão: 2000)")
+
+    def handle(self, *args, **options):
+        chunk_size = options["chunk_size"]
+        ids = Convenio.objects.order_by("pk").values_list("pk", flat=True)
+
+        total = 0
+        with transaction.atomic():
+            ConvenioResumo.objects.all().delete()
+
+            lote = []
+            for pk in ids.iterator(chunk_size=chunk_size):
+                lote.append(pk)
+                if len(lote) >= chunk_size:
+                    total += ConvenioResumo.atualizar(lote)
+                    lote = []
+            if lote:
+                total += ConvenioResumo.atualizar(lote)
+
+        self.stdout.write(self.style.SUCCESS(f"{total} resumo(s) reconstruído(s)."))
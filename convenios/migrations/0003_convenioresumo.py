@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:16
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+MONEY = models.DecimalField(max_digits=14, decimal_places=2)
+
+
+def _soma(queryset, expressao, agrupar_por):
+    # core.db.soma_subquery, sem importar código da aplicação
+    subquery = queryset.order_by().values(agrupar_por).annotate(total=Sum(expressao, output_field=MONEY)).values("total")
+    return Coalesce(Subquery(subquery, output_field=MONEY), Value(Decimal("0")), output_field=MONEY)
+
+
+def popular_resumos(apps, schema_editor):
+    # mesmos agregados de ConvenioResumo.atualizar(), com os models históricos
+    Convenio = apps.get_model("convenios", "Convenio")
+    ConvenioResumo = apps.get_model("convenios", "ConvenioResumo")
+    Contrato = apps.get_model("contratos", "Contrato")
+    Aditivo = apps.get_model("contratos", "Aditivo")
+    Pagamento = apps.get_model("financeiro", "Pagamento")
+
+    linhas = Convenio.objects.order_by().annotate(
+        _total_pago=_soma(Pagamento.objects.filter(contrato__convenio=OuterRef("pk")), "valor_pago", "contrato__convenio"),
+        _contratado=_soma(Contrato.objects.filter(convenio=OuterRef("pk")), "valor_contratado", "convenio"),
+        _aditivos=_soma(
+            Aditivo.objects.filter(contrato__convenio=OuterRef("pk")),
+            F("valor_acrescimo") - F("valor_supressao"),
+            "contrato__convenio",
+        ),
+        _qtd_contratos=Subquery(
+            Contrato.objects.filter(convenio=OuterRef("pk")).order_by().values("convenio")
+            .annotate(n=Count("id")).values("n")
+        ),
+        _ultimo_pagamento=Subquery(
+            Pagamento.objects.filter(contrato__convenio=OuterRef("pk")).order_by().values("contrato__convenio")
+            .annotate(d=Max("data")).values("d")
+        ),
+    ).values_list(
+        "pk", "valor_repasse", "valor_contrapartida", "_total_pago", "_contratado", "_aditivos",
+        "_qtd_contratos", "_ultimo_pagamento",
+    )
+    ConvenioResumo.objects.bulk_create(
+        (
+            ConvenioResumo(
+                convenio_id=pk,
+                valor_total=(repasse or 0) + (contrapartida or 0),
+                total_contratado_atualizado=contratado + aditivos,
+                total_pago=pago,
+                saldo=(repasse or 0) + (contrapartida or 0) - pago,
+                qtd_contratos=qtd or 0,
+                ultimo_pagamento=ultimo,
+            )
+            for pk, repasse, contrapartida, pago, contratado, aditivos, qtd, ultimo in linhas.iterator(chunk_size=2000)
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('convenios', '0002_convenio_repasse_recebido'),
+        ('contratos', '0001_initial'),
+        ('financeiro', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConvenioResumo',
+            fields=[
+                ('convenio', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='resumo', serialize=False, to='convenios.convenio')),
+                ('valor_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_contratado_atualizado', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total_pago', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('saldo', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('qtd_contratos', models.PositiveIntegerField(default=0)),
+                ('ultimo_pagamento', models.DateField(blank=True, null=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(popular_resumos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('convenios', '0003_convenioresumo'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='convenio',
+            index=models.Index(fields=['vigencia_fim', 'orgao_concedente'], name='convenio_vigfim_orgao_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='convenio',
+            index=models.Index(fields=['vigencia_inicio'], name='convenio_viginicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='convenio',
+            index=models.Index(fields=['status', 'vigencia_fim'], name='convenio_status_vigfim_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='convenio',
+            index=models.Index(fields=['tipo', 'vigencia_inicio'], name='convenio_tipo_viginicio_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='convenio',
+            index=models.Index(condition=models.Q(('repasse_recebido', False)), fields=['vigencia_fim', 'orgao_concedente'], name='convenio_repasse_pend_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='convenio',
+            index=models.Index(condition=models.Q(('status__in', ['CONCLUIDO', 'CANCELADO']), _negated=True), fields=['vigencia_fim', 'orgao_concedente'], name='convenio_ativos_vigfim_idx'),
+        ),
+    ]
@@ -0,0 +1,89 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:26
+
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import TrigramExtension, UnaccentExtension
+from django.db import migrations
+
+# Colunas com índice trigram (mesma expressão usada pelo lookup __busca em convenios/busca.py)
+CAMPOS_TRGM = (
+    "numero_convenio",
+    "numero_proposta",
+    "numero_indicacao",
+    "orgao_concedente",
+    "parlamentar_nome",
+    "modalidade",
+)
+
+SQL_CRIAR = [
+    # unaccent() não é IMMUTABLE; o wrapper permite usá-lo em índices
+    """
+    CREATE OR REPLACE FUNCTION public.f_unaccent(text) RETURNS text
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+        AS $$ SELECT public.unaccent('public.unaccent', $1) $$
+    """,
+    """
+    DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'pt_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION public.pt_unaccent (COPY = pg_catalog.portuguese);
+            ALTER TEXT SEARCH CONFIGURATION public.pt_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH public.unaccent, portuguese_stem;
+        END IF;
+    END $$
+    """,
+    """
+    CREATE OR REPLACE FUNCTION convenios_convenio_busca_trigger() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+    BEGIN
+        NEW.busca := to_tsvector('public.pt_unaccent', coalesce(NEW.objeto, ''));
+        RETURN NEW;
+    END $$
+    """,
+    "DROP TRIGGER IF EXISTS convenios_convenio_busca_upd ON convenios_convenio",
+    """
+    CREATE TRIGGER convenios_convenio_busca_upd
+        BEFORE INSERT OR UPDATE ON convenios_convenio
+        FOR EACH ROW EXECUTE FUNCTION convenios_convenio_busca_trigger()
+    """,
+    "UPDATE convenios_convenio SET busca = to_tsvector('public.pt_unaccent', coalesce(objeto, ''))",
+    "CREATE INDEX IF NOT EXISTS convenio_busca_gin_idx ON convenios_convenio USING gin (busca)",
+] + [
+    f"CREATE INDEX IF NOT EXISTS convenio_{campo}_trgm_idx ON convenios_convenio "
+    f"USING gin (public.f_unaccent(UPPER({campo})) gin_trgm_ops)"
+    for campo in CAMPOS_TRGM
+]
+
+SQL_REMOVER = [f"DROP INDEX IF EXISTS convenio_{campo}_trgm_idx" for campo in CAMPOS_TRGM] + [
+    "DROP INDEX IF EXISTS convenio_busca_gin_idx",
+    "DROP TRIGGER IF EXISTS convenios_convenio_busca_upd ON convenios_convenio",
+    "DROP FUNCTION IF EXISTS convenios_convenio_busca_trigger()",
+    "DROP TEXT SEARCH CONFIGURATION IF EXISTS public.pt_unaccent",
+    "DROP FUNCTION IF EXISTS public.f_unaccent(text)",
+]
+
+
+def _executar(sqls):
+    def operacao(apps, schema_editor):
+        # índices GIN, trigger e configuração de busca existem só no PostgreSQL
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for sql in sqls:
+            schema_editor.execute(sql)
+    return operacao
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('convenios', '0004_convenio_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        UnaccentExtension(),
+        migrations.AddField(
+            model_name='convenio',
+            name='busca',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(_executar(SQL_CRIAR), _executar(SQL_REMOVER)),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('convenios', '0005_convenio_busca'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='convenio',
+            index=models.Index(fields=['numero_convenio'], name='convenio_numero_idx'),
+        ),
+    ]
@@ -1,7 +1,72 @@
-from datetime import date
+from datetime import timedelta
 from django.db import models
 from django.conf import settings
-from django.db.models import Sum
+from django.contrib.postgres.search import SearchVectorField
+from django.db.models import Case, Count, F, Max, OuterRef, Subquery, Sum, Value, When
+from django.utils import timezone
+
+from core.db import MONEY, soma_subquery
+
+
+# Faixas do alerta de vigência: (dias para vencer <= limite) -> código, avaliadas em ordem.
+# Fonte única para Convenio.alerta_vigencia (Python) e alerta_vigencia_expr() (SQL).
+FAIXAS_ALERTA_VIGENCIA = (
+    (-1, "VENCIDO"),
+    (30, "VERMELHO"),
+    (90, "AMARELO"),
+)
+ALERTA_VIGENCIA_OK = "OK"
+
+
+def alerta_vigencia_expr(hoje=None):
+    """Expressão SQL (CASE WHEN sobre vigencia_fim) equivalente a Convenio.alerta_vigencia."""
+    hoje = hoje or timezone.localdate()
+    return Case(
+        *[
+            When(vigencia_fim__lte=hoje + timedelta(days=limite), then=Value(codigo))
+            for limite, codigo in FAIXAS_ALERTA_VIGENCIA
+        ],
+        default=Value(ALERTA_VIGENCIA_OK),
+        output_field=models.CharField(),
+    )
+
+
+class ConvenioQuerySet(models.QuerySet):
+    def with_alerta_vigencia(self, hoje=None):
+        """Anota o código do alerta de vigência (OK/AMARELO/VERMELHO/VENCIDO) calculado no banco."""
+        return self.annotate(_alerta_vigencia=alerta_vigencia_expr(hoje))
+
+    def with_financials(self):
+        """
+        Anota total pago, total contratado atualizado e saldo financeiro
+        de cada convênio em uma única query (subqueries correlacionadas).
+        As properties do model usam esses valores quando presentes.
+        """
+        from contratos.models import Aditivo, Contrato
+        from financeiro.models import Pagamento
+
+        return self.annotate(
+            _total_pago=soma_subquery(
+                Pagamento.objects.filter(contrato__convenio=OuterRef("pk")),
+                "valor_pago",
+                "contrato__convenio",
+            ),
+            _total_contratado=soma_subquery(
+                Contrato.objects.filter(convenio=OuterRef("pk")), "valor_contratado", "convenio"
+            ),
+            _total_aditivos=soma_subquery(
+                Aditivo.objects.filter(contrato__convenio=OuterRef("pk")),
+                F("valor_acrescimo") - F("valor_supressao"),
+                "contrato__convenio",
+            ),
+        ).annotate(
+            _total_contratado_atualizado=models.ExpressionWrapper(
+                F("_total_contratado") + F("_total_aditivos"), output_field=MONEY
+            ),
+            _saldo_financeiro=models.ExpressionWrapper(
+                F("valor_repasse") + F("valor_contrapartida") - F("_total_pago"), output_field=MONEY
+            ),
+        )
 
 
 class Convenio(models.Model):
@@ -50,8 +115,34 @@ class Convenio(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Full-text do objeto (PostgreSQL); preenchido por trigger no banco (ver convenios/busca.py)
+    busca = SearchVectorField(null=True, blank=True, editable=False)
+
+    objects = ConvenioQuerySet.as_manager()
+
     class Meta:
         ordering = ["vigencia_fim", "orgao_concedente"]
+        indexes = [
+            # upsert da importação em massa e vínculo de contratos/pagamentos (convenios/importacao.py)
+            models.Index(fields=["numero_convenio"], name="convenio_numero_idx"),
+            # ordenação padrão + filtros data_fim / status relativos (Vencidos, Vencendo, OK)
+            models.Index(fields=["vigencia_fim", "orgao_concedente"], name="convenio_vigfim_orgao_idx"),
+            # filtro data_ini e repasse por mês (TruncMonth)
+            models.Index(fields=["vigencia_inicio"], name="convenio_viginicio_idx"),
+            models.Index(fields=["status", "vigencia_fim"], name="convenio_status_vigfim_idx"),
+            models.Index(fields=["tipo", "vigencia_inicio"], name="convenio_tipo_viginicio_idx"),
+            # predicados quentes: repasse ainda não recebido / convênios não encerrados
+            models.Index(
+                fields=["vigencia_fim", "orgao_concedente"],
+                name="convenio_repasse_pend_idx",
+                condition=models.Q(repasse_recebido=False),
+            ),
+            models.Index(
+                fields=["vigencia_fim", "orgao_concedente"],
+                name="convenio_ativos_vigfim_idx",
+                condition=~models.Q(status__in=["CONCLUIDO", "CANCELADO"]),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.orgao_concedente} - {self.numero_convenio or self.numero_proposta or self.numero_indicacao or 'Sem número'}"
@@ -62,30 +153,160 @@ class Convenio(models.Model):
 
     @property
     def dias_para_vencer(self) -> int:
-        return (self.vigencia_fim - date.today()).days
+        return (self.vigencia_fim - timezone.localdate()).days
 
     @property
     def alerta_vigencia(self) -> str:
+        if hasattr(self, "_alerta_vigencia"):
+            return self._alerta_vigencia
         d = self.dias_para_vencer
-        if d < 0:
-            return "VENCIDO"
-        if d <= 30:
-            return "VERMELHO"
-        if d <= 90:
-            return "AMARELO"
-        return "OK"
+        for limite, codigo in FAIXAS_ALERTA_VIGENCIA:
+            if d <= limite:
+                return codigo
+        return ALERTA_VIGENCIA_OK
+
+    # Properties financeiras: usam os valores anotados por with_financials() quando existirem
 
     @property
     def total_pago(self):
+        if hasattr(self, "_total_pago"):
+            return self._total_pago
         return self.contratos.aggregate(s=Sum("pagamentos__valor_pago"))["s"] or 0
 
     @property
     def total_contratado_atualizado(self):
-        total = 0
-        for c in self.contratos.all():
-            total += c.valor_atualizado
-        return total
+        if hasattr(self, "_total_contratado_atualizado"):
+            return self._total_contratado_atualizado
+        from contratos.models import Aditivo
+
+        contratado = self.contratos.aggregate(s=Sum("valor_contratado"))["s"] or 0
+        aditivos = Aditivo.objects.filter(contrato__convenio=self).aggregate(
+            s=Sum(F("valor_acrescimo") - F("valor_supressao"))
+        )["s"] or 0
+        return contratado + aditivos
 
     @property
     def saldo_financeiro(self):
-        return self.valor_total - self.total_pago
\ No newline at end of file
+        if hasattr(self, "_saldo_financeiro"):
+            return self._saldo_financeiro
+        return self.valor_total - self.total_pago
+
+
+class ConvenioResumo(models.Model):
+    """
+    Resumo financeiro desnormalizado (1 linha por convênio).
+    Mantido pelos signals de Convenio/Contrato/Aditivo/Pagamento (convenios/signals.py)
+    e reconstruído em lote por `manage.py rebuild_resumos`.
+    """
+    convenio = models.OneToOneField(Convenio, on_delete=models.CASCADE, primary_key=True, related_name="resumo")
+
+    valor_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_contratado_atualizado = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total_pago = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    saldo = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    qtd_contratos = models.PositiveIntegerField(default=0)
+    ultimo_pagamento = models.DateField(blank=True, null=True)
+
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Resumo - {self.convenio_id}"
+
+    @classmethod
+    def atualizar(cls, convenio_ids=None):
+        """
+        Recalcula (upsert) os resumos dos convênios informados em uma query de leitura
+        e um INSERT ... ON CONFLICT. Convênios que não existem mais têm o resumo apagado.
+        Sem ids -> recalcula todos.
+        """
+        from contratos.models import Contrato
+        from financeiro.models import Pagamento
+
+        qs = Convenio.objects.with_financials()
+        if convenio_ids is not None:
+            convenio_ids = set(convenio_ids)
+            if not convenio_ids:
+                return 0
+            qs = qs.filter(pk__in=convenio_ids)
+
+        qs = qs.annotate(
+            _qtd_contratos=Subquery(
+                Contrato.objects.filter(convenio=OuterRef("pk"))
+                .order_by()
+                .values("convenio")
+                .annotate(n=Count("id"))
+                .values("n")
+            ),
+            _ultimo_pagamento=Subquery(
+                Pagamento.objects.filter(contrato__convenio=OuterRef("pk"))
+                .order_by()
+                .values("contrato__convenio")
+                .annotate(d=Max("data"))
+                .values("d")
+            ),
+        ).order_by()
+
+        resumos = [
+            cls(
+                convenio_id=c.pk,
+                valor_total=c.valor_total,
+                total_contratado_atualizado=c.total_contratado_atualizado,
+                total_pago=c.total_pago,
+                saldo=c.saldo_financeiro,
+                qtd_contratos=c._qtd_contratos or 0,
+                ultimo_pagamento=c._ultimo_pagamento,
+            )
+            for c in qs.only("id", "valor_repasse", "valor_contrapartida")
+        ]
+
+        if convenio_ids is not None:
+            removidos = convenio_ids - {r.convenio_id for r in resumos}
+            if removidos:
+                cls.objects.filter(convenio_id__in=removidos).delete()
+
+        cls.objects.bulk_create(
+            resumos,
+            update_conflicts=True,
+            unique_fields=["convenio"],
+            update_fields=[
+                "valor_total",
+                "total_contratado_atualizado",
+                "total_pago",
+                "saldo",
+                "qtd_contratos",
+                "ultimo_pagamento",
+                "atualizado_em",
+            ],
+        )
+        return len(resumos)
+
+
+class ExclusaoJob(models.Model):
+    """
+    Exclusão em massa de convênios em segundo plano (ver convenios/exclusao.py).
+    Guarda os ids selecionados e o progresso (apagados/total) para a tela acompanhar.
+    """
+
+    class Status(models.TextChoices):
+        PENDENTE = "PENDENTE", "Pendente"
+        PROCESSANDO = "PROCESSANDO", "Processando"
+        CONCLUIDO = "CONCLUIDO", "Concluído"
+        ERRO = "ERRO", "Erro"
+
+    ids = models.JSONField(default=list, blank=True)
+    total = models.PositiveIntegerField(default=0)
+    processados = models.PositiveIntegerField(default=0)
+    apagados = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDENTE)
+    erro = models.TextField(blank=True, null=True)
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(blank=True, null=True)
+    concluido_em = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Exclusão #{self.pk} ({self.processados}/{self.total})"
@@ -0,0 +1,74 @@
+"""
+Mantém ConvenioResumo atualizado a partir das alterações em
+Convenio, Contrato, Aditivo e Pagamento.
+
+Dentro de uma transação os ids afetados são acumulados e recalculados uma
+única vez no commit (ex.: apagar um contrato com centenas de pagamentos).
+"""
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from contratos.models import Aditivo, Contrato
+from financeiro.models import Pagamento
+
+from .models import Convenio, ConvenioResumo
+
+_pendentes = threading.local()
+
+
+def _processar_pendentes():
+    convenio_ids = getattr(_pendentes, "convenios", set())
+    contrato_ids = getattr(_pendentes, "contratos", set())
+    _pendentes.convenios, _pendentes.contratos, _pendentes.agendado = set(), set(), False
+
+    if contrato_ids:
+        convenio_ids |= set(
+            Contrato.objects.filter(pk__in=contrato_ids).values_list("convenio_id", flat=True)
+        )
+    ConvenioResumo.atualizar(convenio_ids)
+
+
+def agendar_resumo(convenio_id=None, contrato_id=None):
+    if not hasattr(_pendentes, "convenios"):
+        _pendentes.convenios, _pendentes.contratos, _pendentes.agendado = set(), set(), False
+
+    if convenio_id is not None:
+        _pendentes.convenios.add(convenio_id)
+    if contrato_id is not None:
+        _pendentes.contratos.add(contrato_id)
+
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _processar_pendentes()
+        return
+
+    # após rollback o callback some da fila: agenda de novo (ids antigos são recalculados junto, sem problema)
+    agendado = _pendentes.agendado and any(
+        func is _processar_pendentes for _, func, _ in connection.run_on_commit
+    )
+    if not agendado:
+        _pendentes.agendado = True
+        transaction.on_commit(_processar_pendentes)
+
+
+@receiver(post_save, sender=Convenio)
+@receiver(post_delete, sender=Convenio)
+def _convenio_alterado(sender, instance, **kwargs):
+    agendar_resumo(convenio_id=instance.pk)
+
+
+@receiver(post_save, sender=Contrato)
+@receiver(post_delete, sender=Contrato)
+def _contrato_alterado(sender, instance, **kwargs):
+    agendar_resumo(convenio_id=instance.convenio_id)
+
+
+@receiver(post_save, sender=Aditivo)
+@receiver(post_delete, sender=Aditivo)
+@receiver(post_save, sender=Pagamento)
+@receiver(post_delete, sender=Pagamento)
+def _lancamento_alterado(sender, instance, **kwargs):
+    agendar_resumo(contrato_id=instance.contrato_id)
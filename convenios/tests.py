@@ -1,3 +1,663 @@
-from django.test import TestCase
+import io
+import os
+from importlib import import_module
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from unittest import mock, skipUnless
+
+from django.apps import apps as django_apps
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from contratos.models import Aditivo, Contrato, Empresa
+from core.cache import invalidar_dashboard
+from financeiro.models import Pagamento
+from relatorios.models import CuboConvenios
+
+from . import exclusao, importacao
+from .busca import filtro_busca
+from .importacao import ImportacaoErro, importar
+from .models import Convenio, ConvenioResumo, ExclusaoJob
+
+
+class ConvenioFinancialsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        empresa = Empresa.objects.create(cnpj="00.000.000/0001-00", razao_social="Empresa Teste")
+        for n in range(5):
+            convenio = Convenio.objects.create(
+                tipo=Convenio.Tipo.FEDERAL,
+                numero_convenio=f"CV-{n}",
+                orgao_concedente="Ministério da Saúde",
+                objeto="Objeto",
+                valor_repasse=Decimal("1000.00"),
+                valor_contrapartida=Decimal("100.00"),
+                vigencia_inicio=date(2025, 1, 1),
+                vigencia_fim=date(2026, 12, 31),
+            )
+            for m in range(3):
+                contrato = Contrato.objects.create(
+                    convenio=convenio,
+                    empresa=empresa,
+                    numero_contrato=f"CT-{n}-{m}",
+                    objeto_contratado="Obra",
+                    valor_contratado=Decimal("300.00"),
+                    data_inicio=date(2025, 2, 1),
+                )
+                Aditivo.objects.create(
+                    contrato=contrato,
+                    tipo=Aditivo.Tipo.VALOR,
+                    numero_aditivo="1",
+                    data=date(2025, 3, 1),
+                    valor_acrescimo=Decimal("50.00"),
+                    valor_supressao=Decimal("10.00"),
+                )
+                for _ in range(2):
+                    Pagamento.objects.create(contrato=contrato, data=date(2025, 4, 1), valor_pago=Decimal("25.00"))
+
+        # convênio sem contratos
+        Convenio.objects.create(
+            tipo=Convenio.Tipo.ESTADUAL,
+            orgao_concedente="Secretaria",
+            objeto="Objeto",
+            valor_repasse=Decimal("10.00"),
+            vigencia_inicio=date(2025, 1, 1),
+            vigencia_fim=date(2026, 12, 31),
+        )
+
+    def test_with_financials_matches_properties(self):
+        anotados = {c.pk: c for c in Convenio.objects.with_financials()}
+        for c in Convenio.objects.all():
+            a = anotados[c.pk]
+            self.assertEqual(a.total_pago, c.total_pago)
+            self.assertEqual(a.total_contratado_atualizado, c.total_contratado_atualizado)
+            self.assertEqual(a.saldo_financeiro, c.saldo_financeiro)
+
+    def test_with_financials_values(self):
+        c = Convenio.objects.with_financials().get(numero_convenio="CV-0")
+        self.assertEqual(c.total_pago, Decimal("150.00"))
+        self.assertEqual(c.total_contratado_atualizado, Decimal("1020.00"))
+        self.assertEqual(c.saldo_financeiro, Decimal("950.00"))
+
+        vazio = Convenio.objects.with_financials().get(orgao_concedente="Secretaria")
+        self.assertEqual(vazio.total_pago, 0)
+        self.assertEqual(vazio.total_contratado_atualizado, 0)
+        self.assertEqual(vazio.saldo_financeiro, Decimal("10.00"))
+
+    def test_with_financials_single_query(self):
+        with self.assertNumQueries(1):
+            for c in Convenio.objects.with_financials():
+                c.total_pago
+                c.total_contratado_atualizado
+                c.saldo_financeiro
+
+
+class ConvenioResumoTests(TestCase):
+    """Os signals recalculam o resumo no commit; captureOnCommitCallbacks executa esses callbacks."""
+
+    def _criar_convenio(self, **kwargs):
+        dados = dict(
+            tipo=Convenio.Tipo.FEDERAL,
+            orgao_concedente="Ministério da Saúde",
+            objeto="Objeto",
+            valor_repasse=Decimal("1000.00"),
+            valor_contrapartida=Decimal("100.00"),
+            vigencia_inicio=date(2025, 1, 1),
+            vigencia_fim=date(2026, 12, 31),
+        )
+        dados.update(kwargs)
+        return Convenio.objects.create(**dados)
+
+    def test_signals_mantem_resumo(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            convenio = self._criar_convenio()
+            empresa = Empresa.objects.create(cnpj="00.000.000/0001-00", razao_social="Empresa Teste")
+            contrato = Contrato.objects.create(
+                convenio=convenio,
+                empresa=empresa,
+                numero_contrato="CT-1",
+                objeto_contratado="Obra",
+                valor_contratado=Decimal("500.00"),
+                data_inicio=date(2025, 2, 1),
+            )
+            Aditivo.objects.create(
+                contrato=contrato,
+                tipo=Aditivo.Tipo.VALOR,
+                numero_aditivo="1",
+                data=date(2025, 3, 1),
+                valor_acrescimo=Decimal("100.00"),
+            )
+            Pagamento.objects.create(contrato=contrato, data=date(2025, 4, 1), valor_pago=Decimal("200.00"))
+            pagamento = Pagamento.objects.create(contrato=contrato, data=date(2025, 5, 1), valor_pago=Decimal("50.00"))
+
+        resumo = ConvenioResumo.objects.get(convenio=convenio)
+        self.assertEqual(resumo.valor_total, Decimal("1100.00"))
+        self.assertEqual(resumo.total_contratado_atualizado, Decimal("600.00"))
+        self.assertEqual(resumo.total_pago, Decimal("250.00"))
+        self.assertEqual(resumo.saldo, Decimal("850.00"))
+        self.assertEqual(resumo.qtd_contratos, 1)
+        self.assertEqual(resumo.ultimo_pagamento, date(2025, 5, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            pagamento.delete()
+        resumo.refresh_from_db()
+        self.assertEqual(resumo.total_pago, Decimal("200.00"))
+        self.assertEqual(resumo.ultimo_pagamento, date(2025, 4, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            contrato.delete()
+        resumo.refresh_from_db()
+        self.assertEqual(resumo.qtd_contratos, 0)
+        self.assertEqual(resumo.total_pago, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            convenio.delete()
+        self.assertFalse(ConvenioResumo.objects.exists())
+
+    def test_rebuild_resumos(self):
+        for n in range(3):
+            self._criar_convenio(numero_convenio=f"CV-{n}")
+        self.assertFalse(ConvenioResumo.objects.exists())
+
+        call_command("rebuild_resumos", chunk_size=2, stdout=StringIO())
+
+        self.assertEqual(ConvenioResumo.objects.count(), 3)
+        self.assertEqual(
+            set(ConvenioResumo.objects.values_list("valor_total", flat=True)), {Decimal("1100.00")}
+        )
+
+
+    def test_migracao_popula_resumos(self):
+        # mesmo resultado de atualizar() para dados já existentes antes da migração
+        convenio = self._criar_convenio()
+        self._criar_convenio(valor_contrapartida=Decimal("0.00"))
+        empresa = Empresa.objects.create(cnpj="00.000.000/0001-00", razao_social="Empresa Teste")
+        contrato = Contrato.objects.create(
+            convenio=convenio, empresa=empresa, numero_contrato="CT-1", objeto_contratado="Obra",
+            valor_contratado=Decimal("500.00"), data_inicio=date(2025, 2, 1),
+        )
+        Aditivo.objects.create(
+            contrato=contrato, tipo=Aditivo.Tipo.VALOR, numero_aditivo="1", data=date(2025, 3, 1),
+            valor_acrescimo=Decimal("100.00"), valor_supressao=Decimal("30.00"),
+        )
+        Pagamento.objects.create(contrato=contrato, data=date(2025, 4, 1), valor_pago=Decimal("200.00"))
+
+        campos = ("convenio_id", "valor_total", "total_contratado_atualizado", "total_pago", "saldo",
+                  "qtd_contratos", "ultimo_pagamento")
+        ConvenioResumo.atualizar()
+        esperado = set(ConvenioResumo.objects.values_list(*campos))
+        ConvenioResumo.objects.all().delete()
+
+        migracao = import_module("convenios.migrations.0003_convenioresumo")
+        migracao.popular_resumos(django_apps, None)
+        self.assertEqual(set(ConvenioResumo.objects.values_list(*campos)), esperado)
+
+
+class AlertaVigenciaTests(TestCase):
+    def test_sql_igual_python(self):
+        hoje = timezone.localdate()
+        for dias in (-30, -1, 0, 1, 30, 31, 89, 90, 91, 400):
+            Convenio.objects.create(
+                tipo=Convenio.Tipo.FEDERAL,
+                orgao_concedente=f"Órgão {dias}",
+                objeto="Objeto",
+                vigencia_inicio=hoje - timedelta(days=500),
+                vigencia_fim=hoje + timedelta(days=dias),
+            )
+
+        anotados = {c.pk: c.alerta_vigencia for c in Convenio.objects.with_alerta_vigencia()}
+        for c in Convenio.objects.all():
+            self.assertEqual(anotados[c.pk], c.alerta_vigencia, c.orgao_concedente)
+
+        self.assertEqual(
+            {c.orgao_concedente: c.alerta_vigencia for c in Convenio.objects.with_alerta_vigencia()},
+            {
+                "Órgão -30": "VENCIDO",
+                "Órgão -1": "VENCIDO",
+                "Órgão 0": "VERMELHO",
+                "Órgão 1": "VERMELHO",
+                "Órgão 30": "VERMELHO",
+                "Órgão 31": "AMARELO",
+                "Órgão 89": "AMARELO",
+                "Órgão 90": "AMARELO",
+                "Órgão 91": "OK",
+                "Órgão 400": "OK",
+            },
+        )
+
+
+class BuscaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.saude = Convenio.objects.create(
+            tipo=Convenio.Tipo.FEDERAL,
+            numero_convenio="912345/2025",
+            orgao_concedente="Ministério da Saúde",
+            parlamentar_nome="Deputada Ana",
+            objeto="Construção de unidades básicas de saúde",
+            vigencia_inicio=date(2025, 1, 1),
+            vigencia_fim=date(2026, 12, 31),
+        )
+        cls.educacao = Convenio.objects.create(
+            tipo=Convenio.Tipo.ESTADUAL,
+            numero_convenio="100200/2024",
+            orgao_concedente="Secretaria de Educação",
+            objeto="Aquisição de ônibus escolares",
+            vigencia_inicio=date(2025, 1, 1),
+            vigencia_fim=date(2026, 12, 31),
+        )
+
+    def _busca(self, termo):
+        return set(Convenio.objects.filter(filtro_busca(termo)).values_list("pk", flat=True))
+
+    def test_lookup_busca(self):
+        self.assertEqual(
+            list(Convenio.objects.filter(orgao_concedente__busca="DA saúde")), [self.saude]
+        )
+        self.assertFalse(Convenio.objects.filter(orgao_concedente__busca="100%").exists())
+
+    def test_filtro_busca(self):
+        self.assertEqual(self._busca("912345"), {self.saude.pk})
+        self.assertEqual(self._busca("ana"), {self.saude.pk})
+        self.assertEqual(self._busca("escolares"), {self.educacao.pk})
+
+    def test_busca_do_admin(self):
+        model_admin = site._registry[Convenio]
+        request = RequestFactory().get("/admin/convenios/convenio/", {"q": "Educação"})
+        qs, duplicados = model_admin.get_search_results(request, Convenio.objects.all(), "Educação")
+        self.assertFalse(duplicados)
+        self.assertEqual(list(qs), [self.educacao])
+
+    @skipUnless(connection.vendor == "postgresql", "busca sem acento/full-text só no PostgreSQL")
+    def test_sem_acento_e_full_text(self):
+        self.assertEqual(self._busca("saude"), {self.saude.pk})
+        self.assertEqual(self._busca("educacao"), {self.educacao.pk})
+        # radical português: "onibus escolar" encontra "ônibus escolares"
+        self.assertEqual(self._busca("onibus escolar"), {self.educacao.pk})
+        Convenio.objects.filter(pk=self.saude.pk).update(objeto="Pavimentação de vias")
+        self.assertEqual(self._busca("pavimentacao"), {self.saude.pk})
+
+
+@override_settings(CONVENIOS_PAGINA_TAMANHO=3)
+class ListaPaginadaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ids = [
+            Convenio.objects.create(
+                tipo=Convenio.Tipo.FEDERAL if n % 2 else Convenio.Tipo.ESTADUAL,
+                numero_convenio=f"CV-{n}",
+                orgao_concedente="Órgão",
+                objeto="Objeto",
+                vigencia_inicio=date(2025, 1, 1),
+                vigencia_fim=date(2026, 12, 31),
+            ).pk
+            for n in range(8)
+        ]
+
+    def _pagina(self, **params):
+        response = self.client.get(reverse("convenios:list"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.context
+
+    def test_navegacao_por_cursor(self):
+        esperado = sorted(self.ids, reverse=True)
+
+        ctx = self._pagina()
+        self.assertEqual([c.pk for c in ctx["convenios"]], esperado[:3])
+        self.assertFalse(ctx["pagina"].tem_anterior)
+
+        ctx = self._pagina(depois=ctx["pagina"].proximo)
+        self.assertEqual([c.pk for c in ctx["convenios"]], esperado[3:6])
+
+        ultima = self._pagina(depois=ctx["pagina"].proximo)
+        self.assertEqual([c.pk for c in ultima["convenios"]], esperado[6:])
+        self.assertFalse(ultima["pagina"].tem_proximo)
+
+        ctx = self._pagina(antes=ultima["pagina"].anterior)
+        self.assertEqual([c.pk for c in ctx["convenios"]], esperado[3:6])
+        ctx = self._pagina(antes=ctx["pagina"].anterior)
+        self.assertEqual([c.pk for c in ctx["convenios"]], esperado[:3])
+        self.assertFalse(ctx["pagina"].tem_anterior)
+
+    def test_filtros_e_tamanho_nos_links(self):
+        ctx = self._pagina(tipo="FEDERAL", tamanho="2")
+        self.assertEqual({c.tipo for c in ctx["convenios"]}, {Convenio.Tipo.FEDERAL})
+        self.assertEqual(len(ctx["convenios"]), 2)
+        self.assertIn("tipo=FEDERAL", ctx["url_proximo"])
+        self.assertIn("tamanho=2", ctx["url_proximo"])
+
+    def test_cursor_invalido_volta_ao_inicio(self):
+        ctx = self._pagina(depois="lixo!")
+        self.assertEqual(ctx["convenios"][0].pk, max(self.ids))
+
+    def test_uma_query_sem_count(self):
+        cursor = self._pagina()["pagina"].proximo
+        with self.assertNumQueries(1) as queries:
+            self._pagina(depois=cursor)
+        self.assertNotIn("COUNT(", queries.captured_queries[0]["sql"].upper())
+
+
+def arquivo_csv(*linhas):
+    return io.BytesIO("\n".join(linhas).encode("utf-8"))
+
+
+class ImportacaoTests(TestCase):
+    CABECALHO = "Tipo;Nº do Convênio;Órgão concedente;Objeto;Valor repasse;Vigência início;Vigência fim;Situação"
+
+    def _importar_convenios(self, *linhas, **kwargs):
+        return importar(arquivo_csv(self.CABECALHO, *linhas), nome="convenios.csv", **kwargs)
+
+    def test_convenios_upsert_e_erros(self):
+        r = self._importar_convenios(
+            "FEDERAL;100/2025;Ministério da Saúde;UBS;1.234.567,89;01/02/2025;31/12/2026;Em execução",
+            "Estadual;200/2025;Secretaria;Escola;10,00;2025-03-01;2026-03-01;",
+            "FEDERAL;300/2025;Ministério;Obra;abc;31/02/2025;01/01/2026;PROPOSTA",
+            "MUNICIPAL;400/2025;;Obra;1,00;01/01/2025;01/01/2026;PROPOSTA",
+            chunk_size=2,
+        )
+        self.assertEqual((r.linhas, r.criados, r.atualizados), (4, 2, 0))
+        self.assertEqual(
+            {(linha, coluna) for linha, coluna, _ in r.erros},
+            {(4, "valor_repasse"), (4, "vigencia_inicio"), (5, "tipo"), (5, "orgao_concedente")},
+        )
+
+        c = Convenio.objects.get(numero_convenio="100/2025")
+        self.assertEqual(c.valor_repasse, Decimal("1234567.89"))
+        self.assertEqual(c.status, Convenio.Status.EXECUCAO)
+        self.assertEqual(Convenio.objects.get(numero_convenio="200/2025").status, Convenio.Status.PROPOSTA)
+        self.assertTrue(ConvenioResumo.objects.filter(convenio=c, valor_total=Decimal("1234567.89")).exists())
+
+        r = self._importar_convenios(
+            "FEDERAL;100/2025;Ministério da Saúde;UBS reformada;2.000,00;01/02/2025;31/12/2027;CONCLUIDO",
+        )
+        self.assertEqual((r.criados, r.atualizados), (0, 1))
+        c.refresh_from_db()
+        self.assertEqual((c.objeto, c.valor_repasse, c.vigencia_fim), ("UBS reformada", Decimal("2000.00"), date(2027, 12, 31)))
+        self.assertEqual(c.resumo.valor_total, Decimal("2000.00"))
+        self.assertEqual(Convenio.objects.count(), 2)
+        # bulk_create não dispara signals: o cubo dos relatórios é recalculado por lote
+        self.assertEqual(
+            list(CuboConvenios.objects.filter(mes=date(2025, 2, 1)).values_list("status", "qtd", "total_repasse")),
+            [(Convenio.Status.CONCLUIDO, 1, Decimal("2000.00"))],
+        )
+
+    def test_lotes_commitados_separadamente(self):
+        linhas = [
+            "FEDERAL;100/2025;Ministério;UBS;1,00;01/01/2025;31/12/2026;",
+            "FEDERAL;200/2025;Ministério;UBS;1,00;01/01/2025;31/12/2026;",
+            "FEDERAL;300/2025;Ministério;UBS;1,00;01/01/2025;31/12/2026;",
+        ]
+        original = importacao.ImportadorConvenios.gravar
+        chamadas = []
+
+        def gravar(importador, lote):
+            chamadas.append(lote)
+            if len(chamadas) == 2:
+                raise RuntimeError("falha no meio do arquivo")
+            return original(importador, lote)
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with mock.patch.object(importacao.ImportadorConvenios, "gravar", gravar):
+                with self.assertRaises(RuntimeError):
+                    self._importar_convenios(*linhas, chunk_size=2)
+        # o primeiro lote já foi commitado (e invalidou o dashboard); não há transação externa
+        self.assertEqual(list(Convenio.objects.values_list("numero_convenio", flat=True)), ["100/2025", "200/2025"])
+        self.assertEqual(len(callbacks), 1)
+
+    def test_contratos_e_pagamentos(self):
+        self._importar_convenios("FEDERAL;100/2025;Ministério;UBS;1000,00;01/01/2025;31/12/2026;")
+        existente = Empresa.objects.create(cnpj="11.222.333/0001-81", razao_social="Construtora")
+
+        r = importar(arquivo_csv(
+            "numero_convenio,numero_contrato,cnpj,razao_social,objeto_contratado,valor_contratado,data_inicio",
+            "100/2025,CT-1,11222333000181,,Obra,600.00,2025-02-01",
+            "100/2025,CT-2,44.555.666/0001-99,Nova Ltda,Projeto,100.00,2025-02-01",
+            "100/2025,CT-3,77888999000100,,Projeto,100.00,2025-02-01",
+            "999/2025,CT-4,11222333000181,,Obra,1.00,2025-02-01",
+        ), nome="contratos.csv", tipo="contratos")
+        self.assertEqual(r.criados, 2)
+        self.assertEqual([(linha, coluna) for linha, coluna, _ in r.erros], [(4, "cnpj"), (5, "numero_convenio")])
+        self.assertEqual(Contrato.objects.get(numero_contrato="CT-1").empresa, existente)
+        self.assertEqual(Empresa.objects.get(razao_social="Nova Ltda").cnpj, "44.555.666/0001-99")
+
+        r = importar(arquivo_csv(
+            "numero_convenio;numero_contrato;data;valor_pago;numero_ob",
+            "100/2025;CT-1;10/03/2025;250,00;OB1",
+            "100/2025;CT-2;11/03/2025;50,00;OB2",
+            "100/2025;CT-9;11/03/2025;50,00;OB3",
+        ), nome="pagamentos.csv", tipo="pagamentos")
+        self.assertEqual((r.criados, r.qtd_erros), (2, 1))
+
+        resumo = ConvenioResumo.objects.get(convenio__numero_convenio="100/2025")
+        self.assertEqual(resumo.qtd_contratos, 2)
+        self.assertEqual(resumo.total_pago, Decimal("300.00"))
+        self.assertEqual(resumo.ultimo_pagamento, date(2025, 3, 11))
+
+    def test_dry_run_e_colunas_obrigatorias(self):
+        r = self._importar_convenios("FEDERAL;100/2025;Ministério;UBS;1,00;01/01/2025;31/12/2026;", dry_run=True)
+        self.assertEqual(r.criados, 1)
+        self.assertFalse(Convenio.objects.exists())
+
+        with self.assertRaises(ImportacaoErro):
+            importar(arquivo_csv("numero_convenio;objeto", "1;x"), nome="x.csv")
+        with self.assertRaises(ImportacaoErro):
+            importar(arquivo_csv("x"), nome="x.txt")
+
+    def test_xlsx(self):
+        try:
+            from openpyxl import Workbook
+        except ImportError:
+            self.skipTest("openpyxl não instalado")
+        wb = Workbook()
+        wb.active.append(["tipo", "numero_convenio", "orgao_concedente", "objeto", "valor_repasse",
+                          "vigencia_inicio", "vigencia_fim", "repasse_recebido"])
+        wb.active.append(["FEDERAL", 912345.0, "Ministério", "UBS", 1500.5, date(2025, 1, 1), date(2026, 1, 1), "Sim"])
+        conteudo = io.BytesIO()
+        wb.save(conteudo)
+
+        r = importar(conteudo, nome="convenios.xlsx")
+        self.assertEqual((r.criados, r.qtd_erros), (1, 0))
+        c = Convenio.objects.get()
+        self.assertEqual((c.numero_convenio, c.valor_repasse, c.repasse_recebido), ("912345", Decimal("1500.50"), True))
+
+    def test_upload_e_comando(self):
+        upload = SimpleUploadedFile(
+            "convenios.csv",
+            arquivo_csv(self.CABECALHO, "FEDERAL;100/2025;Ministério;UBS;1,00;01/01/2025;31/12/2026;", "X;;;;;;;").read(),
+        )
+        response = self.client.post(reverse("convenios:importar"), {"tipo": "convenios", "arquivo": upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["resultado"].criados, 1)
+        self.assertEqual(len(response.context["erros"]), 5)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            origem = os.path.join(tmp, "convenios.csv")
+            relatorio = os.path.join(tmp, "erros.csv")
+            with open(origem, "wb") as f:
+                f.write(arquivo_csv(self.CABECALHO, "FEDERAL;100/2025;Ministério;UBS;5,00;01/01/2025;32/12/2026;").read())
+            out = StringIO()
+            call_command("import_convenios", origem, "--erros", relatorio, stdout=out)
+            self.assertIn("1 erro(s)", out.getvalue())
+            with open(relatorio, encoding="utf-8-sig") as f:
+                self.assertEqual(f.read().splitlines()[1].split(";")[:2], ["2", "vigencia_fim"])
+
+
+@override_settings(CONVENIOS_EXCLUSAO_LOTE=2, CONVENIOS_EXCLUSAO_EXECUTOR="db")
+class ExclusaoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        empresa = Empresa.objects.create(cnpj="00.000.000/0001-00", razao_social="Empresa Teste")
+        cls.ids = []
+        for n in range(5):
+            convenio = Convenio.objects.create(
+                tipo=Convenio.Tipo.FEDERAL if n < 4 else Convenio.Tipo.ESTADUAL,
+                numero_convenio=f"CV-{n}",
+                orgao_concedente="Órgão",
+                objeto="Objeto",
+                valor_repasse=Decimal("100.00"),
+                vigencia_inicio=date(2025, 1, 1),
+                vigencia_fim=date(2026, 12, 31),
+            )
+            cls.ids.append(convenio.pk)
+            for m in range(2):
+                contrato = Contrato.objects.create(
+                    convenio=convenio, empresa=empresa, numero_contrato=f"CT-{n}-{m}",
+                    objeto_contratado="Obra", valor_contratado=Decimal("50.00"), data_inicio=date(2025, 2, 1),
+                )
+                Aditivo.objects.create(contrato=contrato, tipo=Aditivo.Tipo.PRAZO, numero_aditivo="1", data=date(2025, 3, 1))
+                for _ in range(3):
+                    Pagamento.objects.create(contrato=contrato, data=date(2025, 4, 1), valor_pago=Decimal("5.00"))
+        ConvenioResumo.atualizar()
+
+    def _restantes(self):
+        return (
+            Convenio.objects.count(),
+            Contrato.objects.count(),
+            Aditivo.objects.count(),
+            Pagamento.objects.count(),
+            ConvenioResumo.objects.count(),
+        )
+
+    def test_apaga_em_lotes_com_delete_direto(self):
+        self.assertTrue(exclusao.cascata_segura())
+        with self.assertNumQueries(2 * (len(exclusao.CASCATA) + 2 + 4)) as queries:
+            # 2 lotes x (SAVEPOINT + 5 DELETEs + RELEASE + 4 do cubo); nenhum SELECT de objetos
+            response = self.client.post(reverse("convenios:delete_selected"), {"ids": self.ids[:3]})
+        self.assertRedirects(response, reverse("convenios:list"), fetch_redirect_response=False)
+        # só as leituras do cubo por lote: meses afetados e o GROUP BY desses meses
+        selects = [q["sql"] for q in queries.captured_queries if q["sql"].startswith("SELECT")]
+        self.assertEqual(len(selects), 2 * 2)
+        self.assertFalse([sql for sql in selects if "financeiro_pagamento" in sql or "contratos_" in sql])
+        self.assertEqual(self._restantes(), (2, 4, 4, 12, 2))
+
+    def test_retorna_so_os_convenios_apagados(self):
+        # a contagem não depende de Convenio ser o último passo da cascata: contratos por
+        # último (filtro direto por convenio_id; as FKs só são checadas no fim da transação)
+        pagamentos, aditivos, contratos, resumos, convenios = exclusao.CASCATA
+        cascata = (pagamentos, aditivos, resumos, convenios, contratos)
+        with mock.patch.object(exclusao, "CASCATA", cascata):
+            self.assertEqual(exclusao.apagar_convenios(self.ids[:2], chunk_size=2), 2)
+
+    def test_apaga_so_os_ids_enviados(self):
+        # só os ids enviados: outros campos do POST (filtros, todos=1) não ampliam a exclusão
+        self.client.post(reverse("convenios:delete_selected"), {"todos": "1", "ids": [self.ids[0]]})
+        self.assertFalse(Convenio.objects.filter(pk=self.ids[0]).exists())
+        self.assertEqual(self._restantes(), (4, 8, 8, 24, 4))
+
+    def test_fallback_para_o_coletor(self):
+        with mock.patch.object(exclusao, "cascata_segura", return_value=False):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(exclusao.apagar_convenios(self.ids[:2]), 2)
+        self.assertEqual(self._restantes(), (3, 6, 6, 18, 3))
+
+    @override_settings(CONVENIOS_EXCLUSAO_SINCRONA_MAX=3)
+    def test_job_em_segundo_plano(self):
+        response = self.client.post(reverse("convenios:delete_selected"), {"ids": self.ids})
+        job = ExclusaoJob.objects.get()
+        self.assertRedirects(
+            response, f"{reverse('convenios:list')}?exclusao={job.pk}", fetch_redirect_response=False
+        )
+        self.assertEqual((job.status, job.total), (ExclusaoJob.Status.PENDENTE, 5))
+        self.assertEqual(Convenio.objects.count(), 5)
+
+        call_command("processar_exclusoes", "--once", stdout=StringIO())
+
+        status = self.client.get(reverse("convenios:exclusao_status", args=[job.pk])).json()
+        self.assertEqual(
+            (status["status"], status["processados"], status["apagados"]), (ExclusaoJob.Status.CONCLUIDO, 5, 5)
+        )
+        self.assertEqual(self._restantes(), (0, 0, 0, 0, 0))
+
+    def test_job_retoma_de_onde_parou(self):
+        job = exclusao.enfileirar(self.ids)
+        ExclusaoJob.objects.filter(pk=job.pk).update(processados=2, apagados=2)
+        exclusao.processar(job.pk)
+        job.refresh_from_db()
+        self.assertEqual((job.processados, job.apagados), (5, 5))
+        self.assertEqual(Convenio.objects.count(), 2)
+
+    @override_settings(CONVENIOS_EXCLUSAO_EXECUTOR="thread")
+    def test_manutencao_no_modo_thread(self):
+        executor = mock.Mock()
+        with mock.patch.object(exclusao, "_get_executor", return_value=executor), \
+                mock.patch.object(exclusao, "_ultima_manutencao", None):
+            job = exclusao.enfileirar(self.ids)
+            # interrompido por um reinício no meio da exclusão
+            ExclusaoJob.objects.filter(pk=job.pk).update(
+                status=ExclusaoJob.Status.PROCESSANDO, iniciado_em=timezone.now() - timedelta(hours=2)
+            )
+            self.client.get(reverse("convenios:exclusao_status", args=[job.pk]))
+            # enfileirar já agendou a manutenção: o status não agenda outra no intervalo
+            executor.submit.assert_called_once_with(exclusao._manutencao_em_thread)
+
+            executor.reset_mock()
+            self.assertEqual(exclusao.manutencao(), 1)
+        executor.submit.assert_called_once_with(exclusao._processar_em_thread, job.pk)
+        self.assertEqual(ExclusaoJob.objects.get(pk=job.pk).status, ExclusaoJob.Status.PENDENTE)
+
+
+class ConvenioAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser("admin", "admin@example.com", "senha")
+
+    def _criar(self, n):
+        inicio = Convenio.objects.count()
+        Convenio.objects.bulk_create(
+            Convenio(
+                tipo=Convenio.Tipo.FEDERAL,
+                numero_convenio=f"CV-{inicio + i}",
+                orgao_concedente=f"Órgão {(inicio + i) % 7}",
+                objeto="Objeto",
+                valor_repasse=Decimal("100.00"),
+                vigencia_inicio=date(2025, 1, 1),
+                vigencia_fim=date(2026, 12, 31),
+            )
+            for i in range(n)
+        )
+        ConvenioResumo.atualizar()
+        invalidar_dashboard()
+
+    def _queries(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("admin:convenios_convenio_changelist"), params)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_queries_constantes_por_pagina(self):
+        self.client.force_login(self.admin)
+        self._criar(10)
+        poucos = self._queries()
+        self._criar(90)
+        self.assertEqual(self._queries(), poucos)
+        # ordenação pelas colunas do resumo
+        self.assertEqual(self._queries(o="-13"), poucos - 1)
+
+    def test_filtro_de_orgao_em_cache(self):
+        self.client.force_login(self.admin)
+        self._criar(14)
+        frio = self._queries()
+        self.assertEqual(self._queries(), frio - 1)
+
+        response = self.client.get(reverse("admin:convenios_convenio_changelist"), {"orgao_concedente": "Órgão 3"})
+        self.assertEqual(response.context["cl"].result_count, 2)
+
+        # a versão do dashboard (chave do cache do filtro) só muda no commit
+        with self.captureOnCommitCallbacks(execute=True):
+            Convenio.objects.create(
+                tipo=Convenio.Tipo.FEDERAL, orgao_concedente="Órgão novo", objeto="Objeto",
+                vigencia_inicio=date(2025, 1, 1), vigencia_fim=date(2026, 12, 31),
+            )
+        response = self.client.get(reverse("admin:convenios_convenio_changelist"))
+        orgaos = [valor for valor, _ in response.context["cl"].filter_specs[-1].lookup_choices]
+        self.assertIn("Órgão novo", orgaos)
@@ -1,23 +1,91 @@
+from django.conf import settings
+from django.http import JsonResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.views.decorators.http import require_POST
 
-from .models import Convenio
-from .forms import ConvenioForm
+from core.paginacao import paginar_keyset, tamanho_pagina
+
+from . import exclusao
+from .filtros import aplicar_filtros, filtros_dict
+from .importacao import ImportacaoErro, importar
+from .models import Convenio, ExclusaoJob
+from .forms import ConvenioForm, ImportacaoForm
+
+# erros exibidos na tela de importação (o relatório completo sai pelo import_convenios --erros)
+ERROS_NA_TELA = 500
+
+
+def _tamanho_pagina(params) -> int:
+    return tamanho_pagina(params, settings.CONVENIOS_PAGINA_TAMANHO, settings.CONVENIOS_PAGINA_MAX)
 
 
 def convenios_list(request):
-    qs = Convenio.objects.all().order_by("-id")
+    """
+    Lista paginada por keyset em -id (?depois=/?antes= com o cursor), sem COUNT(*).
+    Aceita os mesmos filtros dos relatórios (convenios/filtros.py).
+    """
+    # só as colunas exibidas (objeto e o tsvector de busca ficam de fora)
+    qs = aplicar_filtros(request.GET, Convenio.objects.all()).only(
+        "id", "tipo", "numero_convenio", "orgao_concedente", "vigencia_fim", "status"
+    )
+    tamanho = _tamanho_pagina(request.GET)
+    pagina = paginar_keyset(
+        qs,
+        ("-id",),
+        depois=request.GET.get("depois"),
+        antes=request.GET.get("antes"),
+        tamanho=tamanho,
+    )
+
+    # filtros (e tamanho, se informado) seguem nos links de navegação
+    base = filtros_dict(request.GET)
+    if "tamanho" in request.GET:
+        base["tamanho"] = tamanho
+
+    return render(
+        request,
+        "convenios/lista.html",
+        {
+            "convenios": pagina.itens,
+            "pagina": pagina,
+            "filtros": base,
+            "url_proximo": f"?{urlencode({**base, 'depois': pagina.proximo})}" if pagina.tem_proximo else "",
+            "url_anterior": f"?{urlencode({**base, 'antes': pagina.anterior})}" if pagina.tem_anterior else "",
+            "exclusao_id": request.GET.get("exclusao", ""),
+        },
+    )
 
-    # (Opcional) se um dia você quiser filtrar na lista por pago/não pago via URL:
-    # /convenios/?repasse_recebido=1  (pagos)
-    # /convenios/?repasse_recebido=0  (não pagos)
-    repasse_recebido = (request.GET.get("repasse_recebido") or "").strip()
-    if repasse_recebido == "1":
-        qs = qs.filter(repasse_recebido=True)
-    elif repasse_recebido == "0":
-        qs = qs.filter(repasse_recebido=False)
 
-    return render(request, "convenios/lista.html", {"convenios": qs})
+def convenios_importar(request):
+    """Upload de CSV/XLSX de convênios, contratos ou pagamentos (convenios/importacao.py)."""
+    resultado = None
+    if request.method == "POST":
+        form = ImportacaoForm(request.POST, request.FILES)
+        if form.is_valid():
+            arquivo = form.cleaned_data["arquivo"]
+            try:
+                resultado = importar(
+                    arquivo,
+                    tipo=form.cleaned_data["tipo"],
+                    nome=arquivo.name,
+                    dry_run=form.cleaned_data["dry_run"],
+                )
+            except ImportacaoErro as exc:
+                form.add_error("arquivo", str(exc))
+    else:
+        form = ImportacaoForm()
+
+    return render(
+        request,
+        "convenios/importar.html",
+        {
+            "form": form,
+            "resultado": resultado,
+            "erros": resultado.erros[:ERROS_NA_TELA] if resultado else [],
+        },
+    )
 
 
 def convenio_create(request):
@@ -65,7 +133,30 @@ def convenio_delete(request, pk):
 
 @require_POST
 def convenios_delete_selected(request):
-    ids = request.POST.getlist("ids")
+    """
+    Apaga os convênios marcados em lotes; seleções acima de CONVENIOS_EXCLUSAO_SINCRONA_MAX
+    vão para um ExclusaoJob.
+    """
+    ids = [i for i in request.POST.getlist("ids") if i.isdigit()]
+
+    if len(ids) > settings.CONVENIOS_EXCLUSAO_SINCRONA_MAX:
+        job = exclusao.enfileirar(ids, user=request.user)
+        return redirect(f"{reverse('convenios:list')}?exclusao={job.pk}")
+
     if ids:
-        Convenio.objects.filter(id__in=ids).delete()
+        exclusao.apagar_convenios(ids)
     return redirect("convenios:list")
+
+
+def exclusao_status(request, pk):
+    # modo thread: um job interrompido por um reinício volta à fila enquanto é consultado
+    exclusao.manter_fila()
+    job = get_object_or_404(ExclusaoJob, pk=pk)
+    return JsonResponse({
+        "id": job.pk,
+        "status": job.status,
+        "total": job.total,
+        "processados": job.processados,
+        "apagados": job.apagados,
+        "erro": job.erro,
+    })
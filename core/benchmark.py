@@ -0,0 +1,196 @@
+"""
+Benchmark das rotas pesadas pelo test client (`manage.py bench_perf`).
+
+Cada cenário é uma requisição GET a uma rota nomeada; o runner mede, por cenário:
+- queries por requisição (todas as conexões), tempo de parede p50/p95/p99/máx;
+- pico de memória Python (tracemalloc) numa requisição extra, fora das medições
+  de tempo (o tracemalloc deixa tudo bem mais lento).
+
+Por padrão os caches ficam quentes (uma requisição de aquecimento antes de medir);
+com `frio=True` o cache do Django e o cache de PDFs são limpos antes de cada requisição.
+O resultado é um dict serializável em JSON, comparável entre commits (comparar()).
+Rode dentro de uma transação desfeita no fim (o comando faz isso): o usuário staff
+usado nos changelists do admin é criado na hora.
+"""
+import gc
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+
+@dataclass
+class Cenario:
+    nome: str
+    rota: str
+    params: dict = field(default_factory=dict)
+    staff: bool = False
+
+
+CENARIOS = (
+    Cenario("dashboard", "dashboard"),
+    Cenario("dashboard_data", "dashboard_data"),
+    Cenario("relatorios_dados", "relatorios:relatorios_dados"),
+    Cenario("relatorios_dados_filtro", "relatorios:relatorios_dados",
+            {"tipo": "FEDERAL", "status": "Vencendo", "repasse_recebido": "0"}),
+    # PDF com filtro estreito: o custo é o do WeasyPrint, não o da massa inteira
+    Cenario("relatorio_pdf", "relatorios:relatorio_pdf", {"tipo": "ESPECIAL", "status": "Vencendo"}),
+    Cenario("convenios_list", "convenios:list"),
+    Cenario("convenios_list_busca", "convenios:list", {"q": "saude"}),
+    Cenario("admin_convenios", "admin:convenios_convenio_changelist", staff=True),
+    Cenario("admin_contratos", "admin:contratos_contrato_changelist", staff=True),
+    Cenario("admin_pagamentos", "admin:financeiro_pagamento_changelist", staff=True),
+)
+
+BENCH_USERNAME = "bench_perf"
+
+
+def percentil(valores, p):
+    """Percentil com interpolação linear (valores em qualquer ordem)."""
+    valores = sorted(valores)
+    if not valores:
+        return 0
+    k = (len(valores) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(valores) - 1)
+    return valores[i] + (valores[j] - valores[i]) * (k - i)
+
+
+def _usuario_staff():
+    User = get_user_model()
+    user, _ = User.objects.get_or_create(
+        username=BENCH_USERNAME, defaults={"is_staff": True, "is_superuser": True}
+    )
+    return user
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=5, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Runner:
+    def __init__(self, repeticoes=20, frio=False, cenarios=CENARIOS):
+        self.repeticoes = repeticoes
+        self.frio = frio
+        self.cenarios = cenarios
+        self.anonimo = Client()
+        self.staff = Client()
+        self.staff.force_login(_usuario_staff())
+
+    def _limpar_caches(self):
+        cache.clear()
+        for arquivo in self._pdf_dir.glob("*.pdf"):
+            arquivo.unlink(missing_ok=True)
+
+    def _requisitar(self, cenario):
+        cliente = self.staff if cenario.staff else self.anonimo
+        response = cliente.get(reverse(cenario.rota), cenario.params)
+        if response.status_code != 200:
+            raise RuntimeError(f"{cenario.nome}: HTTP {response.status_code}")
+        # respostas em streaming (FileResponse) só custam ao serem consumidas
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response
+
+    def medir(self, cenario):
+        if not self.frio:
+            self._requisitar(cenario)
+
+        tempos, queries = [], []
+        for _ in range(self.repeticoes):
+            if self.frio:
+                self._limpar_caches()
+            with ExitStack() as stack:
+                capturas = [stack.enter_context(CaptureQueriesContext(c)) for c in connections.all()]
+                inicio = time.perf_counter()
+                self._requisitar(cenario)
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            queries.append(sum(len(c.captured_queries) for c in capturas))
+
+        if self.frio:
+            self._limpar_caches()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            self._requisitar(cenario)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "rota": cenario.rota,
+            "params": cenario.params,
+            "queries": max(queries),
+            "queries_min": min(queries),
+            "p50_ms": round(statistics.median(tempos), 2),
+            "p95_ms": round(percentil(tempos, 95), 2),
+            "p99_ms": round(percentil(tempos, 99), 2),
+            "max_ms": round(max(tempos), 2),
+            "pico_memoria_kb": round(pico / 1024),
+        }
+
+    def executar(self):
+        from contratos.models import Aditivo, Contrato
+        from convenios.models import Convenio
+        from financeiro.models import Pagamento
+
+        resultado = {
+            "commit": _commit(),
+            "data": timezone.now().isoformat(timespec="seconds"),
+            "banco": connections["default"].vendor,
+            "repeticoes": self.repeticoes,
+            "cache": "frio" if self.frio else "quente",
+            "linhas": {
+                "convenios": Convenio.objects.count(),
+                "contratos": Contrato.objects.count(),
+                "aditivos": Aditivo.objects.count(),
+                "pagamentos": Pagamento.objects.count(),
+            },
+            "cenarios": {},
+        }
+        # PDFs num diretório temporário: não mistura com (nem apaga) o cache real
+        with tempfile.TemporaryDirectory(prefix="bench_pdf_") as pdf_dir, override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"],
+            RELATORIOS_PDF_CACHE_DIR=pdf_dir,
+            INSTRUMENTACAO_ORCAMENTO_ESTRITO=False,
+        ):
+            self._pdf_dir = Path(pdf_dir)
+            for cenario in self.cenarios:
+                try:
+                    resultado["cenarios"][cenario.nome] = self.medir(cenario)
+                except Exception as e:  # ex.: WeasyPrint ausente; os demais cenários seguem
+                    resultado["cenarios"][cenario.nome] = {"rota": cenario.rota, "erro": f"{type(e).__name__}: {e}"}
+        return resultado
+
+
+def comparar(anterior, atual):
+    """Diferenças por cenário (atual - anterior) de queries, p50/p95 e memória."""
+    diferencas = {}
+    for nome, m in atual["cenarios"].items():
+        a = anterior.get("cenarios", {}).get(nome)
+        if not a or "erro" in a or "erro" in m:
+            continue
+        diferencas[nome] = {
+            chave: round(m[chave] - a[chave], 2)
+            for chave in ("queries", "p50_ms", "p95_ms", "pico_memoria_kb")
+        }
+    return diferencas
@@ -0,0 +1,26 @@
+"""
+Versão dos dados do dashboard no cache do Django.
+
+A versão é um timestamp trocado a cada save/delete de Convenio (core/signals.py).
+As chaves de cache do dashboard incluem versão + data local, então uma alteração
+ou a virada do dia geram chaves novas sem precisar apagar nada.
+"""
+import time
+
+from django.core.cache import cache
+
+DASHBOARD_VERSAO_KEY = "dashboard:versao"
+
+
+def dashboard_versao() -> float:
+    versao = cache.get(DASHBOARD_VERSAO_KEY)
+    if versao is None:
+        cache.add(DASHBOARD_VERSAO_KEY, time.time(), None)
+        versao = cache.get(DASHBOARD_VERSAO_KEY, time.time())
+    return versao
+
+
+def invalidar_dashboard():
+    # sempre avança ao menos 1 ms (a ETag usa milissegundos)
+    anterior = cache.get(DASHBOARD_VERSAO_KEY) or 0
+    cache.set(DASHBOARD_VERSAO_KEY, max(time.time(), anterior + 0.001), None)
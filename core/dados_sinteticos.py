@@ -0,0 +1,216 @@
+"""
+Massa de dados sintética para medir desempenho (`manage.py seed_perf_data`).
+
+Determinística: a mesma seed + data base geram exatamente as mesmas linhas. As datas são
+relativas à data base (padrão: hoje) para que os filtros de vigência (Vencidos, Vencendo,
+OK) tenham a mesma distribuição em qualquer dia.
+
+Gera em blocos de convênios: cada bloco cria seus convênios, contratos, aditivos e
+pagamentos com bulk_create e atualiza o ConvenioResumo, então a memória não cresce com
+o volume total. bulk_create não dispara signals: no fim o cubo dos relatórios é
+reconstruído e o cache do dashboard é invalidado.
+
+Tudo que é gerado aqui usa o prefixo PREFIXO (numero_convenio / razão social), o que
+permite apagar a massa anterior sem tocar em dados reais.
+"""
+import random
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from contratos.models import Aditivo, Contrato, Empresa
+from convenios.models import Convenio, ConvenioResumo
+from core.cache import invalidar_dashboard
+from financeiro.models import Pagamento
+from relatorios import cubo
+
+PREFIXO = "PERF"
+
+ORGAOS = (
+    "Ministério da Saúde", "Ministério da Educação", "Ministério das Cidades",
+    "Ministério da Agricultura", "Ministério do Esporte", "Secretaria de Obras",
+    "Secretaria de Saúde", "Secretaria de Educação", "Fundo Nacional de Saúde", "FNDE",
+)
+OBJETOS = (
+    "Pavimentação asfáltica de vias urbanas", "Construção de unidade básica de saúde",
+    "Aquisição de equipamentos hospitalares", "Reforma de escola municipal",
+    "Aquisição de ônibus escolar", "Construção de quadra poliesportiva",
+    "Aquisição de máquinas agrícolas", "Drenagem pluvial e calçamento",
+)
+OBJETOS_CONTRATO = (
+    "Execução de obra", "Fornecimento de equipamentos", "Prestação de serviços de engenharia",
+    "Fornecimento de materiais", "Supervisão e fiscalização",
+)
+
+
+@dataclass
+class Volumes:
+    convenios: int = 100_000
+    contratos: int = 500_000
+    aditivos: int = 5_000_000
+    pagamentos: int = 5_000_000
+    empresas: int = 5_000
+
+
+@dataclass
+class Criados:
+    empresas: int = 0
+    convenios: int = 0
+    contratos: int = 0
+    aditivos: int = 0
+    pagamentos: int = 0
+
+
+def _distribuir(total, partes, i):
+    """Quantos dos `total` filhos cabem ao pai `i` de `partes` (soma exata = total)."""
+    return (i + 1) * total // partes - i * total // partes
+
+
+def _reais(rnd, minimo, maximo):
+    return Decimal(rnd.randint(minimo * 100, maximo * 100)) / 100
+
+
+def existe_massa() -> bool:
+    return Convenio.objects.filter(numero_convenio__startswith=f"{PREFIXO}-").exists()
+
+
+def apagar_massa() -> int:
+    """Apaga convênios (com a cascata) e empresas gerados por uma execução anterior."""
+    from convenios.exclusao import apagar_convenios
+
+    ids = Convenio.objects.filter(numero_convenio__startswith=f"{PREFIXO}-").values_list("pk", flat=True)
+    apagados = apagar_convenios(list(ids))
+    Empresa.objects.filter(razao_social__startswith=f"{PREFIXO} ", contratos__isnull=True).delete()
+    return apagados
+
+
+def gerar(volumes: Volumes, seed=42, data_base=None, bloco=1000, batch_size=5000, progresso=None) -> Criados:
+    """
+    Gera a massa. `bloco` = convênios por transação; `progresso(criados)` é chamado após
+    cada bloco confirmado.
+    """
+    rnd = random.Random(seed)
+    data_base = data_base or timezone.localdate()
+    criados = Criados()
+
+    empresas = _gerar_empresas(volumes.empresas, rnd, batch_size)
+    criados.empresas = len(empresas)
+
+    for inicio in range(0, volumes.convenios, bloco):
+        fim = min(inicio + bloco, volumes.convenios)
+        with transaction.atomic():
+            convenios = Convenio.objects.bulk_create(
+                [_convenio(i, rnd, data_base) for i in range(inicio, fim)], batch_size=batch_size
+            )
+
+            contratos = []
+            for i, convenio in zip(range(inicio, fim), convenios):
+                for j in range(_distribuir(volumes.contratos, volumes.convenios, i)):
+                    contratos.append(_contrato(convenio, j, rnd, empresas))
+            contratos = Contrato.objects.bulk_create(contratos, batch_size=batch_size)
+
+            # aditivos/pagamentos distribuídos pela posição global do contrato
+            primeiro = inicio * volumes.contratos // volumes.convenios
+            aditivos, pagamentos = [], []
+            for k, contrato in enumerate(contratos, start=primeiro):
+                for j in range(_distribuir(volumes.aditivos, volumes.contratos, k)):
+                    aditivos.append(_aditivo(contrato, j, rnd))
+                qtd = _distribuir(volumes.pagamentos, volumes.contratos, k)
+                for j in range(qtd):
+                    pagamentos.append(_pagamento(contrato, j, qtd, rnd))
+            Aditivo.objects.bulk_create(aditivos, batch_size=batch_size)
+            Pagamento.objects.bulk_create(pagamentos, batch_size=batch_size)
+
+            ConvenioResumo.atualizar([c.pk for c in convenios])
+
+        criados.convenios += len(convenios)
+        criados.contratos += len(contratos)
+        criados.aditivos += len(aditivos)
+        criados.pagamentos += len(pagamentos)
+        if progresso is not None:
+            progresso(criados)
+
+    cubo.reconstruir()
+    transaction.on_commit(invalidar_dashboard)
+    return criados
+
+
+def _gerar_empresas(n, rnd, batch_size):
+    empresas = [
+        Empresa(
+            cnpj=f"{i:08d}/0001-{rnd.randint(10, 99)}",
+            razao_social=f"{PREFIXO} Empresa {i} Ltda",
+            nome_fantasia=f"Empresa {i}" if rnd.random() < 0.5 else None,
+        )
+        for i in range(max(n, 1))
+    ]
+    return Empresa.objects.bulk_create(empresas, batch_size=batch_size)
+
+
+def _convenio(i, rnd, data_base):
+    inicio = data_base - timedelta(days=rnd.randint(0, 1500))
+    fim = inicio + timedelta(days=rnd.randint(180, 1800))
+    repasse = _reais(rnd, 50_000, 5_000_000)
+    return Convenio(
+        tipo=rnd.choice(Convenio.Tipo.values),
+        status=rnd.choice(Convenio.Status.values),
+        numero_convenio=f"{PREFIXO}-{i:07d}",
+        numero_proposta=f"{rnd.randint(1, 99999):05d}/{inicio.year}",
+        parlamentar_nome=f"Parlamentar {rnd.randint(1, 300)}" if rnd.random() < 0.7 else None,
+        orgao_concedente=rnd.choice(ORGAOS),
+        objeto=f"{rnd.choice(OBJETOS)} - lote {rnd.randint(1, 50)}",
+        valor_repasse=repasse,
+        valor_contrapartida=(repasse * Decimal(rnd.choice((0, 1, 2, 5, 10))) / 100).quantize(Decimal("0.01")),
+        vigencia_inicio=inicio,
+        vigencia_fim=fim,
+        repasse_recebido=rnd.random() < 0.6,
+        foi_licitado=rnd.random() < 0.8,
+    )
+
+
+def _contrato(convenio, j, rnd, empresas):
+    inicio = convenio.vigencia_inicio + timedelta(days=rnd.randint(0, 120))
+    return Contrato(
+        convenio=convenio,
+        empresa=rnd.choice(empresas),
+        numero_contrato=f"{convenio.numero_convenio}/C{j + 1}",
+        objeto_contratado=rnd.choice(OBJETOS_CONTRATO),
+        valor_contratado=_reais(rnd, 10_000, 2_000_000),
+        data_inicio=inicio,
+        data_fim=inicio + timedelta(days=rnd.randint(90, 900)),
+        status=rnd.choice(Contrato.Status.values),
+    )
+
+
+def _aditivo(contrato, j, rnd):
+    tipo = rnd.choice(Aditivo.Tipo.values)
+    acrescimo = supressao = Decimal("0")
+    if tipo in (Aditivo.Tipo.VALOR, Aditivo.Tipo.QUANTITATIVO, Aditivo.Tipo.REAJUSTE):
+        acrescimo = (contrato.valor_contratado * Decimal(rnd.randint(1, 5)) / 100).quantize(Decimal("0.01"))
+    elif tipo == Aditivo.Tipo.SUPRESSAO:
+        supressao = (contrato.valor_contratado * Decimal(rnd.randint(1, 3)) / 100).quantize(Decimal("0.01"))
+    return Aditivo(
+        contrato=contrato,
+        tipo=tipo,
+        numero_aditivo=f"{j + 1}º TA",
+        data=contrato.data_inicio + timedelta(days=rnd.randint(30, 900)),
+        valor_acrescimo=acrescimo,
+        valor_supressao=supressao,
+        dias_prazo=rnd.choice((0, 30, 90, 180)) if tipo == Aditivo.Tipo.PRAZO else 0,
+    )
+
+
+def _pagamento(contrato, j, qtd, rnd):
+    # parcelas somam ~60-105% do valor contratado (algumas passam: casos de sobrepagamento)
+    parcela = contrato.valor_contratado * Decimal(rnd.randint(60, 105)) / 100 / qtd
+    return Pagamento(
+        contrato=contrato,
+        data=contrato.data_inicio + timedelta(days=rnd.randint(1, 900)),
+        valor_pago=parcela.quantize(Decimal("0.01")),
+        numero_empenho=f"{contrato.data_inicio.year}NE{rnd.randint(1, 99999):05d}",
+        numero_ob=f"{contrato.data_inicio.year}OB{rnd.randint(1, 999999):06d}",
+        numero_nf=str(rnd.randint(1, 999999)),
+    )
@@ -0,0 +1,23 @@
+from decimal import Decimal
+
+from django.db import models
+from django.db.models import Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+# Mesmo formato dos campos monetários dos models (max_digits=14, decimal_places=2)
+MONEY = models.DecimalField(max_digits=14, decimal_places=2)
+
+
+def soma_subquery(queryset, expressao, agrupar_por):
+    """
+    Subquery escalar com SUM(expressao) do queryset agrupado por `agrupar_por`.
+    O queryset já deve vir filtrado por OuterRef(...). Sem linhas -> 0.
+    """
+    subquery = (
+        queryset.order_by()
+        .values(agrupar_por)
+        .annotate(total=Sum(expressao, output_field=MONEY))
+        .values("total")
+    )
+    return Coalesce(Subquery(subquery, output_field=MONEY), Value(Decimal("0")), output_field=MONEY)
@@ -0,0 +1,344 @@
+"""
+Instrumentação de requisições: queries, tempo de SQL, de view e de template por rota.
+
+- InstrumentacaoMiddleware (primeiro do MIDDLEWARE) mede a requisição inteira e instala
+  um execute_wrapper em cada conexão para contar as queries e somar o tempo de SQL.
+- O tempo de template vem do render() do backend de templates do Django, envolvido
+  uma vez em CoreConfig.ready() (instalar()).
+- As respostas levam um header Server-Timing (DevTools > Network > Timing), por padrão só
+  com DEBUG ou para staff: tempo de SQL e nº de queries não são para o público
+  (INSTRUMENTACAO_SERVER_TIMING).
+- Os valores são agregados em histogramas por nome de rota (resolver_match.view_name)
+  no próprio processo. De tempos em tempos cada processo grava seu retrato no cache
+  do Django, de onde `manage.py instrumentacao` e /api/instrumentacao/ (staff) leem
+  a soma de todos os processos (com vários processos, use um cache compartilhado: CACHE_DIR).
+- INSTRUMENTACAO_ORCAMENTOS limita as queries por rota: acima do limite loga um aviso,
+  ou levanta OrcamentoExcedido com INSTRUMENTACAO_ORCAMENTO_ESTRITO (testes).
+- "conexoes" conta as conexões novas abertas na requisição (connection_created): com
+  CONN_MAX_AGE/pool funcionando fica em 0 quase sempre. Junto com os histogramas vai a
+  configuração de conexão de cada processo e, com DB_POOL, as estatísticas do pool psycopg.
+
+Tempos em milissegundos. "view" = total - template; SQL executado durante o render do
+template (querysets preguiçosos) conta em "sql" e em "template".
+"""
+import contextvars
+import copy
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+LIMITES_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+LIMITES_QUERIES = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+METRICAS = {
+    "queries": LIMITES_QUERIES,
+    "conexoes": (0, 1, 2, 5),
+    "sql_ms": LIMITES_MS,
+    "view_ms": LIMITES_MS,
+    "template_ms": LIMITES_MS,
+    "total_ms": LIMITES_MS,
+}
+
+CACHE_PROCESSOS_KEY = "instrumentacao:processos"
+CACHE_TTL = 24 * 3600
+
+PROCESSO = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class OrcamentoExcedido(AssertionError):
+    """Rota executou mais queries que o orçamento (INSTRUMENTACAO_ORCAMENTOS)."""
+
+
+# =========================
+# Medição da requisição atual
+# =========================
+
+class Medicao:
+    def __init__(self):
+        self.queries = 0
+        self.conexoes = 0
+        self.sql_ms = 0.0
+        self.template_ms = 0.0
+        self._profundidade_template = 0
+
+    def wrapper(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_ms += (time.perf_counter() - inicio) * 1000
+            self.queries += 1
+
+
+_atual = contextvars.ContextVar("instrumentacao_medicao", default=None)
+
+
+def medicao_atual():
+    return _atual.get()
+
+
+def _conexao_criada(sender, connection, **kwargs):
+    medicao = _atual.get()
+    if medicao is not None:
+        medicao.conexoes += 1
+
+
+_instalado = False
+
+
+def instalar():
+    """
+    Envolve o render() dos templates Django para medir o tempo de template e passa a
+    contar as conexões novas (idempotente).
+    """
+    global _instalado
+    if _instalado:
+        return
+    connection_created.connect(_conexao_criada, dispatch_uid="instrumentacao_conexao_criada")
+    from django.template.backends.django import Template
+
+    original = Template.render
+
+    def render(self, context=None, request=None):
+        medicao = _atual.get()
+        if medicao is None:
+            return original(self, context, request)
+        # render_to_string dentro de um template não conta duas vezes
+        medicao._profundidade_template += 1
+        inicio = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            medicao._profundidade_template -= 1
+            if medicao._profundidade_template == 0:
+                medicao.template_ms += (time.perf_counter() - inicio) * 1000
+
+    Template.render = render
+    _instalado = True
+
+
+# =========================
+# Histogramas (por processo)
+# =========================
+
+_lock = threading.Lock()
+_estatisticas = {}
+_ultimo_envio = 0.0
+
+
+def _novo_histograma(limites):
+    return {"limites": list(limites), "contagens": [0] * (len(limites) + 1), "n": 0, "soma": 0.0, "max": 0.0}
+
+
+def _registrar_valor(hist, valor):
+    hist["contagens"][bisect_left(hist["limites"], valor)] += 1
+    hist["n"] += 1
+    hist["soma"] += valor
+    hist["max"] = max(hist["max"], valor)
+
+
+def _mesclar(destino, origem):
+    for nome, metricas in origem.items():
+        alvo = destino.setdefault(nome, {})
+        for metrica, hist in metricas.items():
+            if metrica not in alvo:
+                alvo[metrica] = copy.deepcopy(hist)
+                continue
+            a = alvo[metrica]
+            a["contagens"] = [x + y for x, y in zip(a["contagens"], hist["contagens"])]
+            a["n"] += hist["n"]
+            a["soma"] += hist["soma"]
+            a["max"] = max(a["max"], hist["max"])
+    return destino
+
+
+def percentil(hist, p):
+    """Percentil aproximado: limite superior do bucket (no último bucket, o máximo visto)."""
+    if not hist["n"]:
+        return 0
+    alvo = hist["n"] * p / 100
+    acumulado = 0
+    for i, contagem in enumerate(hist["contagens"]):
+        acumulado += contagem
+        if acumulado >= alvo:
+            return min(hist["limites"][i], hist["max"]) if i < len(hist["limites"]) else hist["max"]
+    return hist["max"]
+
+
+def resumir(hist):
+    n = hist["n"]
+    return {
+        "n": n,
+        "media": round(hist["soma"] / n, 2) if n else 0,
+        "p50": percentil(hist, 50),
+        "p95": percentil(hist, 95),
+        "p99": percentil(hist, 99),
+        "max": round(hist["max"], 2),
+        "buckets": dict(zip([f"<={x}" for x in hist["limites"]] + ["+inf"], hist["contagens"])),
+    }
+
+
+def registrar(nome, valores):
+    with _lock:
+        metricas = _estatisticas.setdefault(
+            nome, {m: _novo_histograma(limites) for m, limites in METRICAS.items()}
+        )
+        for metrica, valor in valores.items():
+            _registrar_valor(metricas[metrica], valor)
+    _enviar_ao_cache()
+
+
+def retrato():
+    """Cópia dos histogramas deste processo."""
+    with _lock:
+        return copy.deepcopy(_estatisticas)
+
+
+def _enviar_ao_cache(forcar=False):
+    global _ultimo_envio
+    agora = time.monotonic()
+    if not forcar and agora - _ultimo_envio < settings.INSTRUMENTACAO_ENVIO_SEGUNDOS:
+        return
+    _ultimo_envio = agora
+    try:
+        cache.set(f"instrumentacao:{PROCESSO}", retrato(), CACHE_TTL)
+        cache.set(f"instrumentacao:conexoes:{PROCESSO}", conexoes(), CACHE_TTL)
+        processos = set(cache.get(CACHE_PROCESSOS_KEY) or ())
+        if PROCESSO not in processos:
+            cache.set(CACHE_PROCESSOS_KEY, sorted(processos | {PROCESSO}), CACHE_TTL)
+    except Exception:
+        logger.exception("Falha ao gravar a instrumentação no cache")
+
+
+def coletar():
+    """Histogramas somados de todos os processos (cache) + os atuais deste processo."""
+    total = {}
+    for processo in cache.get(CACHE_PROCESSOS_KEY) or ():
+        if processo != PROCESSO:
+            _mesclar(total, cache.get(f"instrumentacao:{processo}") or {})
+    return _mesclar(total, retrato())
+
+
+def conexoes():
+    """Configuração de conexão de cada banco neste processo e, com pool, suas estatísticas."""
+    dados = {}
+    for alias in connections:
+        conexao = connections[alias]
+        info = {
+            "vendor": conexao.vendor,
+            "conn_max_age": conexao.settings_dict["CONN_MAX_AGE"],
+            "health_checks": conexao.settings_dict["CONN_HEALTH_CHECKS"],
+        }
+        if conexao.settings_dict["OPTIONS"].get("pool"):
+            # pool_size, pool_available, requests_waiting, requests_wait_ms, connections_num...
+            info["pool"] = conexao.pool.get_stats()
+        dados[alias] = info
+    return dados
+
+
+def coletar_conexoes():
+    """Conexões por processo (cache), com o processo atual sempre em dia."""
+    dados = {
+        processo: cache.get(f"instrumentacao:conexoes:{processo}")
+        for processo in cache.get(CACHE_PROCESSOS_KEY) or ()
+        if processo != PROCESSO
+    }
+    dados[PROCESSO] = conexoes()
+    return {processo: info for processo, info in sorted(dados.items()) if info is not None}
+
+
+def relatorio():
+    return {
+        nome: {metrica: resumir(hist) for metrica, hist in metricas.items()}
+        for nome, metricas in sorted(coletar().items())
+    }
+
+
+def limpar():
+    global _ultimo_envio
+    with _lock:
+        _estatisticas.clear()
+    for processo in cache.get(CACHE_PROCESSOS_KEY) or ():
+        cache.delete_many([f"instrumentacao:{processo}", f"instrumentacao:conexoes:{processo}"])
+    cache.delete(CACHE_PROCESSOS_KEY)
+    _ultimo_envio = 0.0
+
+
+# =========================
+# Middleware
+# =========================
+
+def verificar_orcamento(nome, queries):
+    limite = settings.INSTRUMENTACAO_ORCAMENTOS.get(nome)
+    if limite is None or queries <= limite:
+        return
+    mensagem = f"{nome}: {queries} queries (orçamento: {limite})"
+    if settings.INSTRUMENTACAO_ORCAMENTO_ESTRITO:
+        raise OrcamentoExcedido(mensagem)
+    logger.warning("Orçamento de queries excedido - %s", mensagem)
+
+
+def _expor_server_timing(request) -> bool:
+    modo = settings.INSTRUMENTACAO_SERVER_TIMING
+    if modo != "staff":
+        return modo == "1"
+    if settings.DEBUG:
+        return True
+    # depois da medição: a leitura da sessão/usuário aqui não entra nas contagens
+    user = getattr(request, "user", None)
+    return bool(user is not None and user.is_staff)
+
+
+class InstrumentacaoMiddleware:
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTACAO_ATIVA:
+            raise MiddlewareNotUsed
+        instalar()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        medicao = Medicao()
+        token = _atual.set(medicao)
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for conexao in connections.all():
+                    stack.enter_context(conexao.execute_wrapper(medicao.wrapper))
+                response = self.get_response(request)
+        finally:
+            _atual.reset(token)
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        match = getattr(request, "resolver_match", None)
+        nome = match.view_name if match else "<sem rota>"
+        registrar(nome, {
+            "queries": medicao.queries,
+            "conexoes": medicao.conexoes,
+            "sql_ms": medicao.sql_ms,
+            "view_ms": total_ms - medicao.template_ms,
+            "template_ms": medicao.template_ms,
+            "total_ms": total_ms,
+        })
+
+        if _expor_server_timing(request):
+            response["Server-Timing"] = ", ".join([
+                f'sql;dur={medicao.sql_ms:.1f};desc="{medicao.queries} queries"',
+                f"view;dur={total_ms - medicao.template_ms:.1f}",
+                f"tpl;dur={medicao.template_ms:.1f}",
+                f"total;dur={total_ms:.1f}",
+                f'db-connect;desc="{medicao.conexoes} novas"',
+            ])
+
+        verificar_orcamento(nome, medicao.queries)
+        return response
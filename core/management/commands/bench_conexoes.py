@@ -0,0 +1,139 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+# Cada variante roda num processo novo (as settings de conexão vêm do ambiente).
+# As requisições passam pelo WSGIHandler de verdade, não pelo test client: só assim
+# request_finished fecha/devolve a conexão como num worker (o Client desliga isso).
+SCRIPT = r"""
+import json, os, statistics, threading, time
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+import django
+django.setup()
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from core import instrumentacao
+
+handler = WSGIHandler()
+caminhos = json.loads(os.environ["BENCH_CONEXOES_CAMINHOS"])
+por_thread = int(os.environ["BENCH_CONEXOES_REQUISICOES"])
+threads = int(os.environ["BENCH_CONEXOES_THREADS"])
+
+def requisitar(caminho):
+    path, _, query = caminho.partition("?")
+    environ = {"PATH_INFO": path, "QUERY_STRING": query, "HTTP_HOST": "bench", "wsgi.input": BytesIO()}
+    setup_testing_defaults(environ)
+    status = []
+    resposta = handler(environ, lambda s, h, exc_info=None: status.append(s))
+    try:
+        for _ in resposta:
+            pass
+    finally:
+        resposta.close()
+    if not status[0].startswith("200"):
+        raise RuntimeError(f"{caminho}: {status[0]}")
+
+tempos, erros = [], []
+lock = threading.Lock()
+
+def trabalhar(n):
+    locais = []
+    try:
+        for i in range(por_thread):
+            inicio = time.perf_counter()
+            requisitar(caminhos[(n + i) % len(caminhos)])
+            locais.append((time.perf_counter() - inicio) * 1000)
+    except Exception as e:
+        erros.append(repr(e))
+    finally:
+        connections.close_all()
+    with lock:
+        tempos.extend(locais)
+
+for caminho in caminhos:  # aquecimento (imports, caches de template)
+    requisitar(caminho)
+
+inicio = time.perf_counter()
+ts = [threading.Thread(target=trabalhar, args=(n,)) for n in range(threads)]
+for t in ts:
+    t.start()
+for t in ts:
+    t.join()
+segundos = time.perf_counter() - inicio
+tempos.sort()
+
+print(json.dumps({
+    "requisicoes": len(tempos),
+    "erros": erros[:5],
+    "segundos": round(segundos, 3),
+    "req_por_segundo": round(len(tempos) / segundos, 1) if segundos else 0,
+    "p50_ms": round(statistics.median(tempos), 2) if tempos else None,
+    "p95_ms": round(tempos[int(len(tempos) * 0.95) - 1], 2) if tempos else None,
+    "conexoes": instrumentacao.conexoes()["default"],
+}, default=str))
+"""
+
+VARIANTES = {
+    "sem_persistencia": {"DB_POOL": "0", "DB_CONN_MAX_AGE": "0"},
+    "persistente": {"DB_POOL": "0", "DB_CONN_MAX_AGE": "60", "DB_CONN_HEALTH_CHECKS": "1"},
+    "pool": {"DB_POOL": "1"},
+}
+
+CAMINHOS = ["/api/dashboard/", "/relatorios/dados/?tipo=FEDERAL", "/convenios/"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de conexões com o PostgreSQL: requisições por segundo sem persistência, "
+        "com CONN_MAX_AGE e com o pool do psycopg 3 (DB_POOL), em processos separados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=4, help="Requisições simultâneas (padrão: 4)")
+        parser.add_argument("--requisicoes", type=int, default=200, help="Requisições por thread (padrão: 200)")
+        parser.add_argument("--variante", action="append", choices=list(VARIANTES), help="Só esta variante")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError(
+                f"bench_conexoes mede o PostgreSQL configurado em DB_*; o banco atual é {connection.vendor}."
+            )
+
+        resultado = {"threads": options["threads"], "caminhos": CAMINHOS, "variantes": {}}
+        for nome, ambiente in VARIANTES.items():
+            if options["variante"] and nome not in options["variante"]:
+                continue
+            env = {
+                **os.environ,
+                **ambiente,
+                "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE,
+                "ALLOWED_HOSTS": "bench",
+                # o dashboard_data em cache não consulta o banco; aqui interessa a conexão
+                "DASHBOARD_DATA_CACHE_TTL": "0",
+                "INSTRUMENTACAO_ORCAMENTO_ESTRITO": "0",
+                "BENCH_CONEXOES_CAMINHOS": json.dumps(CAMINHOS),
+                "BENCH_CONEXOES_REQUISICOES": str(options["requisicoes"]),
+                "BENCH_CONEXOES_THREADS": str(options["threads"]),
+            }
+            proc = subprocess.run(
+                [sys.executable, "-c", SCRIPT], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            if proc.returncode != 0:
+                resultado["variantes"][nome] = {"erro": proc.stderr.strip().splitlines()[-1:]}
+                continue
+            resultado["variantes"][nome] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+        base = resultado["variantes"].get("sem_persistencia", {}).get("req_por_segundo")
+        if base:
+            for medicao in resultado["variantes"].values():
+                if medicao.get("req_por_segundo"):
+                    medicao["ganho"] = round(medicao["req_por_segundo"] / base, 2)
+
+        self.stdout.write(json.dumps(resultado, indent=2, ensure_ascii=False))
@@ -0,0 +1,46 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.benchmark import CENARIOS, Runner, comparar
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark das rotas pesadas (dashboard, relatórios, lista de convênios, changelists do "
+        "admin) pelo test client: queries, latência p50/p95/p99 e pico de memória, em JSON. "
+        "Rode sobre a massa de seed_perf_data."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticoes", type=int, default=20, help="Requisições por cenário (padrão: 20)")
+        parser.add_argument("--frio", action="store_true", help="Limpa os caches antes de cada requisição")
+        parser.add_argument(
+            "--cenario", action="append", choices=[c.nome for c in CENARIOS],
+            help="Mede só este cenário (pode repetir)",
+        )
+        parser.add_argument("--saida", help="Grava o JSON neste arquivo")
+        parser.add_argument("--comparar", help="JSON de uma execução anterior: inclui as diferenças")
+
+    def handle(self, *args, **options):
+        cenarios = [c for c in CENARIOS if not options["cenario"] or c.nome in options["cenario"]]
+        anterior = None
+        if options["comparar"]:
+            try:
+                anterior = json.loads(Path(options["comparar"]).read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                raise CommandError(f"Não foi possível ler {options['comparar']}: {e}")
+
+        with transaction.atomic():
+            resultado = Runner(options["repeticoes"], frio=options["frio"], cenarios=cenarios).executar()
+            transaction.set_rollback(True)
+
+        if anterior is not None:
+            resultado["diferencas"] = {"base": anterior.get("commit"), "cenarios": comparar(anterior, resultado)}
+
+        saida = json.dumps(resultado, indent=2, ensure_ascii=False)
+        if options["saida"]:
+            Path(options["saida"]).write_text(saida, encoding="utf-8")
+        self.stdout.write(saida)
@@ -0,0 +1,106 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# roda num interpretador novo: mede o boot de um worker do zero
+SCRIPT = r"""
+import json, os, sys, time
+
+def rss_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for linha in f:
+                if linha.startswith("VmRSS:"):
+                    return int(linha.split()[1])
+    except OSError:
+        pass
+    import resource
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss // 1024 if sys.platform == "darwin" else maxrss
+
+resultado = {"rss_inicial_kb": rss_kb()}
+inicio = time.perf_counter()
+import django
+django.setup()
+resultado["setup_ms"] = (time.perf_counter() - inicio) * 1000
+
+inicio = time.perf_counter()
+from django.urls import get_resolver, resolve
+get_resolver().url_patterns
+for caminho in json.loads(os.environ["BENCH_STARTUP_URLS"]):
+    resolve(caminho)
+resultado["urls_ms"] = (time.perf_counter() - inicio) * 1000
+
+if os.environ.get("BENCH_STARTUP_PRECARREGAR") == "1":
+    inicio = time.perf_counter()
+    from relatorios.aquecimento import importar
+    try:
+        importar()
+        resultado["precarga_ms"] = (time.perf_counter() - inicio) * 1000
+    except Exception as e:
+        resultado["precarga_erro"] = repr(e)
+
+resultado["rss_kb"] = rss_kb()
+resultado["modulos"] = len(sys.modules)
+resultado["weasyprint"] = "weasyprint" in sys.modules
+resultado["matplotlib"] = "matplotlib" in sys.modules
+print(json.dumps(resultado))
+"""
+
+URLS = ["/dashboard/", "/api/dashboard/", "/convenios/", "/relatorios/dados/", "/relatorios/pdf/", "/admin/"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark do boot de um worker: django.setup() + carga do URLconf, tempo e RSS, "
+        "em processos novos. Compara o import tardio da pilha de PDF com o pré-carregamento."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticoes", type=int, default=5, help="Processos por variante (padrão: 5)")
+
+    def _rodar(self, precarregar):
+        env = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE,
+            "BENCH_STARTUP_URLS": json.dumps(URLS),
+            "BENCH_STARTUP_PRECARREGAR": "1" if precarregar else "0",
+            # a variante "tardio" não pode pré-carregar via settings
+            "RELATORIOS_PRECARREGAR": "0",
+        }
+        proc = subprocess.run(
+            [sys.executable, "-c", SCRIPT], cwd=settings.BASE_DIR, env=env,
+            capture_output=True, text=True, timeout=120,
+        )
+        if proc.returncode != 0:
+            raise CommandError(f"Falha no processo de medição:\n{proc.stderr}")
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+
+    def _resumir(self, medicoes):
+        resumo = {}
+        for chave in ("setup_ms", "urls_ms", "precarga_ms", "rss_kb", "modulos"):
+            valores = [m[chave] for m in medicoes if chave in m]
+            if valores:
+                resumo[chave] = round(statistics.median(valores), 1)
+        resumo["rss_delta_kb"] = round(statistics.median(m["rss_kb"] - m["rss_inicial_kb"] for m in medicoes))
+        if "precarga_erro" in medicoes[0]:
+            resumo["precarga_erro"] = medicoes[0]["precarga_erro"]
+        resumo["weasyprint_carregado"] = medicoes[0]["weasyprint"]
+        resumo["matplotlib_carregado"] = medicoes[0]["matplotlib"]
+        return resumo
+
+    def handle(self, *args, **options):
+        resultado = {"repeticoes": options["repeticoes"], "urls": URLS}
+        for nome, precarregar in (("tardio", False), ("precarregado", True)):
+            resultado[nome] = self._resumir([self._rodar(precarregar) for _ in range(options["repeticoes"])])
+
+        resultado["economia"] = {
+            "rss_kb": round(resultado["precarregado"]["rss_kb"] - resultado["tardio"]["rss_kb"]),
+            "ms": round(resultado["precarregado"].get("precarga_ms", 0), 1),
+        }
+        self.stdout.write(json.dumps(resultado, indent=2, ensure_ascii=False))
@@ -0,0 +1,52 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import instrumentacao
+
+
+class Command(BaseCommand):
+    help = (
+        "Mostra os histogramas de queries/tempos por rota gravados pelos processos web "
+        "no cache (InstrumentacaoMiddleware)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", action="store_true", help="Saída completa em JSON (com buckets)")
+        parser.add_argument("--limpar", action="store_true", help="Zera os histogramas depois de mostrar")
+        parser.add_argument(
+            "--conexoes", action="store_true",
+            help="Mostra a configuração de conexão e as estatísticas do pool de cada processo (JSON)",
+        )
+
+    def handle(self, *args, **options):
+        if options["conexoes"]:
+            self.stdout.write(json.dumps(instrumentacao.coletar_conexoes(), indent=2, ensure_ascii=False))
+            return
+
+        dados = instrumentacao.relatorio()
+
+        if options["json"]:
+            self.stdout.write(json.dumps(dados, indent=2, ensure_ascii=False))
+        elif not dados:
+            self.stdout.write("Nenhuma requisição registrada (com vários processos, configure CACHE_DIR).")
+        else:
+            self.stdout.write(
+                f"{'rota':40} {'n':>6} {'queries p95':>12} {'sql p95':>9} {'view p95':>9} "
+                f"{'tpl p95':>9} {'total p95':>10} {'total max':>10} {'conexões/req':>13}"
+            )
+            for nome, m in dados.items():
+                orcamento = settings.INSTRUMENTACAO_ORCAMENTOS.get(nome)
+                linha = (
+                    f"{nome[:40]:40} {m['total_ms']['n']:>6} {m['queries']['p95']:>12} "
+                    f"{m['sql_ms']['p95']:>9} {m['view_ms']['p95']:>9} {m['template_ms']['p95']:>9} "
+                    f"{m['total_ms']['p95']:>10} {m['total_ms']['max']:>10} "
+                    f"{m.get('conexoes', {}).get('media', '-'):>13}"
+                )
+                if orcamento is not None and m["queries"]["max"] > orcamento:
+                    linha = self.style.WARNING(f"{linha}  (orçamento: {orcamento} queries)")
+                self.stdout.write(linha)
+
+        if options["limpar"]:
+            instrumentacao.limpar()
@@ -0,0 +1,70 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import dados_sinteticos
+from core.dados_sinteticos import Volumes
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera massa sintética determinística (convênios, contratos, aditivos e pagamentos) "
+        "com bulk_create, para medir desempenho (ver bench_perf)."
+    )
+
+    def add_arguments(self, parser):
+        padrao = Volumes()
+        parser.add_argument("--convenios", type=int, default=padrao.convenios)
+        parser.add_argument("--contratos", type=int, default=padrao.contratos)
+        parser.add_argument("--aditivos", type=int, default=padrao.aditivos)
+        parser.add_argument("--pagamentos", type=int, default=padrao.pagamentos)
+        parser.add_argument("--empresas", type=int, default=padrao.empresas)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--data-base", type=date.fromisoformat, default=None,
+            help="Data de referência das vigências, AAAA-MM-DD (padrão: hoje)",
+        )
+        parser.add_argument("--bloco", type=int, default=1000, help="Convênios por transação (padrão: 1000)")
+        parser.add_argument(
+            "--substituir", action="store_true",
+            help=f"Apaga antes a massa gerada anteriormente (numero_convenio {dados_sinteticos.PREFIXO}-*)",
+        )
+
+    def handle(self, *args, **options):
+        volumes = Volumes(
+            convenios=options["convenios"],
+            contratos=options["contratos"],
+            aditivos=options["aditivos"],
+            pagamentos=options["pagamentos"],
+            empresas=options["empresas"],
+        )
+        if volumes.convenios < 1 or (volumes.contratos < 1 and (volumes.aditivos or volumes.pagamentos)):
+            raise CommandError("Aditivos e pagamentos precisam de ao menos 1 convênio e 1 contrato.")
+
+        if dados_sinteticos.existe_massa():
+            if not options["substituir"]:
+                raise CommandError("Já existe massa sintética no banco. Use --substituir para gerá-la de novo.")
+            apagados = dados_sinteticos.apagar_massa()
+            self.stdout.write(f"{apagados} convênio(s) da massa anterior apagado(s).")
+
+        inicio = time.perf_counter()
+
+        def progresso(criados):
+            self.stdout.write(
+                f"  {criados.convenios}/{volumes.convenios} convênios "
+                f"({time.perf_counter() - inicio:.0f}s)"
+            )
+
+        criados = dados_sinteticos.gerar(
+            volumes,
+            seed=options["seed"],
+            data_base=options["data_base"],
+            bloco=options["bloco"],
+            progresso=progresso if options["verbosity"] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{criados.convenios} convênios, {criados.contratos} contratos, {criados.aditivos} aditivos, "
+            f"{criados.pagamentos} pagamentos e {criados.empresas} empresas em "
+            f"{time.perf_counter() - inicio:.1f}s."
+        ))
@@ -0,0 +1,118 @@
+"""
+Paginação por keyset (seek): a página seguinte começa depois da última chave vista,
+em vez de OFFSET + COUNT(*). O custo por página não cresce com a posição na tabela.
+
+O cursor é a chave de ordenação da linha de borda, em JSON base64 (url-safe), então
+continua válido mesmo com inserções/remoções entre uma página e outra.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+@dataclass
+class PaginaKeyset:
+    itens: list
+    proximo: str | None
+    anterior: str | None
+    tamanho: int
+
+    @property
+    def tem_proximo(self) -> bool:
+        return self.proximo is not None
+
+    @property
+    def tem_anterior(self) -> bool:
+        return self.anterior is not None
+
+
+def codificar_cursor(valores) -> str:
+    dados = json.dumps(list(valores), cls=DjangoJSONEncoder, separators=(",", ":"))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor, qtd_campos):
+    """Valores do cursor ou None se vazio/inválido (a view volta para a primeira página)."""
+    if not cursor:
+        return None
+    try:
+        dados = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        valores = json.loads(dados)
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(valores, list) or len(valores) != qtd_campos:
+        return None
+    return valores
+
+
+def tamanho_pagina(params, padrao, maximo) -> int:
+    """?tamanho= da query string, limitado a [1, maximo]; inválido -> padrao."""
+    try:
+        tamanho = int(params.get("tamanho") or padrao)
+    except ValueError:
+        tamanho = padrao
+    return max(1, min(tamanho, maximo))
+
+
+def _depois_de(ordenacao, valores) -> Q:
+    """
+    Linhas posteriores à chave na ordenação (comparação lexicográfica):
+    (a > x) OR (a = x AND b > y) ..., com "<" nos campos descendentes.
+    """
+    cond = Q()
+    iguais = {}
+    for campo, valor in zip(ordenacao, valores):
+        nome = campo.lstrip("-")
+        op = "lt" if campo.startswith("-") else "gt"
+        cond |= Q(**iguais, **{f"{nome}__{op}": valor})
+        iguais[nome] = valor
+    return cond
+
+
+def _inverter(ordenacao):
+    return [c[1:] if c.startswith("-") else f"-{c}" for c in ordenacao]
+
+
+def paginar_keyset(qs, ordenacao, depois=None, antes=None, tamanho=50) -> PaginaKeyset:
+    """
+    Uma página de `qs` na `ordenacao` (ex.: ("-id",) ou ("-data", "-id")).
+    A ordenação precisa ser única (termine com a PK) e ter índice que a sirva.
+
+    `depois`/`antes` são cursores de PaginaKeyset.proximo/anterior.
+    1 query por página: busca tamanho + 1 linhas para saber se existe outra página.
+    """
+    ordenacao = list(ordenacao)
+    nomes = [c.lstrip("-") for c in ordenacao]
+
+    valores_depois = decodificar_cursor(depois, len(ordenacao))
+    valores_antes = None if valores_depois else decodificar_cursor(antes, len(ordenacao))
+
+    if valores_antes is not None:
+        # página anterior: percorre na ordem inversa e desvira o resultado
+        linhas = list(
+            qs.filter(_depois_de(_inverter(ordenacao), valores_antes))
+            .order_by(*_inverter(ordenacao))[: tamanho + 1]
+        )
+        mais = len(linhas) > tamanho
+        itens = linhas[:tamanho][::-1]
+        tem_anterior, tem_proximo = mais, True
+    else:
+        if valores_depois is not None:
+            qs = qs.filter(_depois_de(ordenacao, valores_depois))
+        linhas = list(qs.order_by(*ordenacao)[: tamanho + 1])
+        itens = linhas[:tamanho]
+        tem_anterior, tem_proximo = valores_depois is not None, len(linhas) > tamanho
+
+    def chave(obj):
+        return codificar_cursor(getattr(obj, nome) for nome in nomes)
+
+    return PaginaKeyset(
+        itens=itens,
+        proximo=chave(itens[-1]) if itens and tem_proximo else None,
+        anterior=chave(itens[0]) if itens and tem_anterior else None,
+        tamanho=tamanho,
+    )
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
 
     "django_filters",
 
@@ -55,6 +56,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # primeiro: mede a requisição inteira (core/instrumentacao.py)
+    'core.instrumentacao.InstrumentacaoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -88,6 +91,12 @@ WSGI_APPLICATION = 'core.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Conexões: sem pool, cada processo mantém a conexão aberta por DB_CONN_MAX_AGE segundos
+# (0 = uma conexão por requisição), testada antes de reutilizar (DB_CONN_HEALTH_CHECKS).
+# DB_POOL=1 usa o pool do psycopg 3 (pip install "psycopg[pool]"); o Django não aceita
+# pool com CONN_MAX_AGE, então ele fica 0. Estatísticas em /api/instrumentacao/.
+DB_POOL = os.getenv("DB_POOL", "0") == "1"
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
@@ -96,9 +105,75 @@ DATABASES = {
         "PASSWORD": os.getenv("DB_PASSWORD"),
         "HOST": os.getenv("DB_HOST"),
         "PORT": os.getenv("DB_PORT"),
+        "CONN_MAX_AGE": 0 if DB_POOL else int(os.getenv("DB_CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": os.getenv("DB_CONN_HEALTH_CHECKS", "1") == "1",
+        "OPTIONS": {
+            "pool": {
+                # por processo: max_size x workers precisa caber em max_connections do Postgres
+                "min_size": int(os.getenv("DB_POOL_MIN", "2")),
+                "max_size": int(os.getenv("DB_POOL_MAX", "10")),
+                # segundos esperando uma conexão livre antes de PoolTimeout
+                "timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                "max_idle": float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+                "max_lifetime": float(os.getenv("DB_POOL_MAX_LIFETIME", "3600")),
+            },
+        } if DB_POOL else {},
+    }
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# LocMemCache é por processo; com vários workers use CACHE_DIR (FileBasedCache)
+# para que a invalidação do dashboard valha para todos.
+
+CACHE_DIR = os.getenv("CACHE_DIR")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": CACHE_DIR,
+    } if CACHE_DIR else {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
     }
 }
 
+# TTL (segundos) dos cards do dashboard
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "60"))
+
+# TTL (segundos) do JSON do dashboard (invalidado também por save/delete de Convenio)
+DASHBOARD_DATA_CACHE_TTL = int(os.getenv("DASHBOARD_DATA_CACHE_TTL", "3600"))
+
+# Instrumentação (core/instrumentacao.py): queries/tempos por rota, Server-Timing e histogramas
+INSTRUMENTACAO_ATIVA = os.getenv("INSTRUMENTACAO_ATIVA", "1") == "1"
+# header Server-Timing: "staff" (só com DEBUG ou para usuários staff), "1" (todas as respostas) ou "0"
+INSTRUMENTACAO_SERVER_TIMING = os.getenv("INSTRUMENTACAO_SERVER_TIMING", "staff")
+# segundos entre as gravações dos histogramas de cada processo no cache
+INSTRUMENTACAO_ENVIO_SEGUNDOS = int(os.getenv("INSTRUMENTACAO_ENVIO_SEGUNDOS", "30"))
+# máximo de queries por requisição, por nome de rota: o que a view faz sem cache
+# + 2 de sessão/usuário quando autenticado (um N+1 por linha estoura o limite)
+INSTRUMENTACAO_ORCAMENTOS = {
+    "dashboard": 3,
+    "dashboard_data": 5,
+    "relatorios:relatorios_dados": 5,
+    "convenios:list": 3,
+}
+# True: orçamento excedido levanta OrcamentoExcedido (falha o teste) em vez de só logar
+INSTRUMENTACAO_ORCAMENTO_ESTRITO = os.getenv("INSTRUMENTACAO_ORCAMENTO_ESTRITO", "0") == "1"
+
+# Listagem de convênios (paginação por keyset); ?tamanho= na URL, limitado ao máximo
+CONVENIOS_PAGINA_TAMANHO = int(os.getenv("CONVENIOS_PAGINA_TAMANHO", "50"))
+CONVENIOS_PAGINA_MAX = int(os.getenv("CONVENIOS_PAGINA_MAX", "200"))
+# Extrato de pagamentos (financeiro), também por keyset
+FINANCEIRO_EXTRATO_TAMANHO = int(os.getenv("FINANCEIRO_EXTRATO_TAMANHO", "50"))
+
+# Exclusão em massa de convênios (convenios/exclusao.py): convênios por transação e,
+# acima do limite síncrono, job em segundo plano ("thread" ou "db" + `manage.py processar_exclusoes`)
+CONVENIOS_EXCLUSAO_LOTE = int(os.getenv("CONVENIOS_EXCLUSAO_LOTE", "500"))
+CONVENIOS_EXCLUSAO_SINCRONA_MAX = int(os.getenv("CONVENIOS_EXCLUSAO_SINCRONA_MAX", "2000"))
+CONVENIOS_EXCLUSAO_EXECUTOR = os.getenv("CONVENIOS_EXCLUSAO_EXECUTOR", "thread")
+CONVENIOS_EXCLUSAO_TIMEOUT_MINUTOS = int(os.getenv("CONVENIOS_EXCLUSAO_TIMEOUT_MINUTOS", "30"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -139,6 +214,41 @@ STATICFILES_DIRS = [
 
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Arquivos gerados (ex.: PDFs dos relatórios em segundo plano)
+MEDIA_URL = "/media/"
+MEDIA_ROOT = Path(os.getenv("MEDIA_ROOT", BASE_DIR / "media"))
+
+
+# Relatórios PDF em segundo plano (relatorios/jobs.py)
+# "thread": pool de threads no próprio processo web
+# "db": só enfileira no banco; processe com `manage.py processar_relatorios`
+RELATORIOS_EXECUTOR = os.getenv("RELATORIOS_EXECUTOR", "thread")
+RELATORIOS_MAX_WORKERS = int(os.getenv("RELATORIOS_MAX_WORKERS", "2"))
+# horas até o PDF gerado ser apagado
+RELATORIOS_JOB_TTL_HORAS = int(os.getenv("RELATORIOS_JOB_TTL_HORAS", "24"))
+# job em PROCESSANDO há mais tempo que isso volta para a fila (worker morreu)
+RELATORIOS_JOB_TIMEOUT_MINUTOS = int(os.getenv("RELATORIOS_JOB_TIMEOUT_MINUTOS", "30"))
+
+# Cache em disco dos PDFs (relatorios/pdf_cache.py), com remoção LRU acima do limite
+RELATORIOS_PDF_CACHE_DIR = Path(os.getenv("RELATORIOS_PDF_CACHE_DIR", BASE_DIR / "cache" / "relatorios_pdf"))
+RELATORIOS_PDF_CACHE_MAX_MB = int(os.getenv("RELATORIOS_PDF_CACHE_MAX_MB", "200"))
+
+# Gráficos do PDF (relatorios/graficos.py)
+# saída: "svg" (data URI), "png" (data URI base64) ou "arquivo" (SVG em RELATORIOS_GRAFICOS_DIR)
+RELATORIOS_GRAFICOS_SAIDA = os.getenv("RELATORIOS_GRAFICOS_SAIDA", "svg")
+RELATORIOS_GRAFICOS_DIR = Path(os.getenv("RELATORIOS_GRAFICOS_DIR", BASE_DIR / "cache" / "graficos"))
+# SVGs da saída "arquivo": mesma remoção LRU do cache de PDFs acima deste limite
+RELATORIOS_GRAFICOS_MAX_MB = int(os.getenv("RELATORIOS_GRAFICOS_MAX_MB", "50"))
+# processos para renderizar os gráficos em paralelo (0 = no próprio processo)
+RELATORIOS_GRAFICOS_PROCESSOS = int(os.getenv("RELATORIOS_GRAFICOS_PROCESSOS", "3"))
+# WeasyPrint/matplotlib são importados no primeiro PDF; "1" importa no boot (gunicorn --preload),
+# "fundo" importa e aquece numa thread após o boot (relatorios/aquecimento.py)
+RELATORIOS_PRECARREGAR = os.getenv("RELATORIOS_PRECARREGAR", "0")
+# totais e quebras dos relatórios pelo cubo mensal (relatorios/cubo.py) quando os filtros cabem nele
+RELATORIOS_CUBO = os.getenv("RELATORIOS_CUBO", "1") == "1"
+# previsão de execução financeira (relatorios/previsao.py): meses completos usados no ritmo de gasto
+RELATORIOS_PREVISAO_JANELA_MESES = int(os.getenv("RELATORIOS_PREVISAO_JANELA_MESES", "6"))
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
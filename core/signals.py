@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from convenios.models import Convenio
+
+from .cache import invalidar_dashboard
+
+
+@receiver(post_save, sender=Convenio)
+@receiver(post_delete, sender=Convenio)
+def _convenio_alterado(sender, instance, **kwargs):
+    # só após o commit: antes disso uma requisição concorrente leria as linhas antigas
+    # e as gravaria no cache sob a versão nova
+    transaction.on_commit(invalidar_dashboard)
@@ -0,0 +1,303 @@
+import json
+import os
+import subprocess
+import sys
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from convenios.models import Convenio
+
+from . import instrumentacao, views
+from .cache import dashboard_versao
+
+
+def criar_convenio(vigencia_fim, **kwargs):
+    dados = dict(
+        tipo=Convenio.Tipo.FEDERAL,
+        orgao_concedente="Ministério da Saúde",
+        objeto="Objeto",
+        valor_repasse=Decimal("1000.00"),
+        valor_contrapartida=Decimal("100.00"),
+        vigencia_inicio=vigencia_fim - timedelta(days=365),
+        vigencia_fim=vigencia_fim,
+    )
+    dados.update(kwargs)
+    return Convenio.objects.create(**dados)
+
+
+class DashboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        hoje = timezone.localdate()
+        criar_convenio(hoje - timedelta(days=1))
+        criar_convenio(hoje + timedelta(days=10))
+        criar_convenio(hoje + timedelta(days=60))
+        criar_convenio(hoje + timedelta(days=200))
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get("/dashboard/")
+
+    def test_cards(self):
+        cards = views._dashboard_cards()
+        self.assertEqual(cards["total_convenios"], 4)
+        self.assertEqual(cards["total_repasse"], Decimal("4000.00"))
+        self.assertEqual(cards["total_contrapartida"], Decimal("400.00"))
+        self.assertEqual(cards["vencendo_30"], 1)
+        self.assertEqual(cards["vencendo_90"], 2)
+        self.assertEqual(cards["vencidos"], 1)
+
+    def test_dashboard_uma_query_cache_frio_zero_quente(self):
+        with self.assertNumQueries(1):
+            response = views.dashboard(self.request)
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(0):
+            response = views.dashboard(self.request)
+        self.assertEqual(response.status_code, 200)
+
+    def test_dashboard_data_alertas(self):
+        response = views.dashboard_data(RequestFactory().get("/api/dashboard/"))
+        data = json.loads(response.content)
+        self.assertEqual(
+            data["alertas"],
+            {
+                "labels": ["OK (>90d)", "Amarelo (≤90d)", "Vermelho (≤30d)", "Vencido"],
+                "values": [1, 1, 1, 1],
+            },
+        )
+        self.assertEqual(data["por_tipo"], [{"tipo": "FEDERAL", "qtd": 4, "repasse": 4000.0}])
+        self.assertEqual(len(data["repasse_por_mes"]["labels"]), 12)
+
+    def test_dashboard_data_cache_e_invalidacao(self):
+        request = RequestFactory().get("/api/dashboard/")
+        views.dashboard_data(request)
+
+        with self.assertNumQueries(0):
+            response = views.dashboard_data(request)
+        self.assertEqual(json.loads(response.content)["por_tipo"][0]["qtd"], 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            criar_convenio(timezone.localdate() + timedelta(days=5))
+        response = views.dashboard_data(request)
+        self.assertEqual(json.loads(response.content)["por_tipo"][0]["qtd"], 5)
+
+    def test_invalidacao_so_apos_commit(self):
+        versao = dashboard_versao()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                Convenio.objects.first().save()
+                self.assertEqual(dashboard_versao(), versao)
+            # ainda na transação do TestCase: nada confirmado
+            self.assertEqual(dashboard_versao(), versao)
+        self.assertEqual(len(callbacks), 1)
+        self.assertGreater(dashboard_versao(), versao)
+
+    def test_dashboard_data_etag_304(self):
+        response = views.dashboard_data(RequestFactory().get("/api/dashboard/"))
+        self.assertTrue(response.has_header("ETag"))
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        response = views.dashboard_data(
+            RequestFactory().get("/api/dashboard/", HTTP_IF_NONE_MATCH=response["ETag"])
+        )
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Convenio.objects.first().save()
+        response = views.dashboard_data(
+            RequestFactory().get("/api/dashboard/", HTTP_IF_NONE_MATCH=response["ETag"])
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+@override_settings(INSTRUMENTACAO_ORCAMENTO_ESTRITO=True)
+class InstrumentacaoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        hoje = timezone.localdate()
+        for dias in (-5, 20, 400):
+            criar_convenio(hoje + timedelta(days=dias))
+
+    def setUp(self):
+        cache.clear()
+        instrumentacao.limpar()
+
+    def test_server_timing_e_histogramas(self):
+        response = self.client.get(reverse("dashboard"))
+        # anônimo, sem DEBUG: sem Server-Timing
+        self.assertFalse(response.has_header("Server-Timing"))
+        self.client.get(reverse("dashboard"))
+
+        dados = instrumentacao.relatorio()["dashboard"]
+        self.assertEqual(dados["total_ms"]["n"], 2)
+        self.assertGreater(dados["template_ms"]["max"], 0)
+        # cards em cache na 2ª requisição
+        self.assertEqual(dados["queries"]["buckets"]["<=0"], 1)
+
+        with self.settings(DEBUG=True):
+            self.assertTrue(self.client.get(reverse("dashboard")).has_header("Server-Timing"))
+            with self.settings(INSTRUMENTACAO_SERVER_TIMING="0"):
+                self.assertFalse(self.client.get(reverse("dashboard")).has_header("Server-Timing"))
+
+        self.client.force_login(User.objects.create_user("staff", password="x", is_staff=True))
+        response = self.client.get(reverse("dashboard"))
+        self.assertRegex(response["Server-Timing"], r'sql;dur=[\d.]+;desc="\d+ queries", view;dur=[\d.]+, tpl;dur=[\d.]+')
+
+    def test_orcamentos_das_rotas_principais(self):
+        # estrito: levanta OrcamentoExcedido (e falha aqui) se alguma rota passar do orçamento
+        for url in (
+            reverse("dashboard"),
+            reverse("dashboard_data"),
+            reverse("relatorios:relatorios_dados") + "?tipo=FEDERAL",
+            reverse("convenios:list") + "?q=Saúde",
+        ):
+            self.assertEqual(self.client.get(url).status_code, 200, url)
+
+    def test_orcamento_excedido(self):
+        with override_settings(INSTRUMENTACAO_ORCAMENTOS={"dashboard_data": 0}):
+            with self.assertRaises(instrumentacao.OrcamentoExcedido):
+                self.client.get(reverse("dashboard_data"))
+
+            with override_settings(INSTRUMENTACAO_ORCAMENTO_ESTRITO=False):
+                cache.clear()
+                with self.assertLogs("core.instrumentacao", "WARNING"):
+                    self.client.get(reverse("dashboard_data"))
+
+    def test_endpoint_staff_e_comando(self):
+        url = reverse("instrumentacao_dados")
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(User.objects.create_user("staff", password="x", is_staff=True))
+        self.client.get(reverse("dashboard_data"))
+        dados = self.client.get(url).json()
+        self.assertEqual(dados["rotas"]["dashboard_data"]["queries"]["n"], 1)
+
+        # o comando lê o que os processos gravaram no cache
+        instrumentacao._enviar_ao_cache(forcar=True)
+        with mock.patch.object(instrumentacao, "PROCESSO", "outro-processo"):
+            instrumentacao._estatisticas.clear()
+            out = StringIO()
+            call_command("instrumentacao", "--json", stdout=out)
+        self.assertIn("dashboard_data", json.loads(out.getvalue()))
+
+
+class DadosSinteticosTests(TestCase):
+    VOLUMES = dict(convenios=7, contratos=17, aditivos=23, pagamentos=41, empresas=3)
+
+    def _gerar(self, **kwargs):
+        from core.dados_sinteticos import Volumes, gerar
+
+        return gerar(Volumes(**self.VOLUMES), seed=7, data_base=timezone.localdate(), bloco=3, **kwargs)
+
+    def _retrato(self):
+        from financeiro.models import Pagamento
+
+        campos = ("contrato__convenio__numero_convenio", "contrato__numero_contrato", "data", "valor_pago")
+        return list(Pagamento.objects.order_by(*campos).values_list(*campos))
+
+    def test_volumes_exatos_e_deterministico(self):
+        from contratos.models import Aditivo, Contrato
+        from convenios.models import ConvenioResumo
+        from core import dados_sinteticos
+
+        criados = self._gerar()
+        self.assertEqual(
+            (criados.convenios, criados.contratos, criados.aditivos, criados.pagamentos, criados.empresas),
+            (7, 17, 23, 41, 3),
+        )
+        self.assertEqual(Contrato.objects.count(), 17)
+        self.assertEqual(Aditivo.objects.count(), 23)
+        self.assertEqual(ConvenioResumo.objects.count(), 7)
+        primeiro = self._retrato()
+
+        dados_sinteticos.apagar_massa()
+        self.assertFalse(dados_sinteticos.existe_massa())
+        self._gerar()
+        self.assertEqual(self._retrato(), primeiro)
+
+    def test_comando_recusa_massa_existente(self):
+        from django.core.management.base import CommandError
+
+        args = [f"--{k}={v}" for k, v in self.VOLUMES.items()]
+        call_command("seed_perf_data", *args, stdout=StringIO())
+        with self.assertRaises(CommandError):
+            call_command("seed_perf_data", *args, stdout=StringIO())
+        call_command("seed_perf_data", *args, "--substituir", stdout=StringIO())
+        self.assertEqual(Convenio.objects.count(), 7)
+
+
+class BenchPerfTests(TestCase):
+    def test_json_por_cenario(self):
+        Convenio.objects.create(
+            tipo="FEDERAL", numero_convenio="1/2025", orgao_concedente="Ministério", objeto="x",
+            vigencia_inicio=timezone.localdate(), vigencia_fim=timezone.localdate() + timedelta(days=10),
+        )
+        out = StringIO()
+        call_command(
+            "bench_perf", "--repeticoes=2", "--cenario=relatorios_dados", "--cenario=admin_convenios", stdout=out
+        )
+        dados = json.loads(out.getvalue())
+        self.assertEqual(dados["linhas"]["convenios"], 1)
+        self.assertEqual(set(dados["cenarios"]), {"relatorios_dados", "admin_convenios"})
+        for medicao in dados["cenarios"].values():
+            self.assertNotIn("erro", medicao)
+            self.assertGreater(medicao["queries"], 0)
+            self.assertLessEqual(medicao["p50_ms"], medicao["p95_ms"])
+            self.assertGreater(medicao["pico_memoria_kb"], 0)
+
+        # o usuário staff do benchmark não sobra no banco
+        self.assertFalse(User.objects.filter(username="bench_perf").exists())
+
+
+class ConexoesTests(TestCase):
+    def setUp(self):
+        instrumentacao.limpar()
+
+    def test_conexoes_no_endpoint(self):
+        self.client.force_login(User.objects.create_user("staff", password="x", is_staff=True))
+        self.client.get(reverse("dashboard_data"))
+        dados = self.client.get(reverse("instrumentacao_dados")).json()
+        default = dados["conexoes"][instrumentacao.PROCESSO]["default"]
+        self.assertEqual(default["vendor"], connection.vendor)
+        self.assertNotIn("pool", default)
+        # o TestCase reaproveita a conexão: nenhuma aberta na requisição
+        self.assertEqual(dados["rotas"]["dashboard_data"]["conexoes"]["max"], 0)
+
+    def test_estatisticas_do_pool(self):
+        conexao = connections["default"]
+        pool = mock.Mock(get_stats=mock.Mock(return_value={"pool_size": 2, "requests_waiting": 0}))
+        with mock.patch.dict(conexao.settings_dict["OPTIONS"], {"pool": {"max_size": 4}}), \
+                mock.patch.object(conexao, "pool", pool, create=True):
+            self.assertEqual(instrumentacao.conexoes()["default"]["pool"]["pool_size"], 2)
+
+    def test_settings_do_ambiente(self):
+        script = (
+            "import json; from core import settings as s; d = s.DATABASES['default'];"
+            "print(json.dumps([d['CONN_MAX_AGE'], d['CONN_HEALTH_CHECKS'], d['OPTIONS']]))"
+        )
+
+        def carregar(**env):
+            proc = subprocess.run(
+                [sys.executable, "-c", script], cwd=settings.BASE_DIR, capture_output=True, text=True,
+                env={**os.environ, **env},
+            )
+            self.assertEqual(proc.returncode, 0, proc.stderr)
+            return json.loads(proc.stdout)
+
+        self.assertEqual(carregar(DB_POOL="0", DB_CONN_MAX_AGE="30"), [30, True, {}])
+        conn_max_age, _, opcoes = carregar(DB_POOL="1", DB_CONN_MAX_AGE="30", DB_POOL_MAX="7")
+        # o Django não aceita pool com conexões persistentes
+        self.assertEqual(conn_max_age, 0)
+        self.assertEqual(opcoes["pool"]["max_size"], 7)
@@ -33,5 +33,8 @@ urlpatterns = [
     # dashboard
     path("dashboard/", views.dashboard, name="dashboard"),
     path("api/dashboard/", views.dashboard_data, name="dashboard_data"),
+
+    # instrumentação (staff)
+    path("api/instrumentacao/", views.instrumentacao_dados, name="instrumentacao_dados"),
 ]
 
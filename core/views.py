@@ -1,26 +1,30 @@
 from collections import OrderedDict
-from datetime import timedelta
+from datetime import datetime, time, timedelta, timezone as dt_timezone
 
-from django.db.models import Count, Sum
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
 from django.db.models.functions import TruncMonth
 from django.http import JsonResponse
 from django.shortcuts import render
 from django.utils import timezone
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 
 from convenios.models import Convenio
 
+from . import instrumentacao
+from .cache import dashboard_versao
 
-def _alerta_bucket(vigencia_fim) -> str:
-    hoje = timezone.localdate()
-    d = (vigencia_fim - hoje).days
 
-    if d < 0:
-        return "Vencido"
-    if d <= 30:
-        return "Vermelho (≤30d)"
-    if d <= 90:
-        return "Amarelo (≤90d)"
-    return "OK (>90d)"
+# Códigos de Convenio.alerta_vigencia -> rótulos do gráfico (ordem = ordem das cores no template)
+ALERTAS_LABELS = OrderedDict([
+    ("OK", "OK (>90d)"),
+    ("AMARELO", "Amarelo (≤90d)"),
+    ("VERMELHO", "Vermelho (≤30d)"),
+    ("VENCIDO", "Vencido"),
+])
 
 
 def _ultimos_12_meses_labels():
@@ -35,37 +39,41 @@ def _ultimos_12_meses_labels():
     return labels
 
 
-def dashboard(request):
-    # Cards
-    total_convenios = Convenio.objects.count()
-    total_repasse = Convenio.objects.aggregate(s=Sum("valor_repasse"))["s"] or 0
-    total_contrapartida = Convenio.objects.aggregate(s=Sum("valor_contrapartida"))["s"] or 0
-
+def _dashboard_cards():
+    """
+    Todos os cards do dashboard em um único aggregate (Count/Sum condicionais).
+    Cache curto por versão + data: alterar um Convenio ou a virada do dia muda a chave.
+    """
     hoje = timezone.localdate()
-    vencendo_30 = Convenio.objects.filter(
-        vigencia_fim__lte=hoje + timedelta(days=30),
-        vigencia_fim__gte=hoje
-    ).count()
-
-    vencendo_90 = Convenio.objects.filter(
-        vigencia_fim__lte=hoje + timedelta(days=90),
-        vigencia_fim__gte=hoje
-    ).count()
-
-    vencidos = Convenio.objects.filter(vigencia_fim__lt=hoje).count()
-
-    context = {
-        "total_convenios": total_convenios,
-        "total_repasse": total_repasse,
-        "total_contrapartida": total_contrapartida,
-        "vencendo_30": vencendo_30,
-        "vencendo_90": vencendo_90,
-        "vencidos": vencidos,
-    }
-    return render(request, "dashboard.html", context)
+    cache_key = f"dashboard:cards:{int(dashboard_versao() * 1000)}-{hoje.isoformat()}"
+    cards = cache.get(cache_key)
+    if cards is not None:
+        return cards
+
+    cards = Convenio.objects.aggregate(
+        total_convenios=Count("id"),
+        total_repasse=Sum("valor_repasse"),
+        total_contrapartida=Sum("valor_contrapartida"),
+        vencendo_30=Count("id", filter=Q(vigencia_fim__gte=hoje, vigencia_fim__lte=hoje + timedelta(days=30))),
+        vencendo_90=Count("id", filter=Q(vigencia_fim__gte=hoje, vigencia_fim__lte=hoje + timedelta(days=90))),
+        vencidos=Count("id", filter=Q(vigencia_fim__lt=hoje)),
+        # Execução financeira: lida do resumo materializado (JOIN 1-1, não varre contratos/pagamentos)
+        total_contratado=Sum("resumo__total_contratado_atualizado"),
+        total_pago=Sum("resumo__total_pago"),
+        saldo_financeiro=Sum("resumo__saldo"),
+    )
+    for k in ("total_repasse", "total_contrapartida", "total_contratado", "total_pago", "saldo_financeiro"):
+        cards[k] = cards[k] or 0
 
+    cache.set(cache_key, cards, settings.DASHBOARD_CACHE_TTL)
+    return cards
 
-def dashboard_data(request):
+
+def dashboard(request):
+    return render(request, "dashboard.html", _dashboard_cards())
+
+
+def _dashboard_payload():
     # 1) Convênios por tipo
     por_tipo_qs = (
         Convenio.objects.values("tipo")
@@ -97,18 +105,19 @@ def dashboard_data(request):
         if key in repasse_por_mes:
             repasse_por_mes[key] = float(row["total"] or 0)
 
-    # 3) Alertas (OK / amarelo / vermelho / vencido)
-    buckets = OrderedDict([
-        ("OK (>90d)", 0),
-        ("Amarelo (≤90d)", 0),
-        ("Vermelho (≤30d)", 0),
-        ("Vencido", 0),
-    ])
+    # 3) Alertas (OK / amarelo / vermelho / vencido) - agrupado no banco (CASE WHEN)
+    buckets = OrderedDict((label, 0) for label in ALERTAS_LABELS.values())
 
-    for c in Convenio.objects.only("vigencia_fim"):
-        buckets[_alerta_bucket(c.vigencia_fim)] += 1
+    alertas_qs = (
+        Convenio.objects.with_alerta_vigencia()
+        .values("_alerta_vigencia")
+        .annotate(qtd=Count("id"))
+        .order_by()
+    )
+    for row in alertas_qs:
+        buckets[ALERTAS_LABELS[row["_alerta_vigencia"]]] = row["qtd"]
 
-    return JsonResponse({
+    return {
         "por_tipo": por_tipo,
         "repasse_por_mes": {
             "labels": list(repasse_por_mes.keys()),
@@ -118,4 +127,41 @@ def dashboard_data(request):
             "labels": list(buckets.keys()),
             "values": list(buckets.values()),
         }
-    })
+    }
+
+
+def _dashboard_etag(request):
+    return f"{int(dashboard_versao() * 1000)}-{timezone.localdate().isoformat()}"
+
+
+def _dashboard_last_modified(request):
+    # a virada do dia também "modifica" os dados (buckets de vigência)
+    alterado_em = datetime.fromtimestamp(dashboard_versao(), tz=dt_timezone.utc)
+    inicio_do_dia = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+    return max(alterado_em, inicio_do_dia)
+
+
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_dashboard_etag, last_modified_func=_dashboard_last_modified)
+def dashboard_data(request):
+    """
+    JSON dos gráficos do dashboard, em cache até a próxima alteração de Convenio
+    (ou a virada do dia). ETag/Last-Modified permitem revalidar com 304.
+    """
+    cache_key = f"dashboard:data:{_dashboard_etag(request)}"
+    payload = cache.get(cache_key)
+    if payload is None:
+        payload = _dashboard_payload()
+        cache.set(cache_key, payload, settings.DASHBOARD_DATA_CACHE_TTL)
+    return JsonResponse(payload)
+
+
+@staff_member_required
+@cache_control(private=True, no_cache=True)
+def instrumentacao_dados(request):
+    """Histogramas de queries/tempos por rota (todos os processos), ver core/instrumentacao.py."""
+    return JsonResponse({
+        "orcamentos": settings.INSTRUMENTACAO_ORCAMENTOS,
+        "rotas": instrumentacao.relatorio(),
+        "conexoes": instrumentacao.coletar_conexoes(),
+    }, json_dumps_params={"ensure_ascii": False})
@@ -6,6 +6,8 @@ from .models import Pagamento
 class PagamentoAdmin(admin.ModelAdmin):
     list_display = ("data", "contrato", "valor_pago", "numero_empenho", "numero_nf", "numero_ob")
     list_filter = ("data",)
+    # __str__ do contrato usa a empresa: as duas no mesmo SELECT
+    list_select_related = ("contrato__empresa",)
     search_fields = (
         "contrato__numero_contrato",
         "contrato__empresa__razao_social",
@@ -0,0 +1,286 @@
+"""
+Verificação de consistência de contratos e pagamentos (comando check_consistencia e
+relatório /financeiro/consistencia/), com uma query agregada por verificação em vez das
+properties por objeto (Contrato.total_pago, Convenio.total_contratado_atualizado, ...):
+
+  - PAGAMENTO_EXCEDENTE: total pago no contrato > valor atualizado (contratado + acréscimos - supressões);
+  - CONTRATADO_EXCEDENTE: contratado atualizado dos contratos do convênio > repasse + contrapartida;
+  - SUPRESSAO_EXCEDENTE: supressões do contrato > valor contratado;
+  - PAGAMENTO_FORA_CONTRATO: pagamento antes de data_inicio ou depois de data_fim do contrato
+    (data_fim é o fim vigente: aditivos de prazo devem estar refletidos nela);
+  - PAGAMENTO_FORA_VIGENCIA: pagamento fora de vigencia_inicio..vigencia_fim do convênio;
+  - OB_DUPLICADA: mesmo nº de ordem bancária em mais de um pagamento;
+  - NF_DUPLICADA: mesmo nº de nota fiscal em mais de um pagamento da mesma empresa.
+
+Os achados ficam em Inconsistencia, substituídos por tipo a cada execução.
+
+Modo incremental: a partir do início da última execução concluída, cada verificação roda
+só sobre as linhas alteradas desde então (updated_at de Convenio/Contrato/Aditivo/Pagamento,
+propagado para quem depende delas: um pagamento alterado reabre o contrato, um contrato
+alterado reabre o convênio) mais as que já tinham achado em aberto, que assim são
+confirmados ou resolvidos. Alterações por update()/SQL direto não mexem em updated_at:
+rode o modo completo periodicamente.
+"""
+import time
+
+from django.db import transaction
+from django.db.models import Count, F, Min, OuterRef, Q, Sum
+from django.utils import timezone
+
+from contratos.models import Aditivo, Contrato
+from convenios.models import Convenio
+from core.db import MONEY, soma_subquery
+
+from .models import ConsistenciaExecucao, Inconsistencia, Pagamento
+
+Tipo = Inconsistencia.Tipo
+
+LOTE = 2000
+
+
+def _abertos(tipo, coluna):
+    """Subquery com `coluna` dos achados em aberto do tipo."""
+    return Inconsistencia.objects.filter(tipo=tipo).values(coluna)
+
+
+def _no_escopo(qs, desde, alterados, tipo, coluna):
+    """Completo (desde=None): qs inteiro. Incremental: alterados desde `desde` ou já em aberto."""
+    if desde is None:
+        return qs
+    return qs.filter(alterados(desde) | Q(pk__in=_abertos(tipo, coluna)))
+
+
+# linhas alteradas desde `desde`, como filtros sobre cada model verificado
+
+
+def _contratos_alterados(desde):
+    # apagar aditivo também marca o contrato (contratos/signals.py)
+    return (
+        Q(pk__in=Contrato.objects.filter(updated_at__gte=desde).values("pk"))
+        | Q(pk__in=Aditivo.objects.filter(updated_at__gte=desde).values("contrato_id"))
+        | Q(pk__in=Pagamento.objects.filter(updated_at__gte=desde).values("contrato_id"))
+    )
+
+
+def _convenios_alterados(desde):
+    return Q(pk__in=Convenio.objects.filter(updated_at__gte=desde).values("pk")) | Q(
+        pk__in=Contrato.objects.filter(_contratos_alterados(desde)).values("convenio_id")
+    )
+
+
+def _pagamentos_alterados_contrato(desde):
+    return Q(updated_at__gte=desde) | Q(
+        contrato_id__in=Contrato.objects.filter(updated_at__gte=desde).values("pk")
+    )
+
+
+def _pagamentos_alterados_vigencia(desde):
+    contratos = Contrato.objects.filter(
+        Q(updated_at__gte=desde) | Q(convenio_id__in=Convenio.objects.filter(updated_at__gte=desde).values("pk"))
+    )
+    return Q(updated_at__gte=desde) | Q(contrato_id__in=contratos.values("pk"))
+
+
+# verificações: desde (None = completo) -> Inconsistencia ainda não gravadas
+
+
+def pagamento_excedente(desde=None):
+    tipo = Tipo.PAGAMENTO_EXCEDENTE
+    qs = _no_escopo(Contrato.objects.all(), desde, _contratos_alterados, tipo, "contrato_id")
+    linhas = (
+        qs.with_financials()
+        # contrato sem pagamento com supressões acima do valor fica só em SUPRESSAO_EXCEDENTE
+        .filter(_total_pago__gt=F("_valor_atualizado")).filter(_total_pago__gt=0)
+        .values_list("pk", "convenio_id", "numero_contrato", "_total_pago", "_valor_atualizado")
+    )
+    for pk, convenio_id, numero, pago, atualizado in linhas.iterator(chunk_size=LOTE):
+        yield Inconsistencia(
+            tipo=tipo, chave=str(pk), convenio_id=convenio_id, contrato_id=pk, valor=pago - atualizado,
+            detalhe=f"Contrato {numero}: pago {pago} de {atualizado}",
+        )
+
+
+def supressao_excedente(desde=None):
+    tipo = Tipo.SUPRESSAO_EXCEDENTE
+    qs = _no_escopo(Contrato.objects.all(), desde, _contratos_alterados, tipo, "contrato_id")
+    linhas = (
+        qs.annotate(
+            _supressoes=soma_subquery(Aditivo.objects.filter(contrato=OuterRef("pk")), "valor_supressao", "contrato")
+        )
+        .filter(_supressoes__gt=F("valor_contratado"))
+        .values_list("pk", "convenio_id", "numero_contrato", "_supressoes", "valor_contratado")
+    )
+    for pk, convenio_id, numero, supressoes, contratado in linhas.iterator(chunk_size=LOTE):
+        yield Inconsistencia(
+            tipo=tipo, chave=str(pk), convenio_id=convenio_id, contrato_id=pk, valor=supressoes - contratado,
+            detalhe=f"Contrato {numero}: supressões de {supressoes} sobre {contratado} contratados",
+        )
+
+
+def contratado_excedente(desde=None):
+    tipo = Tipo.CONTRATADO_EXCEDENTE
+    qs = _no_escopo(Convenio.objects.all(), desde, _convenios_alterados, tipo, "convenio_id")
+    linhas = (
+        qs.with_financials()
+        .filter(_total_contratado_atualizado__gt=F("valor_repasse") + F("valor_contrapartida"))
+        .values_list(
+            "pk", "numero_convenio", "_total_contratado_atualizado", "valor_repasse", "valor_contrapartida"
+        )
+    )
+    for pk, numero, contratado, repasse, contrapartida in linhas.iterator(chunk_size=LOTE):
+        total = repasse + contrapartida
+        yield Inconsistencia(
+            tipo=tipo, chave=str(pk), convenio_id=pk, valor=contratado - total,
+            detalhe=f"Convênio {numero or pk}: {contratado} contratados para {total} do convênio",
+        )
+
+
+def pagamento_fora_contrato(desde=None):
+    tipo = Tipo.PAGAMENTO_FORA_CONTRATO
+    qs = _no_escopo(Pagamento.objects.all(), desde, _pagamentos_alterados_contrato, tipo, "pagamento_id")
+    linhas = qs.filter(
+        Q(data__lt=F("contrato__data_inicio")) | Q(data__gt=F("contrato__data_fim"))
+    ).values_list(
+        "pk", "contrato_id", "contrato__convenio_id", "contrato__numero_contrato", "data", "valor_pago",
+        "contrato__data_inicio", "contrato__data_fim",
+    )
+    for pk, contrato_id, convenio_id, numero, data, valor, inicio, fim in linhas.iterator(chunk_size=LOTE):
+        yield Inconsistencia(
+            tipo=tipo, chave=str(pk), convenio_id=convenio_id, contrato_id=contrato_id, pagamento_id=pk,
+            valor=valor,
+            detalhe=f"Pagamento de {data:%d/%m/%Y} no contrato {numero} ({inicio:%d/%m/%Y} a "
+                    f"{f'{fim:%d/%m/%Y}' if fim else '-'})",
+        )
+
+
+def pagamento_fora_vigencia(desde=None):
+    tipo = Tipo.PAGAMENTO_FORA_VIGENCIA
+    qs = _no_escopo(Pagamento.objects.all(), desde, _pagamentos_alterados_vigencia, tipo, "pagamento_id")
+    linhas = qs.filter(
+        Q(data__lt=F("contrato__convenio__vigencia_inicio")) | Q(data__gt=F("contrato__convenio__vigencia_fim"))
+    ).values_list(
+        "pk", "contrato_id", "contrato__convenio_id", "contrato__convenio__numero_convenio", "data",
+        "valor_pago", "contrato__convenio__vigencia_inicio", "contrato__convenio__vigencia_fim",
+    )
+    for pk, contrato_id, convenio_id, numero, data, valor, inicio, fim in linhas.iterator(chunk_size=LOTE):
+        yield Inconsistencia(
+            tipo=tipo, chave=str(pk), convenio_id=convenio_id, contrato_id=contrato_id, pagamento_id=pk,
+            valor=valor,
+            detalhe=f"Pagamento de {data:%d/%m/%Y} no convênio {numero or convenio_id} "
+                    f"({inicio:%d/%m/%Y} a {fim:%d/%m/%Y})",
+        )
+
+
+def _repetidos(tipo, campo, desde, grupo=()):
+    """GROUP BY (grupo..., campo) HAVING COUNT(*) > 1 sobre os pagamentos com o número preenchido."""
+    qs = Pagamento.objects.exclude(**{f"{campo}__isnull": True}).exclude(**{campo: ""})
+    if desde is not None:
+        # números dos pagamentos alterados ou já repetidos (em qualquer empresa, no caso da NF)
+        numeros = Pagamento.objects.filter(updated_at__gte=desde).values(campo)
+        qs = qs.filter(Q(**{f"{campo}__in": numeros}) | Q(**{f"{campo}__in": _abertos(tipo, "numero")}))
+    return (
+        qs.order_by()
+        .values(*grupo, campo)
+        .annotate(
+            _qtd=Count("id"),
+            _total=Sum("valor_pago", output_field=MONEY),
+            _pagamento=Min("id"),
+            _contrato=Min("contrato_id"),
+        )
+        .filter(_qtd__gt=1)
+        .values_list(*grupo, campo, "_qtd", "_total", "_pagamento", "_contrato")
+    )
+
+
+def ob_duplicada(desde=None):
+    tipo = Tipo.OB_DUPLICADA
+    for numero, qtd, total, pagamento_id, contrato_id in _repetidos(tipo, "numero_ob", desde).iterator(
+        chunk_size=LOTE
+    ):
+        yield Inconsistencia(
+            tipo=tipo, chave=numero, numero=numero, contrato_id=contrato_id, pagamento_id=pagamento_id,
+            valor=total, detalhe=f"OB {numero} em {qtd} pagamentos",
+        )
+
+
+def nf_duplicada(desde=None):
+    tipo = Tipo.NF_DUPLICADA
+    linhas = _repetidos(tipo, "numero_nf", desde, grupo=("contrato__empresa_id",))
+    for empresa_id, numero, qtd, total, pagamento_id, contrato_id in linhas.iterator(chunk_size=LOTE):
+        yield Inconsistencia(
+            tipo=tipo, chave=f"{empresa_id}/{numero}", numero=numero, contrato_id=contrato_id,
+            pagamento_id=pagamento_id, valor=total, detalhe=f"NF {numero} em {qtd} pagamentos da mesma empresa",
+        )
+
+
+VERIFICACOES = {
+    Tipo.PAGAMENTO_EXCEDENTE: pagamento_excedente,
+    Tipo.CONTRATADO_EXCEDENTE: contratado_excedente,
+    Tipo.SUPRESSAO_EXCEDENTE: supressao_excedente,
+    Tipo.PAGAMENTO_FORA_CONTRATO: pagamento_fora_contrato,
+    Tipo.PAGAMENTO_FORA_VIGENCIA: pagamento_fora_vigencia,
+    Tipo.OB_DUPLICADA: ob_duplicada,
+    Tipo.NF_DUPLICADA: nf_duplicada,
+}
+
+
+# colunas regravadas quando o achado muda; detectada_em fica a da primeira vez
+CAMPOS_ACHADO = ("convenio_id", "contrato_id", "pagamento_id", "numero", "valor", "detalhe")
+
+
+def _substituir(tipo, achados, agora):
+    """
+    Sincroniza os achados do tipo com os encontrados agora: apaga os resolvidos e grava só
+    os novos ou alterados (upsert), então uma execução sem mudanças não escreve nada.
+    """
+    # materializa antes de escrever: o escopo incremental lê os achados em aberto
+    encontrados = {achado.chave: achado for achado in achados}
+    existentes = {
+        chave: (pk, valores)
+        for pk, chave, *valores in Inconsistencia.objects.filter(tipo=tipo).values_list("pk", "chave", *CAMPOS_ACHADO)
+    }
+
+    resolvidos = [pk for chave, (pk, _) in existentes.items() if chave not in encontrados]
+    for i in range(0, len(resolvidos), LOTE):
+        Inconsistencia.objects.filter(pk__in=resolvidos[i:i + LOTE]).delete()
+
+    gravar = []
+    for chave, achado in encontrados.items():
+        if chave in existentes and existentes[chave][1] == [getattr(achado, c) for c in CAMPOS_ACHADO]:
+            continue
+        achado.detectada_em = agora
+        gravar.append(achado)
+    Inconsistencia.objects.bulk_create(
+        gravar,
+        batch_size=LOTE,
+        update_conflicts=True,
+        unique_fields=["tipo", "chave"],
+        update_fields=list(CAMPOS_ACHADO),
+    )
+    return len(encontrados)
+
+
+def ultima_execucao():
+    return ConsistenciaExecucao.objects.filter(concluida_em__isnull=False).order_by("-iniciada_em").first()
+
+
+def verificar(incremental=False) -> ConsistenciaExecucao:
+    """
+    Roda todas as verificações e grava a execução. Incremental sem execução anterior
+    concluída vira completo.
+    """
+    anterior = ultima_execucao() if incremental else None
+    desde = anterior.iniciada_em if anterior else None
+    execucao = ConsistenciaExecucao(iniciada_em=timezone.now(), incremental=desde is not None)
+
+    inicio = time.perf_counter()
+    with transaction.atomic():
+        for tipo, verificacao in VERIFICACOES.items():
+            _substituir(tipo, verificacao(desde), execucao.iniciada_em)
+        execucao.contagens = {tipo: 0 for tipo in VERIFICACOES} | dict(
+            Inconsistencia.objects.order_by().values("tipo").annotate(n=Count("id")).values_list("tipo", "n")
+        )
+        execucao.concluida_em = timezone.now()
+        execucao.duracao_ms = round((time.perf_counter() - inicio) * 1000)
+        execucao.save()
+    return execucao
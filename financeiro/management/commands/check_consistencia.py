@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from financeiro import consistencia
+from financeiro.models import Inconsistencia
+
+
+class Command(BaseCommand):
+    help = (
+        "Verifica a consistência de contratos e pagamentos (financeiro/consistencia.py): pagamentos "
+        "acima do valor atualizado, contratado acima do convênio, supressões acima do contratado, "
+        "pagamentos fora do período do contrato/vigência e OB/NF repetidas. Os achados ficam no "
+        "relatório /financeiro/consistencia/."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Só o que mudou desde a última execução (e os achados em aberto); sem execução anterior, completo",
+        )
+
+    def handle(self, *args, **options):
+        execucao = consistencia.verificar(incremental=options["incremental"])
+
+        for tipo, qtd in execucao.contagens.items():
+            self.stdout.write(f"{Inconsistencia.Tipo(tipo).label}: {qtd}")
+        modo = "incremental" if execucao.incremental else "completa"
+        total = sum(execucao.contagens.values())
+        estilo = self.style.WARNING if total else self.style.SUCCESS
+        self.stdout.write(estilo(f"Verificação {modo} em {execucao.duracao_ms} ms: {total} inconsistência(s) em aberto."))
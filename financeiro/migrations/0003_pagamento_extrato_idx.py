@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contratos', '0002_aditivo_aditivo_contrato_data_idx'),
+        ('financeiro', '0002_pagamento_pagamento_contrato_data_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['contrato', 'data', 'id'], name='pagamento_contrato_data_id_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='pagamento',
+            name='pagamento_contrato_data_idx',
+        ),
+    ]
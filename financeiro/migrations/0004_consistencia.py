@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contratos', '0003_updated_at'),
+        ('financeiro', '0003_pagamento_extrato_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsistenciaExecucao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('iniciada_em', models.DateTimeField()),
+                ('concluida_em', models.DateTimeField(blank=True, null=True)),
+                ('incremental', models.BooleanField(default=False)),
+                ('contagens', models.JSONField(default=dict)),
+                ('duracao_ms', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-iniciada_em'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Inconsistencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('PAGAMENTO_EXCEDENTE', 'Pago acima do valor atualizado do contrato'), ('CONTRATADO_EXCEDENTE', 'Contratado acima do valor do convênio'), ('SUPRESSAO_EXCEDENTE', 'Supressões acima do valor contratado'), ('PAGAMENTO_FORA_CONTRATO', 'Pagamento fora do período do contrato'), ('PAGAMENTO_FORA_VIGENCIA', 'Pagamento fora da vigência do convênio'), ('OB_DUPLICADA', 'Ordem bancária repetida'), ('NF_DUPLICADA', 'Nota fiscal repetida na mesma empresa')], max_length=30)),
+                ('chave', models.CharField(max_length=120)),
+                ('convenio_id', models.BigIntegerField(blank=True, null=True)),
+                ('contrato_id', models.BigIntegerField(blank=True, null=True)),
+                ('pagamento_id', models.BigIntegerField(blank=True, null=True)),
+                ('numero', models.CharField(blank=True, max_length=80, null=True)),
+                ('valor', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('detalhe', models.CharField(max_length=255)),
+                ('detectada_em', models.DateTimeField()),
+            ],
+            options={
+                'ordering': ['tipo', '-valor', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='pagamento',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='pagamento',
+            index=models.Index(fields=['updated_at'], name='pagamento_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inconsistencia',
+            index=models.Index(fields=['tipo', '-valor', 'id'], name='inconsistencia_tipo_valor_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='inconsistencia',
+            constraint=models.UniqueConstraint(fields=('tipo', 'chave'), name='inconsistencia_tipo_chave_uniq'),
+        ),
+    ]
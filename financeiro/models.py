@@ -1,4 +1,44 @@
 from django.db import models
+from django.db.models import F, Max, OuterRef, Q, Sum, Window
+from django.db.models.expressions import RowRange
+
+from core.db import MONEY, soma_subquery
+
+
+class PagamentoQuerySet(models.QuerySet):
+    def with_saldo_corrente(self):
+        """
+        Extrato: anota em cada pagamento, numa única query (funções de janela),
+          - _acumulado: total pago no contrato até este pagamento
+            (SUM(valor_pago) OVER (PARTITION BY contrato ORDER BY data, id));
+          - _acumulado_extrato: total pago até aqui no recorte todo (ex.: no convênio);
+          - _valor_atualizado / _saldo: valor atualizado do contrato e quanto resta dele.
+
+        A janela roda sobre o recorte filtrado ANTES desta chamada (filtre por convênio/
+        contrato antes). Filtros aplicados depois sobre _data/_id (paginação por keyset)
+        vão para fora da janela (o Django gera um SELECT externo), então o acumulado da
+        página continua contando os pagamentos das páginas anteriores.
+        """
+        from contratos.models import Aditivo
+
+        ordem = [F("data").asc(), F("id").asc()]
+        por_contrato = {"partition_by": [F("contrato_id")], "order_by": ordem}
+        aditivos = Aditivo.objects.filter(contrato=OuterRef("contrato_id"))
+        return self.annotate(
+            _acumulado=Window(Sum("valor_pago"), **por_contrato, output_field=MONEY),
+            _acumulado_extrato=Window(Sum("valor_pago"), order_by=ordem, output_field=MONEY),
+            # a própria chave (data, id) lida pela mesma janela (frame = linha atual):
+            # filtros nela vão para o SELECT externo, depois das somas
+            _data=Window(Max("data"), frame=RowRange(0, 0), **por_contrato),
+            _id=Window(Max("id"), frame=RowRange(0, 0), **por_contrato),
+            _valor_atualizado=models.ExpressionWrapper(
+                F("contrato__valor_contratado")
+                + soma_subquery(aditivos, F("valor_acrescimo") - F("valor_supressao"), "contrato"),
+                output_field=MONEY,
+            ),
+        ).annotate(
+            _saldo=models.ExpressionWrapper(F("_valor_atualizado") - F("_acumulado"), output_field=MONEY),
+        )
 
 
 class Pagamento(models.Model):
@@ -12,8 +52,104 @@ class Pagamento(models.Model):
 
     observacao = models.CharField(max_length=255, blank=True, null=True)
 
+    # modo incremental do check_consistencia (financeiro/consistencia.py)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = PagamentoQuerySet.as_manager()
+
     class Meta:
         ordering = ["-data"]
+        indexes = [
+            # total pago / último pagamento por contrato, histórico por data e a janela
+            # do extrato (PARTITION BY contrato ORDER BY data, id) sem ordenar em memória
+            models.Index(fields=["contrato", "data", "id"], name="pagamento_contrato_data_id_idx"),
+            models.Index(fields=["updated_at"], name="pagamento_updated_idx"),
+        ]
 
     def __str__(self):
         return f"{self.contrato.numero_contrato} - {self.data} - R$ {self.valor_pago}"
+
+    @property
+    def acumulado(self):
+        """Total pago no contrato até este pagamento (inclusive), na ordem (data, id)."""
+        if hasattr(self, "_acumulado"):
+            return self._acumulado
+        anteriores = Q(data__lt=self.data) | Q(data=self.data, pk__lte=self.pk)
+        return Pagamento.objects.filter(anteriores, contrato_id=self.contrato_id).aggregate(
+            s=Sum("valor_pago")
+        )["s"] or 0
+
+    @property
+    def saldo_contrato(self):
+        """Quanto resta do valor atualizado do contrato depois deste pagamento."""
+        if hasattr(self, "_saldo"):
+            return self._saldo
+        return self.contrato.valor_atualizado - self.acumulado
+
+    @property
+    def acumulado_extrato(self):
+        """Total pago até aqui no recorte do extrato (só com with_saldo_corrente)."""
+        return getattr(self, "_acumulado_extrato", None)
+
+
+class Inconsistencia(models.Model):
+    """
+    Achado em aberto do check_consistencia (financeiro/consistencia.py), único por (tipo, chave).
+    Os ids são inteiros simples, sem FK: a exclusão em lote de convênios (convenios/exclusao.py)
+    não precisa conhecer esta tabela; achados de registros apagados somem na verificação seguinte.
+    """
+
+    class Tipo(models.TextChoices):
+        PAGAMENTO_EXCEDENTE = "PAGAMENTO_EXCEDENTE", "Pago acima do valor atualizado do contrato"
+        CONTRATADO_EXCEDENTE = "CONTRATADO_EXCEDENTE", "Contratado acima do valor do convênio"
+        SUPRESSAO_EXCEDENTE = "SUPRESSAO_EXCEDENTE", "Supressões acima do valor contratado"
+        PAGAMENTO_FORA_CONTRATO = "PAGAMENTO_FORA_CONTRATO", "Pagamento fora do período do contrato"
+        PAGAMENTO_FORA_VIGENCIA = "PAGAMENTO_FORA_VIGENCIA", "Pagamento fora da vigência do convênio"
+        OB_DUPLICADA = "OB_DUPLICADA", "Ordem bancária repetida"
+        NF_DUPLICADA = "NF_DUPLICADA", "Nota fiscal repetida na mesma empresa"
+
+    tipo = models.CharField(max_length=30, choices=Tipo.choices)
+    # id do contrato/convênio/pagamento verificado, nº da OB ou "empresa/nº da NF"
+    chave = models.CharField(max_length=120)
+
+    convenio_id = models.BigIntegerField(blank=True, null=True)
+    contrato_id = models.BigIntegerField(blank=True, null=True)
+    pagamento_id = models.BigIntegerField(blank=True, null=True)
+    # nº da OB/NF repetida (escopo do modo incremental)
+    numero = models.CharField(max_length=80, blank=True, null=True)
+
+    # excesso (valores) ou valor do(s) pagamento(s) envolvido(s)
+    valor = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    detalhe = models.CharField(max_length=255)
+    # primeira verificação em que apareceu (mantida enquanto continuar em aberto)
+    detectada_em = models.DateTimeField()
+
+    class Meta:
+        ordering = ["tipo", "-valor", "id"]
+        indexes = [
+            # relatório por keyset em (tipo, -valor, id)
+            models.Index(fields=["tipo", "-valor", "id"], name="inconsistencia_tipo_valor_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["tipo", "chave"], name="inconsistencia_tipo_chave_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()}: {self.detalhe}"
+
+
+class ConsistenciaExecucao(models.Model):
+    """Uma execução do check_consistencia; a última concluída é o ponto de partida do incremental."""
+
+    iniciada_em = models.DateTimeField()
+    concluida_em = models.DateTimeField(blank=True, null=True)
+    incremental = models.BooleanField(default=False)
+    # tipo -> achados em aberto ao fim da execução
+    contagens = models.JSONField(default=dict)
+    duracao_ms = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ["-iniciada_em"]
+
+    def __str__(self):
+        return f"{'Incremental' if self.incremental else 'Completa'} em {self.iniciada_em:%d/%m/%Y %H:%M}"
@@ -1,3 +1,258 @@
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from contratos.models import Aditivo, Contrato, Empresa
+from convenios.models import Convenio
+
+from . import consistencia
+from .models import ConsistenciaExecucao, Inconsistencia, Pagamento
+
+
+class ExtratoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        empresa = Empresa.objects.create(cnpj="00.000.000/0001-00", razao_social="Empresa Teste")
+        cls.convenio = Convenio.objects.create(
+            tipo=Convenio.Tipo.FEDERAL,
+            numero_convenio="900/2025",
+            orgao_concedente="Ministério da Saúde",
+            objeto="Objeto",
+            vigencia_inicio=date(2025, 1, 1),
+            vigencia_fim=date(2026, 12, 31),
+        )
+        cls.a, cls.b = [
+            Contrato.objects.create(
+                convenio=cls.convenio,
+                empresa=empresa,
+                numero_contrato=numero,
+                objeto_contratado="Obra",
+                valor_contratado=Decimal("1000.00"),
+                data_inicio=date(2025, 2, 1),
+            )
+            for numero in ("CT-A", "CT-B")
+        ]
+        Aditivo.objects.create(
+            contrato=cls.a, tipo=Aditivo.Tipo.VALOR, numero_aditivo="1", data=date(2025, 3, 1),
+            valor_acrescimo=Decimal("200.00"), valor_supressao=Decimal("50.00"),
+        )
+        # (contrato, data, valor) - dois pagamentos de A no mesmo dia: desempate pelo id
+        for contrato, data, valor in (
+            (cls.a, date(2025, 4, 1), "100.00"),
+            (cls.b, date(2025, 4, 2), "300.00"),
+            (cls.a, date(2025, 5, 1), "200.00"),
+            (cls.a, date(2025, 5, 1), "400.00"),
+            (cls.b, date(2025, 6, 1), "800.00"),
+        ):
+            Pagamento.objects.create(contrato=contrato, data=data, valor_pago=Decimal(valor))
+
+        # outro convênio: não entra no recorte nem nas somas
+        outro = Convenio.objects.create(
+            tipo=Convenio.Tipo.FEDERAL, orgao_concedente="Outro", objeto="Objeto",
+            vigencia_inicio=date(2025, 1, 1), vigencia_fim=date(2026, 12, 31),
+        )
+        contrato = Contrato.objects.create(
+            convenio=outro, empresa=empresa, numero_contrato="CT-X", objeto_contratado="Obra",
+            valor_contratado=Decimal("10.00"), data_inicio=date(2025, 2, 1),
+        )
+        Pagamento.objects.create(contrato=contrato, data=date(2025, 1, 1), valor_pago=Decimal("9999.00"))
+
+    ESPERADO = [
+        # contrato, acumulado no contrato, saldo do contrato, acumulado no convênio
+        ("CT-A", Decimal("100"), Decimal("1050"), Decimal("100")),
+        ("CT-B", Decimal("300"), Decimal("700"), Decimal("400")),
+        ("CT-A", Decimal("300"), Decimal("850"), Decimal("600")),
+        ("CT-A", Decimal("700"), Decimal("450"), Decimal("1000")),
+        ("CT-B", Decimal("1100"), Decimal("-100"), Decimal("1800")),
+    ]
+
+    def _linhas(self, pagamentos):
+        return [
+            (p.contrato.numero_contrato, p.acumulado, p.saldo_contrato, p.acumulado_extrato)
+            for p in pagamentos
+        ]
+
+    def test_acumulado_atravessa_as_paginas(self):
+        url = reverse("financeiro:extrato_convenio", args=[self.convenio.pk])
+        linhas, paginas, proximo = [], [], f"{url}?tamanho=2"
+        while proximo:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(proximo)
+            # convênio + página do extrato (somas por janela, sem query por linha)
+            self.assertEqual(len(ctx.captured_queries), 2)
+            self.assertIn("OVER", ctx.captured_queries[-1]["sql"])
+            linhas += self._linhas(response.context["pagamentos"])
+            paginas.append(response.context["pagamentos"])
+            proximo = response.context["url_proximo"] and url + response.context["url_proximo"]
+
+        self.assertEqual(linhas, self.ESPERADO)
+        self.assertEqual(len(paginas), 3)
+
+        # voltando uma página a partir da última
+        anterior = url + response.context["url_anterior"]
+        self.assertEqual(self._linhas(self.client.get(anterior).context["pagamentos"]), self.ESPERADO[2:4])
+
+    def test_extrato_do_contrato(self):
+        response = self.client.get(reverse("financeiro:extrato_contrato", args=[self.b.pk]))
+        self.assertEqual(
+            [(p.acumulado, p.saldo_contrato) for p in response.context["pagamentos"]],
+            [(Decimal("300"), Decimal("700")), (Decimal("1100"), Decimal("-100"))],
+        )
+        self.assertContains(response, "text-danger")
+
+    def test_properties_sem_anotacao(self):
+        ultimo_a = Pagamento.objects.filter(contrato=self.a).order_by("-data", "-id").first()
+        self.assertEqual(ultimo_a.acumulado, Decimal("700.00"))
+        self.assertEqual(ultimo_a.saldo_contrato, Decimal("450.00"))
+        self.assertIsNone(ultimo_a.acumulado_extrato)
+
+    def test_busca_na_home(self):
+        response = self.client.get(reverse("financeiro:home"), {"q": "CT-B"})
+        self.assertContains(response, reverse("financeiro:extrato_contrato", args=[self.b.pk]))
+        response = self.client.get(reverse("financeiro:home"), {"q": "900/2025"})
+        self.assertContains(response, reverse("financeiro:extrato_convenio", args=[self.convenio.pk]))
+
+
+class ConsistenciaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        empresa = Empresa.objects.create(cnpj="00.000.000/0001-00", razao_social="Empresa Teste")
+        outra = Empresa.objects.create(cnpj="11.111.111/0001-11", razao_social="Outra Empresa")
+        cls.convenio = Convenio.objects.create(
+            tipo=Convenio.Tipo.FEDERAL, numero_convenio="900/2025", orgao_concedente="Ministério",
+            objeto="Objeto", valor_repasse=Decimal("1000.00"),
+            vigencia_inicio=date(2025, 1, 1), vigencia_fim=date(2025, 12, 31),
+        )
+
+        def contrato(numero, valor, empresa=empresa, data_fim=None):
+            return Contrato.objects.create(
+                convenio=cls.convenio, empresa=empresa, numero_contrato=numero, objeto_contratado="Obra",
+                valor_contratado=Decimal(valor), data_inicio=date(2025, 2, 1), data_fim=data_fim,
+            )
+
+        # contratado: 600 + 600 + (100 - 150) + 10 = 1160 > 1000 do convênio
+        cls.a = contrato("CT-A", "600.00", data_fim=date(2025, 6, 30))
+        cls.b = contrato("CT-B", "600.00")
+        cls.c = contrato("CT-C", "100.00")
+        cls.d = contrato("CT-D", "10.00", empresa=outra)
+        Aditivo.objects.create(
+            contrato=cls.c, tipo=Aditivo.Tipo.SUPRESSAO, numero_aditivo="1", data=date(2025, 3, 1),
+            valor_supressao=Decimal("150.00"),
+        )
+        # (contrato, data, valor, OB, NF)
+        for ct, data, valor, ob, nf in (
+            (cls.a, date(2025, 3, 1), "400.00", "OB1", "NF1"),
+            (cls.a, date(2025, 4, 1), "300.00", "OB1", ""),     # A: 710 pagos > 600; OB repetida
+            (cls.a, date(2025, 7, 15), "10.00", "", None),      # depois do fim do contrato
+            (cls.b, date(2026, 1, 10), "10.00", "OB2", "NF1"),  # fora da vigência; NF1 de novo na empresa
+            (cls.d, date(2025, 5, 1), "10.00", None, "NF1"),    # NF1 em outra empresa: ok
+        ):
+            Pagamento.objects.create(contrato=ct, data=data, valor_pago=Decimal(valor), numero_ob=ob, numero_nf=nf)
+        cls.fora_contrato, cls.fora_vigencia = Pagamento.objects.filter(valor_pago=10).order_by("data")[1:3]
+        cls.staff = User.objects.create_user("staff", password="x", is_staff=True)
+
+    def _achados(self):
+        return set(Inconsistencia.objects.values_list("tipo", "chave"))
+
+    def _esperado(self):
+        T = Inconsistencia.Tipo
+        empresa_a = self.a.empresa_id
+        return {
+            (T.PAGAMENTO_EXCEDENTE, str(self.a.pk)),
+            (T.CONTRATADO_EXCEDENTE, str(self.convenio.pk)),
+            (T.SUPRESSAO_EXCEDENTE, str(self.c.pk)),
+            (T.PAGAMENTO_FORA_CONTRATO, str(self.fora_contrato.pk)),
+            (T.PAGAMENTO_FORA_VIGENCIA, str(self.fora_vigencia.pk)),
+            (T.OB_DUPLICADA, "OB1"),
+            (T.NF_DUPLICADA, f"{empresa_a}/NF1"),
+        }
+
+    def test_verificacao_completa(self):
+        with CaptureQueriesContext(connection) as ctx:
+            execucao = consistencia.verificar()
+        self.assertEqual(self._achados(), self._esperado())
+        self.assertFalse(execucao.incremental)
+        self.assertEqual(sum(execucao.contagens.values()), 7)
+
+        excedente = Inconsistencia.objects.get(tipo=Inconsistencia.Tipo.PAGAMENTO_EXCEDENTE)
+        self.assertEqual((excedente.valor, excedente.convenio_id), (Decimal("110.00"), self.convenio.pk))
+
+        # uma consulta por verificação, sem query por contrato/pagamento
+        selects = [q for q in ctx.captured_queries if "financeiro_inconsistencia" not in q["sql"]]
+        self.assertLessEqual(len(selects), len(consistencia.VERIFICACOES) + 3)
+
+        # sem mudanças: nada é regravado e detectada_em se mantém
+        detectadas = dict(Inconsistencia.objects.values_list("chave", "detectada_em"))
+        with CaptureQueriesContext(connection) as ctx:
+            consistencia.verificar()
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith(("INSERT", "DELETE"))
+                          and "financeiro_inconsistencia" in q["sql"]])
+        self.assertEqual(dict(Inconsistencia.objects.values_list("chave", "detectada_em")), detectadas)
+
+    def test_incremental(self):
+        consistencia.verificar()
+        T = Inconsistencia.Tipo
+
+        # resolve o excesso de A, cria uma OB repetida e encurta a vigência por update() (sem updated_at)
+        acrescimo = Aditivo.objects.create(
+            contrato=self.a, tipo=Aditivo.Tipo.VALOR, numero_aditivo="2", data=date(2025, 5, 1),
+            valor_acrescimo=Decimal("200.00"),
+        )
+        Pagamento.objects.create(contrato=self.b, data=date(2025, 3, 1), valor_pago=Decimal("5.00"), numero_ob="OB2")
+        Convenio.objects.filter(pk=self.convenio.pk).update(vigencia_fim=date(2025, 3, 31))
+        depois_da_vigencia = (T.PAGAMENTO_FORA_VIGENCIA, str(Pagamento.objects.get(data=date(2025, 4, 1)).pk))
+
+        execucao = consistencia.verificar(incremental=True)
+        self.assertTrue(execucao.incremental)
+        achados = self._achados()
+        self.assertNotIn((T.PAGAMENTO_EXCEDENTE, str(self.a.pk)), achados)
+        self.assertIn((T.OB_DUPLICADA, "OB2"), achados)
+        # o update() não é visto pelo incremental, só pelo completo
+        self.assertNotIn(depois_da_vigencia, achados)
+        consistencia.verificar()
+        self.assertIn(depois_da_vigencia, self._achados())
+
+        # apagar o aditivo marca o contrato (no commit): o excesso volta no incremental
+        with self.captureOnCommitCallbacks(execute=True):
+            acrescimo.delete()
+        consistencia.verificar(incremental=True)
+        self.assertIn((T.PAGAMENTO_EXCEDENTE, str(self.a.pk)), self._achados())
+
+    def test_apagar_contrato_nao_marca_por_aditivo(self):
+        for n in range(3):
+            Aditivo.objects.create(
+                contrato=self.c, tipo=Aditivo.Tipo.PRAZO, numero_aditivo=f"P{n}", data=date(2025, 4, 1),
+            )
+        with CaptureQueriesContext(connection) as ctx, self.captureOnCommitCallbacks(execute=True):
+            self.c.delete()
+        # o contrato apagado não recebe UPDATE de updated_at (nem um por aditivo)
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith('UPDATE "contratos_contrato"')])
+
+    def test_comando_e_relatorio(self):
+        saida = StringIO()
+        call_command("check_consistencia", "--incremental", stdout=saida)
+        self.assertIn("7 inconsistência(s)", saida.getvalue())
+        # sem execução anterior, o incremental vira completo
+        self.assertFalse(ConsistenciaExecucao.objects.get().incremental)
+
+        url = reverse("financeiro:consistencia")
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        self.client.force_login(self.staff)
+        response = self.client.get(url, {"tipo": "OB_DUPLICADA"})
+        self.assertContains(response, "OB OB1 em 2 pagamentos")
+        self.assertEqual(len(response.context["inconsistencias"]), 1)
 
-# Create your tests here.
+        pagina = self.client.get(url, {"tamanho": 4})
+        proxima = self.client.get(url + pagina.context["url_proximo"])
+        self.assertEqual(
+            len({i.pk for i in pagina.context["inconsistencias"]} | {i.pk for i in proxima.context["inconsistencias"]}),
+            7,
+        )
@@ -4,6 +4,8 @@ from . import views
 app_name = "financeiro"
 
 urlpatterns = [
-    # ajuste para a sua view real (exemplo)
     path("", views.financeiro_home, name="home"),
+    path("extrato/convenio/<int:pk>/", views.extrato_convenio, name="extrato_convenio"),
+    path("extrato/contrato/<int:pk>/", views.extrato_contrato, name="extrato_contrato"),
+    path("consistencia/", views.consistencia, name="consistencia"),
 ]
@@ -1,4 +1,119 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import get_object_or_404, render
+from django.utils.http import urlencode
+
+from contratos.models import Contrato
+from convenios.busca import filtro_busca
+from convenios.models import Convenio
+from core.paginacao import paginar_keyset, tamanho_pagina
+
+from .consistencia import ultima_execucao
+from .models import Inconsistencia, Pagamento
+
+# colunas do extrato (o resto do pagamento/contrato fica fora do SELECT)
+CAMPOS_EXTRATO = (
+    "id", "data", "valor_pago", "numero_empenho", "numero_ob", "numero_nf",
+    "contrato__id", "contrato__numero_contrato",
+)
+
 
 def financeiro_home(request):
-    return render(request, "financeiro/home.html")
\ No newline at end of file
+    """Escolha do convênio ou contrato cujo extrato de pagamentos será aberto."""
+    q = (request.GET.get("q") or "").strip()
+    convenios = contratos = []
+    if q:
+        convenios = (
+            Convenio.objects.filter(filtro_busca(q))
+            .only("id", "numero_convenio", "orgao_concedente", "objeto")
+            .order_by("-id")[:20]
+        )
+        contratos = (
+            Contrato.objects.filter(numero_contrato__icontains=q)
+            .select_related("convenio", "empresa")
+            .only("id", "numero_contrato", "convenio__numero_convenio", "empresa__razao_social",
+                  "empresa__nome_fantasia")
+            .order_by("-id")[:20]
+        )
+    return render(request, "financeiro/home.html", {"q": q, "convenios": convenios, "contratos": contratos})
+
+
+def extrato_convenio(request, pk):
+    convenio = get_object_or_404(Convenio.objects.only("id", "numero_convenio", "orgao_concedente"), pk=pk)
+    return _extrato(request, Pagamento.objects.filter(contrato__convenio=convenio), {"convenio": convenio})
+
+
+def extrato_contrato(request, pk):
+    contrato = get_object_or_404(
+        Contrato.objects.select_related("convenio").only(
+            "id", "numero_contrato", "valor_contratado", "convenio__id", "convenio__numero_convenio"
+        ),
+        pk=pk,
+    )
+    return _extrato(request, Pagamento.objects.filter(contrato=contrato), {"contrato": contrato})
+
+
+def _extrato(request, qs, contexto):
+    """
+    Página do extrato em ordem cronológica, por keyset em (data, id): 1 query por página,
+    com acumulado e saldo calculados pelas funções de janela (Pagamento.with_saldo_corrente).
+    """
+    tamanho = tamanho_pagina(request.GET, settings.FINANCEIRO_EXTRATO_TAMANHO, settings.CONVENIOS_PAGINA_MAX)
+    qs = qs.select_related("contrato").only(*CAMPOS_EXTRATO).with_saldo_corrente()
+    pagina = paginar_keyset(
+        qs,
+        ("_data", "_id"),
+        depois=request.GET.get("depois"),
+        antes=request.GET.get("antes"),
+        tamanho=tamanho,
+    )
+
+    base = {"tamanho": tamanho} if "tamanho" in request.GET else {}
+    return render(
+        request,
+        "financeiro/extrato.html",
+        {
+            **contexto,
+            "pagamentos": pagina.itens,
+            "pagina": pagina,
+            "url_proximo": f"?{urlencode({**base, 'depois': pagina.proximo})}" if pagina.tem_proximo else "",
+            "url_anterior": f"?{urlencode({**base, 'antes': pagina.anterior})}" if pagina.tem_anterior else "",
+        },
+    )
+
+
+@staff_member_required
+def consistencia(request):
+    """
+    Achados em aberto do check_consistencia (financeiro/consistencia.py), por tipo,
+    com keyset em (tipo, -valor, id). Só lê a tabela de achados: a verificação roda no comando.
+    """
+    tipo = request.GET.get("tipo") or ""
+    if tipo not in Inconsistencia.Tipo.values:
+        tipo = ""
+    qs = Inconsistencia.objects.filter(tipo=tipo) if tipo else Inconsistencia.objects.all()
+
+    tamanho = tamanho_pagina(request.GET, settings.FINANCEIRO_EXTRATO_TAMANHO, settings.CONVENIOS_PAGINA_MAX)
+    pagina = paginar_keyset(
+        qs,
+        ("tipo", "-valor", "id"),
+        depois=request.GET.get("depois"),
+        antes=request.GET.get("antes"),
+        tamanho=tamanho,
+    )
+
+    execucao = ultima_execucao()
+    contagens = execucao.contagens if execucao else {}
+    base = {k: v for k, v in (("tipo", tipo), ("tamanho", request.GET.get("tamanho"))) if v}
+    return render(
+        request,
+        "financeiro/consistencia.html",
+        {
+            "execucao": execucao,
+            "tipos": [(valor, rotulo, contagens.get(valor, 0)) for valor, rotulo in Inconsistencia.Tipo.choices],
+            "tipo": tipo,
+            "inconsistencias": pagina.itens,
+            "url_proximo": f"?{urlencode({**base, 'depois': pagina.proximo})}" if pagina.tem_proximo else "",
+            "url_anterior": f"?{urlencode({**base, 'antes': pagina.anterior})}" if pagina.tem_anterior else "",
+        },
+    )
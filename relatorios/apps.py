@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class RelatoriosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'relatorios'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        if settings.RELATORIOS_PRECARREGAR != "0":
+            from .aquecimento import precarregar
+
+            precarregar(settings.RELATORIOS_PRECARREGAR)
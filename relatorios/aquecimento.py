@@ -0,0 +1,84 @@
+"""
+Pré-carregamento opcional da pilha de PDF (WeasyPrint + matplotlib).
+
+Por padrão as duas bibliotecas só são importadas quando o primeiro PDF/gráfico é gerado
+(relatorios/views.py e relatorios/graficos.py), então um worker que nunca serve PDF não
+paga o tempo de import nem a memória delas.
+
+Com RELATORIOS_GRAFICOS_PROCESSOS > 0 os gráficos são desenhados no pool de processos
+(spawn) de relatorios/graficos.py, que não herda nada do processo web: o matplotlib não é
+importado aqui, e o aquecimento manda um desenho ao pool para subir um processo já quente.
+
+RELATORIOS_PRECARREGAR (lido em RelatoriosConfig.ready()):
+  - "0": nada (padrão);
+  - "1": importa já no boot. Com `gunicorn --preload` o import acontece uma vez no
+    master e os workers herdam as páginas (copy-on-write);
+  - "fundo": importa e aquece numa thread depois do boot, sem atrasar o primeiro request.
+
+Também serve de hook do gunicorn, num gunicorn.conf.py:
+
+    def post_fork(server, worker):
+        from relatorios.aquecimento import aquecer
+        aquecer()
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_importado = False
+_aquecido = False
+
+
+def importar():
+    """Importa WeasyPrint e, só quando os gráficos são desenhados neste processo, o matplotlib."""
+    import weasyprint  # noqa: F401
+
+    if settings.RELATORIOS_GRAFICOS_PROCESSOS <= 0:
+        import matplotlib.figure  # noqa: F401
+
+
+def aquecer(renderizar=True) -> float:
+    """
+    Importa a pilha e, com `renderizar`, desenha um PDF mínimo aqui e um gráfico no pool
+    (ou aqui, sem pool) para carregar fontes/backends. Idempotente; retorna os segundos
+    gastos (0 se já feito).
+    """
+    global _importado, _aquecido
+    with _lock:
+        if _aquecido or (_importado and not renderizar):
+            return 0.0
+        inicio = time.perf_counter()
+        if not _importado:
+            importar()
+            _importado = True
+        if renderizar:
+            from weasyprint import HTML
+
+            from .graficos import aquecer_pool
+
+            aquecer_pool()
+            HTML(string="<p>aquecimento</p>").write_pdf()
+            _aquecido = True
+    segundos = time.perf_counter() - inicio
+    logger.info("Pilha de PDF pré-carregada em %.2fs", segundos)
+    return segundos
+
+
+def _aquecer_seguro(**kwargs):
+    try:
+        aquecer(**kwargs)
+    except Exception:
+        # sem WeasyPrint/libs nativas: o erro aparece de novo (e certo) no primeiro PDF
+        logger.exception("Falha ao pré-carregar a pilha de PDF")
+
+
+def precarregar(modo):
+    if modo == "1":
+        _aquecer_seguro(renderizar=False)
+    elif modo == "fundo":
+        threading.Thread(target=_aquecer_seguro, name="aquecimento-pdf", daemon=True).start()
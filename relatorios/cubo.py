@@ -0,0 +1,165 @@
+"""
+Cubo mensal dos convênios (CuboConvenios) para as quebras dos relatórios.
+
+Dimensões: mês de vigencia_inicio, tipo, status, órgão concedente e repasse_recebido;
+medidas: quantidade, soma do repasse e da contrapartida. Os totais e as quebras de
+/relatorios/dados/ e do PDF (por tipo, por status, repasse por mês) saem do cubo, com
+milhares de linhas em vez da tabela inteira de convênios, sempre que os filtros pedidos
+se escrevem sobre essas dimensões (filtrar()); senão, as views consultam os convênios.
+
+Atualização incremental por mês: cada save/delete de Convenio marca o mês (antigo e novo)
+de vigencia_inicio e, no commit, as células desses meses são recalculadas a partir dos
+convênios (relatorios/signals.py). Caminhos em lote que não disparam signals chamam
+atualizar_meses()/reconstruir() diretamente (importação, exclusão, massa sintética).
+"""
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils.dateparse import parse_date
+
+from convenios.models import Convenio
+
+from .models import CuboConvenios
+
+DIMENSOES = ("mes", "tipo", "status", "orgao_concedente", "repasse_recebido")
+
+# filtros de convenios.filtros sem dimensão no cubo: com qualquer um deles, consulta os convênios
+FILTROS_FORA_DO_CUBO = ("data_fim", "modalidade", "parlamentar", "q")
+
+# status relativos a vigencia_fim (convenios.filtros.aplicar_filtros)
+STATUS_RELATIVOS = {"OK", "VENCENDO", "VENCIDOS"}
+
+LOTE = 2000
+
+
+def mes_de(valor):
+    """1º dia do mês de uma data (aceita datetime e 'AAAA-MM-DD'); None se não for data."""
+    if isinstance(valor, str):
+        valor = parse_date(valor)
+    if isinstance(valor, datetime):
+        valor = valor.date()
+    if not isinstance(valor, date):
+        return None
+    return valor.replace(day=1)
+
+
+def _proximo_mes(mes):
+    return mes.replace(year=mes.year + 1, month=1) if mes.month == 12 else mes.replace(month=mes.month + 1)
+
+
+def _celulas(qs):
+    """GROUP BY das dimensões sobre um queryset de convênios (dicts prontos para o model)."""
+    return (
+        qs.order_by()
+        .annotate(_mes=TruncMonth("vigencia_inicio"))
+        .values("_mes", "tipo", "status", "orgao_concedente", "repasse_recebido")
+        .annotate(
+            qtd=Count("id"),
+            total_repasse=Sum("valor_repasse"),
+            total_contrapartida=Sum("valor_contrapartida"),
+        )
+    )
+
+
+def _gravar(celulas):
+    total = 0
+    lote = []
+    for c in celulas:
+        lote.append(CuboConvenios(mes=mes_de(c.pop("_mes")), **c))
+        if len(lote) >= LOTE:
+            total += _upsert(lote)
+            lote = []
+    if lote:
+        total += _upsert(lote)
+    return total
+
+
+def _upsert(lote):
+    # upsert: dois commits recalculando o mesmo mês não colidem na constraint única
+    CuboConvenios.objects.bulk_create(
+        lote,
+        update_conflicts=True,
+        unique_fields=list(DIMENSOES),
+        update_fields=["qtd", "total_repasse", "total_contrapartida"],
+    )
+    return len(lote)
+
+
+def atualizar_meses(meses) -> int:
+    """Recalcula as células dos meses informados (datas quaisquer do mês). Retorna as células gravadas."""
+    meses = {m for m in (mes_de(m) for m in meses) if m is not None}
+    if not meses:
+        return 0
+
+    faixas = Q()
+    for mes in meses:
+        faixas |= Q(vigencia_inicio__gte=mes, vigencia_inicio__lt=_proximo_mes(mes))
+
+    # sem savepoint: normalmente roda dentro da transação de quem alterou os convênios
+    with transaction.atomic(savepoint=False):
+        CuboConvenios.objects.filter(mes__in=meses).delete()
+        return _gravar(_celulas(Convenio.objects.filter(faixas)).iterator(chunk_size=LOTE))
+
+
+def reconstruir() -> int:
+    """Apaga e recalcula o cubo inteiro (1 GROUP BY sobre os convênios). Retorna as células gravadas."""
+    with transaction.atomic():
+        CuboConvenios.objects.all().delete()
+        return _gravar(_celulas(Convenio.objects.all()).iterator(chunk_size=LOTE))
+
+
+def filtrar(params):
+    """
+    Queryset do cubo equivalente a convenios.filtros.aplicar_filtros(params), ou None quando
+    algum filtro não cabe nas dimensões (vigencia_fim, status relativos, textos fora do cubo,
+    data inicial que não cai no dia 1) ou com RELATORIOS_CUBO desligado.
+    Os lookups são os mesmos de aplicar_filtros, aplicados às colunas do cubo.
+    """
+    if not settings.RELATORIOS_CUBO:
+        return None
+
+    for campo in FILTROS_FORA_DO_CUBO:
+        valor = (params.get(campo) or "").strip()
+        # data inválida é ignorada por aplicar_filtros: aqui também
+        if valor and (campo != "data_fim" or parse_date(valor)):
+            return None
+
+    qs = CuboConvenios.objects.all()
+
+    data_ini = parse_date((params.get("data_ini") or "").strip())
+    if data_ini:
+        if data_ini.day != 1:
+            return None
+        qs = qs.filter(mes__gte=data_ini)
+
+    status = (params.get("status") or "").strip()
+    if status:
+        st = status.upper()
+        if st in STATUS_RELATIVOS:
+            return None
+        if st in Convenio.Status.values:
+            qs = qs.filter(status=st)
+        else:
+            qs = qs.filter(status__iexact=status)
+
+    orgao = (params.get("orgao") or "").strip()
+    if orgao:
+        qs = qs.filter(orgao_concedente__busca=orgao)
+
+    tipo = (params.get("tipo") or "").strip()
+    if tipo:
+        if tipo.upper() in Convenio.Tipo.values:
+            qs = qs.filter(tipo=tipo.upper())
+        else:
+            qs = qs.filter(tipo__icontains=tipo)
+
+    repasse_recebido = (params.get("repasse_recebido") or "").strip()
+    if repasse_recebido == "1":
+        qs = qs.filter(repasse_recebido=True)
+    elif repasse_recebido == "0":
+        qs = qs.filter(repasse_recebido=False)
+
+    return qs
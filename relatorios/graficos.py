@@ -0,0 +1,200 @@
+"""
+Gráficos do PDF de relatórios.
+
+Usa a API orientada a objetos do matplotlib (Figure), sem pyplot: não há estado
+global, então dá para desenhar em threads e em processos separados. Os gráficos
+de um relatório são renderizados em paralelo num ProcessPoolExecutor e o
+resultado fica memorizado por (tipo, labels, values, title, saída).
+O matplotlib só é importado no primeiro desenho (ver relatorios/aquecimento.py).
+
+Saídas (RELATORIOS_GRAFICOS_SAIDA):
+  - "svg": data URI SVG (vetorial, bem menor que PNG em base64) - padrão
+  - "png": data URI PNG em base64 (comportamento antigo)
+  - "arquivo": grava o SVG em RELATORIOS_GRAFICOS_DIR e devolve uma URI file://
+    (LRU por mtime acima de RELATORIOS_GRAFICOS_MAX_MB, como o cache de PDFs)
+"""
+import base64
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import quote, unquote, urlparse
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MEMO_MAX = 128
+
+_memo = OrderedDict()
+_memo_lock = threading.Lock()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# =========================
+# Desenho (roda no processo do pool)
+# =========================
+
+def _bar(ax, labels, values, title):
+    ax.bar(labels, values)
+    ax.set_title(title)
+    ax.set_ylabel("Qtd")
+    ax.tick_params(axis="x", rotation=15)
+
+
+def _pie(ax, labels, values, title):
+    if sum(values) == 0:
+        ax.text(0.5, 0.5, "Sem dados", ha="center", va="center")
+    else:
+        ax.pie(values, labels=labels, autopct="%1.0f%%", startangle=90)
+    ax.set_title(title)
+
+
+def _line(ax, labels, values, title):
+    ax.plot(labels, values, marker="o")
+    ax.set_title(title)
+    ax.set_ylabel("R$")
+    ax.tick_params(axis="x", rotation=25)
+
+
+_DESENHOS = {
+    "bar": (_bar, (8, 3.2)),
+    "pie": (_pie, (7, 3.2)),
+    "line": (_line, (8, 3.2)),
+}
+
+
+def renderizar(tipo, labels, values, title, formato="svg") -> bytes:
+    # import tardio: o matplotlib só carrega no primeiro gráfico (no pool ou aqui)
+    from matplotlib.figure import Figure
+
+    desenhar, figsize = _DESENHOS[tipo]
+    fig = Figure(figsize=figsize)
+    ax = fig.add_subplot(111)
+    desenhar(ax, list(labels), list(values), title)
+    fig.tight_layout()
+
+    buf = BytesIO()
+    fig.savefig(buf, format=formato, dpi=160)
+    return buf.getvalue()
+
+
+# =========================
+# Saída (src para <img>)
+# =========================
+
+def _src(conteudo: bytes, saida: str) -> str:
+    if saida == "png":
+        return "data:image/png;base64," + base64.b64encode(conteudo).decode("ascii")
+    if saida == "arquivo":
+        diretorio = Path(settings.RELATORIOS_GRAFICOS_DIR)
+        diretorio.mkdir(parents=True, exist_ok=True)
+        caminho = diretorio / f"{hashlib.sha256(conteudo).hexdigest()}.svg"
+        if caminho.exists():
+            os.utime(caminho)
+        else:
+            caminho.write_bytes(conteudo)
+            # import tardio: pdf_cache importa os models e este módulo também roda nos workers do pool
+            from relatorios import pdf_cache
+            pdf_cache.remover_excedente(diretorio, ".svg", settings.RELATORIOS_GRAFICOS_MAX_MB)
+        return caminho.resolve().as_uri()
+    return "data:image/svg+xml;charset=utf-8," + quote(conteudo.decode("utf-8"))
+
+
+def _memo_get(chave):
+    with _memo_lock:
+        src = _memo.get(chave)
+        if src is not None:
+            _memo.move_to_end(chave)
+    if src is not None and src.startswith("file://"):
+        # o SVG pode ter saído pelo LRU do diretório: marca o uso ou renderiza de novo
+        try:
+            os.utime(Path(unquote(urlparse(src).path)))
+        except FileNotFoundError:
+            return None
+    return src
+
+
+def _memo_set(chave, src):
+    with _memo_lock:
+        _memo[chave] = src
+        _memo.move_to_end(chave)
+        while len(_memo) > MEMO_MAX:
+            _memo.popitem(last=False)
+
+
+def limpar_memo():
+    with _memo_lock:
+        _memo.clear()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.RELATORIOS_GRAFICOS_PROCESSOS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def _descartar_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def aquecer_pool():
+    """Um desenho descartável onde os gráficos são feitos: sobe um processo do pool com o matplotlib carregado."""
+    pedido = ("bar", ["a"], [1], "aquecimento")
+    if settings.RELATORIOS_GRAFICOS_PROCESSOS <= 0:
+        renderizar(*pedido)
+        return
+    try:
+        _get_pool().submit(renderizar, *pedido).result()
+    except Exception:
+        _descartar_pool()
+        raise
+
+
+def _renderizar_todos(pendentes, formato):
+    if settings.RELATORIOS_GRAFICOS_PROCESSOS > 0 and len(pendentes) > 1:
+        try:
+            futures = [_get_pool().submit(renderizar, *p, formato=formato) for p in pendentes]
+            return [f.result() for f in futures]
+        except Exception:
+            # pool quebrado (processo morto, ambiente sem multiprocessing...): desenha aqui mesmo
+            logger.exception("Falha no pool de gráficos; renderizando no processo atual")
+            _descartar_pool()
+    return [renderizar(*p, formato=formato) for p in pendentes]
+
+
+def graficos_src(pedidos, saida=None):
+    """
+    pedidos: [(tipo, labels, values, title), ...] com tipo em "bar"/"pie"/"line".
+    Retorna a lista de src (<img src=...>) na mesma ordem.
+    """
+    saida = saida or settings.RELATORIOS_GRAFICOS_SAIDA
+    formato = "png" if saida == "png" else "svg"
+
+    chaves = [(tipo, tuple(labels), tuple(values), title, saida) for tipo, labels, values, title in pedidos]
+    resultado = [_memo_get(chave) for chave in chaves]
+
+    faltando = [i for i, src in enumerate(resultado) if src is None]
+    if faltando:
+        conteudos = _renderizar_todos([chaves[i][:4] for i in faltando], formato)
+        for i, conteudo in zip(faltando, conteudos):
+            resultado[i] = _src(conteudo, saida)
+            _memo_set(chaves[i], resultado[i])
+
+    return resultado
@@ -0,0 +1,171 @@
+"""
+Fila de geração de PDFs sem Redis/Celery.
+
+O estado fica no model ReportJob. O processamento é feito por:
+  - um ThreadPoolExecutor no próprio processo web (RELATORIOS_EXECUTOR="thread"), ou
+  - `manage.py processar_relatorios`, que consome a fila do banco (RELATORIOS_EXECUTOR="db").
+
+No modo thread não há worker dedicado para devolver jobs travados e apagar os expirados:
+cada processo web faz essa manutenção (manter_fila()) ao enfileirar e ao consultar o status
+de um job, no máximo uma vez por MANUTENCAO_SEGUNDOS, reenviando ao executor os pendentes
+que perderam a thread num reinício.
+
+A reserva de um job é um UPDATE condicional (status PENDENTE -> PROCESSANDO), então
+vários workers/processos podem disputar a mesma fila sem processar o mesmo job duas vezes.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from .models import ReportJob
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# modo thread: intervalo mínimo entre manutenções da fila em cada processo
+MANUTENCAO_SEGUNDOS = 60
+_ultima_manutencao = None
+_manutencao_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RELATORIOS_MAX_WORKERS, thread_name_prefix="relatorios"
+            )
+        return _executor
+
+
+def enfileirar(filtros, base_url="", user=None) -> ReportJob:
+    job = ReportJob.objects.create(
+        filtros=filtros,
+        base_url=base_url,
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+    if settings.RELATORIOS_EXECUTOR == "thread":
+        # só depois do commit: a thread precisa enxergar o job no banco
+        transaction.on_commit(lambda: _get_executor().submit(_processar_em_thread, job.pk))
+        manter_fila()
+    return job
+
+
+def manter_fila():
+    """Modo thread: agenda manutencao() no executor, no máximo 1x por MANUTENCAO_SEGUNDOS por processo."""
+    global _ultima_manutencao
+    if settings.RELATORIOS_EXECUTOR != "thread":
+        return
+    agora = time.monotonic()
+    with _manutencao_lock:
+        if _ultima_manutencao is not None and agora - _ultima_manutencao < MANUTENCAO_SEGUNDOS:
+            return
+        _ultima_manutencao = agora
+    _get_executor().submit(_manutencao_em_thread)
+
+
+def manutencao() -> int:
+    """
+    Devolve os travados à fila, apaga os expirados e envia ao executor os pendentes
+    (reservar() impede que um job já enviado seja processado duas vezes). Retorna os enviados.
+    """
+    recuperar_travados()
+    limpar_expirados()
+    ids = list(
+        ReportJob.objects.filter(status=ReportJob.Status.PENDENTE)
+        .order_by("created_at", "pk")
+        .values_list("pk", flat=True)
+    )
+    for job_id in ids:
+        _get_executor().submit(_processar_em_thread, job_id)
+    return len(ids)
+
+
+def _manutencao_em_thread():
+    try:
+        manutencao()
+    except Exception:
+        logger.exception("Falha na manutenção da fila de relatórios")
+    finally:
+        close_old_connections()
+
+
+def _processar_em_thread(job_id):
+    try:
+        processar(job_id)
+    finally:
+        close_old_connections()
+
+
+def reservar(job_id) -> bool:
+    return bool(
+        ReportJob.objects.filter(pk=job_id, status=ReportJob.Status.PENDENTE).update(
+            status=ReportJob.Status.PROCESSANDO, iniciado_em=timezone.now()
+        )
+    )
+
+
+def processar(job_id) -> bool:
+    """Gera o PDF do job (se ainda estiver pendente). Retorna False se outro worker já o pegou."""
+    from .views import gerar_relatorio_pdf
+
+    if not reservar(job_id):
+        return False
+
+    job = ReportJob.objects.get(pk=job_id)
+    try:
+        pdf = gerar_relatorio_pdf(job.filtros, base_url=job.base_url or None)
+    except Exception as e:
+        logger.exception("Falha ao gerar relatório #%s", job_id)
+        job.status = ReportJob.Status.ERRO
+        job.erro = str(e)
+        job.concluido_em = timezone.now()
+        job.save(update_fields=["status", "erro", "concluido_em"])
+        return True
+
+    agora = timezone.now()
+    job.arquivo.save(f"relatorio_convenios_{job.pk}.pdf", ContentFile(pdf), save=False)
+    job.status = ReportJob.Status.CONCLUIDO
+    job.concluido_em = agora
+    job.expira_em = agora + timedelta(hours=settings.RELATORIOS_JOB_TTL_HORAS)
+    job.save(update_fields=["arquivo", "status", "concluido_em", "expira_em"])
+    return True
+
+
+def processar_pendentes(limite=None) -> int:
+    """Processa jobs pendentes em ordem de chegada (usado pelo worker do banco)."""
+    recuperar_travados()
+    processados = 0
+    ids = ReportJob.objects.filter(status=ReportJob.Status.PENDENTE).order_by("created_at", "pk")
+    for job_id in ids.values_list("pk", flat=True)[:limite]:
+        if processar(job_id):
+            processados += 1
+    return processados
+
+
+def recuperar_travados() -> int:
+    """Devolve para a fila jobs em PROCESSANDO há mais que RELATORIOS_JOB_TIMEOUT_MINUTOS."""
+    limite = timezone.now() - timedelta(minutes=settings.RELATORIOS_JOB_TIMEOUT_MINUTOS)
+    return ReportJob.objects.filter(status=ReportJob.Status.PROCESSANDO, iniciado_em__lt=limite).update(
+        status=ReportJob.Status.PENDENTE, iniciado_em=None
+    )
+
+
+def limpar_expirados() -> int:
+    """Apaga jobs (e arquivos) cuja validade passou."""
+    apagados = 0
+    for job in ReportJob.objects.filter(expira_em__lt=timezone.now()).iterator():
+        if job.arquivo:
+            job.arquivo.delete(save=False)
+        job.delete()
+        apagados += 1
+    return apagados
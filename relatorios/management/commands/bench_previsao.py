@@ -0,0 +1,85 @@
+import json
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from relatorios import previsao
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark da previsão de execução financeira (relatorios/previsao.py): a previsão "
+        "completa sobre o banco atual (use seed_perf_data para ter 100k convênios) e o cálculo "
+        "vetorizado sozinho sobre uma carteira sintética de --sintetico convênios."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticoes", type=int, default=3, help="Execuções por medição (padrão: 3)")
+        parser.add_argument(
+            "--sintetico", type=int, default=100_000, help="Convênios da carteira sintética (0 = não mede)"
+        )
+        parser.add_argument("--meses", type=int, default=24, help="Meses com pagamento por convênio sintético")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        resultado = {"banco": self._medir_banco(options["repeticoes"])}
+        if options["sintetico"]:
+            resultado["sintetico"] = self._medir_sintetico(
+                options["sintetico"], options["meses"], options["seed"], options["repeticoes"]
+            )
+        self.stdout.write(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+    def _medir_banco(self, repeticoes):
+        medicoes = []
+        for _ in range(repeticoes):
+            with CaptureQueriesContext(connection) as ctx:
+                inicio = time.perf_counter()
+                p = previsao.prever()
+                linhas = list(p.linhas(limite=100))
+                total = (time.perf_counter() - inicio) * 1000
+            medicoes.append({**p.tempos, "total_ms": total, "queries": len(ctx.captured_queries)})
+
+        return {
+            "convenios_ativos": len(p),
+            "meses_com_pagamento": p.meses_com_pagamento,
+            "linhas": len(linhas),
+            "queries": medicoes[-1]["queries"],
+            **{
+                chave: round(statistics.median(m[chave] for m in medicoes), 1)
+                for chave in ("consulta_ms", "calculo_ms", "total_ms")
+            },
+            "resumo": p.resumo(),
+        }
+
+    def _medir_sintetico(self, n, meses, seed, repeticoes):
+        rnd = np.random.default_rng(seed)
+        hoje = timezone.localdate()
+        hoje_mes = hoje.year * 12 + hoje.month - 1
+
+        conv = np.zeros(n, dtype=[("id", "i8"), ("inicio", "i4"), ("fim", "i4"), ("valor", "f8")])
+        conv["id"] = np.arange(1, n + 1)
+        conv["inicio"] = hoje_mes - rnd.integers(1, 48, n)
+        conv["fim"] = hoje.toordinal() + rnd.integers(1, 900, n)
+        conv["valor"] = rnd.uniform(50_000, 5_000_000, n).round(2)
+
+        # `meses` meses com pagamento por convênio, nos últimos 48 meses
+        idx = np.repeat(np.arange(n), meses)
+        mes = hoje_mes - rnd.integers(0, 48, n * meses).astype("i4")
+        valor = conv["valor"][idx] / (meses * rnd.uniform(0.8, 2.5, n * meses))
+        serie = (idx, mes, valor)
+
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            previsao.calcular(conv, serie, hoje, 6)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        return {
+            "convenios": n,
+            "meses_com_pagamento": n * meses,
+            "calculo_ms": round(statistics.median(tempos), 1),
+        }
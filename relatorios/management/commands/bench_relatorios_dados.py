@@ -0,0 +1,94 @@
+import json
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from convenios.models import Convenio
+from core.benchmark import percentil
+from relatorios import cubo
+from relatorios.views import relatorios_dados
+
+CENARIOS = {
+    "sem_filtro": {},
+    "tipo": {"tipo": "FEDERAL"},
+    "orgao_status": {"orgao": "Ministério", "status": "Vencendo"},
+    "periodo_repasse": {"data_ini": "2024-01-01", "data_fim": "2026-12-31", "repasse_recebido": "0"},
+    "dimensoes_do_cubo": {"tipo": "FEDERAL", "status": "EXECUCAO", "orgao": "Saúde", "data_ini": "2024-01-01"},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de /relatorios/dados/: popula convênios sintéticos numa transação "
+        "(desfeita no fim), mede quantidade de queries e latência p50/p95 por cenário de filtro, "
+        "com e sem o cubo mensal (RELATORIOS_CUBO)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--convenios", type=int, default=10000, help="Convênios sintéticos (padrão: 10000)")
+        parser.add_argument("--repeticoes", type=int, default=30, help="Requisições por cenário (padrão: 30)")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._popular(options["convenios"], options["seed"])
+            resultado = {"convenios": options["convenios"], "cenarios": {}}
+            for nome, params in CENARIOS.items():
+                medicoes = {}
+                for variante, ligado in (("cubo", True), ("convenios", False)):
+                    with override_settings(RELATORIOS_CUBO=ligado):
+                        medicoes[variante] = self._medir(params, options["repeticoes"])
+                # o cubo só responde quando os filtros cabem nas dimensões dele
+                medicoes["usa_cubo"] = cubo.filtrar(params) is not None
+                resultado["cenarios"][nome] = medicoes
+            transaction.set_rollback(True)
+
+        self.stdout.write(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+    def _popular(self, n, seed):
+        rnd = random.Random(seed)
+        orgaos = ["Ministério da Saúde", "Ministério da Educação", "Secretaria de Obras", "Secretaria de Saúde"]
+        hoje = date.today()
+        lote = []
+        for i in range(n):
+            inicio = hoje - timedelta(days=rnd.randint(0, 900))
+            lote.append(Convenio(
+                tipo=rnd.choice(Convenio.Tipo.values),
+                status=rnd.choice(Convenio.Status.values),
+                numero_convenio=f"BENCH-{i}",
+                orgao_concedente=rnd.choice(orgaos),
+                parlamentar_nome=f"Parlamentar {rnd.randint(1, 50)}",
+                objeto="Objeto sintético",
+                valor_repasse=Decimal(rnd.randint(10_000, 5_000_000)),
+                valor_contrapartida=Decimal(rnd.randint(0, 500_000)),
+                vigencia_inicio=inicio,
+                vigencia_fim=inicio + timedelta(days=rnd.randint(90, 1200)),
+                repasse_recebido=rnd.random() < 0.5,
+            ))
+        Convenio.objects.bulk_create(lote, batch_size=2000)
+        cubo.reconstruir()  # bulk_create não dispara os signals do cubo
+
+    def _medir(self, params, repeticoes):
+        factory = RequestFactory()
+        tempos = []
+        queries = 0
+        for _ in range(repeticoes):
+            request = factory.get("/relatorios/dados/", params)
+            with CaptureQueriesContext(connection) as ctx:
+                t0 = time.perf_counter()
+                relatorios_dados(request)
+                tempos.append((time.perf_counter() - t0) * 1000)
+            queries = len(ctx.captured_queries)
+
+        return {
+            "queries": queries,
+            "p50_ms": round(statistics.median(tempos), 2),
+            "p95_ms": round(percentil(tempos, 95), 2),
+        }
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from relatorios import pdf_cache
+
+
+class Command(BaseCommand):
+    help = "Apaga os PDFs de relatório em cache (RELATORIOS_PDF_CACHE_DIR) e os SVGs de RELATORIOS_GRAFICOS_DIR."
+
+    def handle(self, *args, **options):
+        apagados = pdf_cache.limpar()
+        self.stdout.write(self.style.SUCCESS(f"{apagados} arquivo(s) removido(s) do cache."))
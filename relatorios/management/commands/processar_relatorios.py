@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from relatorios import jobs
+
+
+class Command(BaseCommand):
+    help = "Worker da fila de relatórios PDF (ReportJob): processa pendentes e apaga arquivos expirados."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Processa o que estiver pendente e sai")
+        parser.add_argument("--intervalo", type=float, default=5, help="Segundos entre verificações (padrão: 5)")
+
+    def handle(self, *args, **options):
+        while True:
+            processados = jobs.processar_pendentes()
+            expirados = jobs.limpar_expirados()
+            if processados or expirados:
+                self.stdout.write(f"{processados} relatório(s) gerado(s), {expirados} expirado(s) apagado(s).")
+            if options["once"]:
+                break
+            time.sleep(options["intervalo"])
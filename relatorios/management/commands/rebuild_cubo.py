@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from relatorios import cubo
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói o cubo mensal dos relatórios (CuboConvenios) a partir dos convênios. "
+        "Use após cargas que não disparam signals (SQL direto, loaddata) ou para conferir o incremental."
+    )
+
+    def handle(self, *args, **options):
+        total = cubo.reconstruir()
+        self.stdout.write(self.style.SUCCESS(f"{total} célula(s) no cubo."))
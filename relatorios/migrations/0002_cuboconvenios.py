@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:54
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def popular_cubo(apps, schema_editor):
+    # mesmo GROUP BY de relatorios.cubo.reconstruir(), com os models históricos
+    Convenio = apps.get_model("convenios", "Convenio")
+    CuboConvenios = apps.get_model("relatorios", "CuboConvenios")
+    celulas = (
+        Convenio.objects.order_by()
+        .annotate(_mes=TruncMonth("vigencia_inicio"))
+        .values("_mes", "tipo", "status", "orgao_concedente", "repasse_recebido")
+        .annotate(qtd=Count("id"), total_repasse=Sum("valor_repasse"), total_contrapartida=Sum("valor_contrapartida"))
+    )
+    CuboConvenios.objects.bulk_create(
+        (CuboConvenios(mes=c.pop("_mes"), **c) for c in celulas.iterator(chunk_size=2000)),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('convenios', '0007_exclusaojob'),
+        ('relatorios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CuboConvenios',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mes', models.DateField()),
+                ('tipo', models.CharField(max_length=20)),
+                ('status', models.CharField(max_length=20)),
+                ('orgao_concedente', models.CharField(max_length=200)),
+                ('repasse_recebido', models.BooleanField()),
+                ('qtd', models.PositiveIntegerField(default=0)),
+                ('total_repasse', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+                ('total_contrapartida', models.DecimalField(decimal_places=2, default=0, max_digits=18)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('mes', 'tipo', 'status', 'orgao_concedente', 'repasse_recebido'), name='cubo_convenios_celula_uniq')],
+            },
+        ),
+        migrations.RunPython(popular_cubo, migrations.RunPython.noop),
+    ]
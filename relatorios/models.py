@@ -1,3 +1,65 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class ReportJob(models.Model):
+    """
+    Geração de PDF em segundo plano (ver relatorios/jobs.py).
+    Guarda os filtros do relatório, o estado do processamento e o arquivo gerado.
+    """
+
+    class Status(models.TextChoices):
+        PENDENTE = "PENDENTE", "Pendente"
+        PROCESSANDO = "PROCESSANDO", "Processando"
+        CONCLUIDO = "CONCLUIDO", "Concluído"
+        ERRO = "ERRO", "Erro"
+
+    filtros = models.JSONField(default=dict, blank=True)
+    base_url = models.CharField(max_length=255, blank=True, default="")
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDENTE)
+
+    arquivo = models.FileField(upload_to="relatorios/", blank=True, null=True)
+    erro = models.TextField(blank=True, null=True)
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(blank=True, null=True)
+    concluido_em = models.DateTimeField(blank=True, null=True)
+    expira_em = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Relatório #{self.pk} ({self.get_status_display()})"
+
+
+class CuboConvenios(models.Model):
+    """
+    Cubo mensal dos convênios: 1 linha por (mês de vigencia_inicio, tipo, status, órgão,
+    repasse recebido) com quantidade e somas de repasse/contrapartida.
+    Mantido por mês pelos signals de Convenio (relatorios/signals.py) e reconstruído por
+    `manage.py rebuild_cubo`; consultado pelos relatórios via relatorios/cubo.py.
+    """
+
+    mes = models.DateField()  # 1º dia do mês
+    tipo = models.CharField(max_length=20)
+    status = models.CharField(max_length=20)
+    orgao_concedente = models.CharField(max_length=200)
+    repasse_recebido = models.BooleanField()
+
+    qtd = models.PositiveIntegerField(default=0)
+    total_repasse = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    total_contrapartida = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # também serve de índice para as faixas de mês (coluna líder)
+            models.UniqueConstraint(
+                fields=["mes", "tipo", "status", "orgao_concedente", "repasse_recebido"],
+                name="cubo_convenios_celula_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.mes:%Y-%m} {self.tipo}/{self.status} - {self.orgao_concedente}"
@@ -0,0 +1,102 @@
+"""
+Cache em disco dos PDFs do relatório.
+
+Chave = filtros normalizados + versão dos dados (max(updated_at) e quantidade de
+convênios). Qualquer alteração em Convenio gera chaves novas; os arquivos antigos
+saem pela política LRU (mtime atualizado a cada acesso) quando o diretório passa
+de RELATORIOS_PDF_CACHE_MAX_MB. Os SVGs de RELATORIOS_GRAFICOS_DIR (saída "arquivo"
+de relatorios/graficos.py) seguem a mesma política, com RELATORIOS_GRAFICOS_MAX_MB.
+`manage.py limpar_cache_pdf` apaga tudo.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from convenios.models import Convenio
+
+# filtros de status relativos a "hoje": o resultado muda na virada do dia
+STATUS_RELATIVOS = {"OK", "VENCENDO", "VENCIDOS"}
+
+
+def _diretorio() -> Path:
+    diretorio = Path(settings.RELATORIOS_PDF_CACHE_DIR)
+    diretorio.mkdir(parents=True, exist_ok=True)
+    return diretorio
+
+
+def versao_dados() -> str:
+    v = Convenio.objects.aggregate(ultima=Max("updated_at"), qtd=Count("id"))
+    ultima = v["ultima"].isoformat() if v["ultima"] else "-"
+    return f"{ultima}:{v['qtd']}"
+
+
+def chave(filtros: dict) -> str:
+    dados = {"filtros": filtros, "versao": versao_dados()}
+    if (filtros.get("status") or "").upper() in STATUS_RELATIVOS:
+        dados["hoje"] = timezone.localdate().isoformat()
+    return hashlib.sha256(json.dumps(dados, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def obter(chave: str):
+    """Caminho do PDF em cache (ou None). Marca o arquivo como usado agora (LRU)."""
+    caminho = _diretorio() / f"{chave}.pdf"
+    try:
+        os.utime(caminho)
+    except FileNotFoundError:
+        return None
+    return caminho
+
+
+def guardar(chave: str, pdf: bytes) -> Path:
+    diretorio = _diretorio()
+    caminho = diretorio / f"{chave}.pdf"
+    # escreve em arquivo temporário e renomeia: leitores nunca veem PDF pela metade
+    fd, tmp = tempfile.mkstemp(dir=diretorio, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf)
+    os.replace(tmp, caminho)
+    remover_excedente(diretorio, ".pdf", settings.RELATORIOS_PDF_CACHE_MAX_MB)
+    return caminho
+
+
+def remover_excedente(diretorio, sufixo: str, limite_mb: int):
+    """Apaga os arquivos `*sufixo` menos usados (mtime) até o diretório caber em limite_mb."""
+    limite = limite_mb * 1024 * 1024
+    arquivos = []
+    total = 0
+    for entry in os.scandir(diretorio):
+        if entry.is_file() and entry.name.endswith(sufixo):
+            st = entry.stat()
+            arquivos.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+
+    # menos usados recentemente primeiro
+    for _, tamanho, caminho in sorted(arquivos):
+        if total <= limite:
+            break
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
+        total -= tamanho
+
+
+def limpar() -> int:
+    apagados = 0
+    for entry in os.scandir(_diretorio()):
+        if entry.is_file() and entry.name.endswith((".pdf", ".tmp")):
+            os.remove(entry.path)
+            apagados += 1
+    graficos_dir = Path(settings.RELATORIOS_GRAFICOS_DIR)
+    if graficos_dir.is_dir():
+        for entry in os.scandir(graficos_dir):
+            if entry.is_file() and entry.name.endswith(".svg"):
+                os.remove(entry.path)
+                apagados += 1
+    return apagados
@@ -0,0 +1,226 @@
+"""
+Previsão de execução financeira dos convênios ativos, calculada em lote com NumPy.
+
+Para cada convênio ativo (iniciado, vigente, fora de CONCLUIDO/CANCELADO):
+  - ritmo de gasto (R$/mês): média dos pagamentos nos últimos `janela` meses completos
+    (ou desde o início da vigência, se mais recente), com o desvio padrão mensal;
+  - data prevista de esgotamento do saldo nesse ritmo (None se não há gasto recente);
+  - sobra prevista em vigencia_fim e o risco de sobra: P(gasto até o fim < saldo),
+    com o gasto restante ~ Normal(ritmo * meses, desvio * sqrt(meses)).
+
+Os dados vêm em 2 queries (convênios e série mensal de pagamentos agregada no banco,
+já em inteiros/floats) direto para arrays; o cálculo é vetorizado, sem loop por convênio.
+Nome/órgão são buscados só para as linhas exibidas (3ª query).
+"""
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import F, FloatField, Q, Sum
+from django.db.models.functions import Cast, ExtractMonth, ExtractYear
+from django.utils import timezone
+
+from convenios.filtros import aplicar_filtros
+from convenios.models import Convenio
+from financeiro.models import Pagamento
+
+DIAS_POR_MES = 365.25 / 12
+
+# (risco de sobra >= limite) -> código, avaliadas em ordem
+FAIXAS_RISCO = (
+    (0.7, "ALTO"),
+    (0.3, "MEDIO"),
+)
+RISCO_BAIXO = "BAIXO"
+RISCOS = (*(codigo for _, codigo in FAIXAS_RISCO), RISCO_BAIXO)
+
+STATUS_ENCERRADOS = (Convenio.Status.CONCLUIDO, Convenio.Status.CANCELADO)
+
+
+def _indice_mes(d):
+    return d.year * 12 + d.month - 1
+
+
+def convenios_ativos(hoje=None):
+    hoje = hoje or timezone.localdate()
+    return Convenio.objects.filter(
+        ~Q(status__in=STATUS_ENCERRADOS), vigencia_inicio__lte=hoje, vigencia_fim__gte=hoje
+    )
+
+
+def carregar(qs):
+    """
+    (convênios, série) como arrays:
+      convênios: id, mês de início (ano*12 + mês-1), ordinal de vigencia_fim, valor total;
+      série: índice do convênio, mês, soma paga no mês (1 linha por convênio x mês com pagamento).
+    """
+    linhas = qs.order_by("pk").values_list("pk", "vigencia_inicio", "vigencia_fim", "valor_repasse", "valor_contrapartida")
+    conv = np.fromiter(
+        (
+            (pk, _indice_mes(inicio), fim.toordinal(), float(repasse or 0) + float(contrapartida or 0))
+            for pk, inicio, fim, repasse, contrapartida in linhas.iterator(chunk_size=10000)
+        ),
+        dtype=[("id", "i8"), ("inicio", "i4"), ("fim", "i4"), ("valor", "f8")],
+    )
+
+    serie = (
+        Pagamento.objects.filter(contrato__convenio__in=qs.order_by().values("pk"))
+        .annotate(
+            _convenio=F("contrato__convenio_id"),
+            _mes=ExtractYear("data") * 12 + ExtractMonth("data") - 1,
+        )
+        .values("_convenio", "_mes")
+        .annotate(_valor=Cast(Sum("valor_pago"), FloatField()))
+        .order_by()
+        .values_list("_convenio", "_mes", "_valor")
+    )
+    pagamentos = np.fromiter(
+        serie.iterator(chunk_size=10000), dtype=[("convenio", "i8"), ("mes", "i4"), ("valor", "f8")]
+    )
+    # ids ordenados: posição do convênio por busca binária; descarta convênio que
+    # entrou no filtro entre as duas queries
+    idx = np.searchsorted(conv["id"], pagamentos["convenio"])
+    validos = idx < len(conv)
+    validos[validos] = conv["id"][idx[validos]] == pagamentos["convenio"][validos]
+    return conv, (idx[validos], pagamentos["mes"][validos], pagamentos["valor"][validos])
+
+
+def _normal_cdf(z):
+    # Abramowitz & Stegun 7.1.26 (erro < 1.5e-7): erf vetorizado, sem SciPy
+    x = np.abs(z) / np.sqrt(2)
+    t = 1 / (1 + 0.3275911 * x)
+    poli = ((((1.061405429 * t - 1.453152027) * t + 1.421413741) * t - 0.284496736) * t + 0.254829592) * t
+    return 0.5 * (1 + np.sign(z) * (1 - poli * np.exp(-x * x)))
+
+
+def calcular(conv, serie, hoje, janela):
+    """Métricas por convênio (arrays alinhados com `conv`)."""
+    n = len(conv)
+    idx, mes, valor = serie
+    hoje_mes, hoje_ord = _indice_mes(hoje), hoje.toordinal()
+
+    pago = np.bincount(idx, weights=valor, minlength=n)
+
+    # meses completos mais recentes (o mês corrente ainda está em andamento)
+    atraso = hoje_mes - mes
+    na_janela = (atraso >= 1) & (atraso <= janela)
+    soma = np.bincount(idx[na_janela], weights=valor[na_janela], minlength=n)
+    soma_quadrados = np.bincount(idx[na_janela], weights=valor[na_janela] ** 2, minlength=n)
+    meses = np.clip(np.minimum(janela, hoje_mes - conv["inicio"]), 1, None)
+
+    ritmo = soma / meses
+    desvio = np.sqrt(np.maximum(soma_quadrados / meses - ritmo ** 2, 0))
+
+    saldo = conv["valor"] - pago
+    meses_restantes = (conv["fim"] - hoje_ord) / DIAS_POR_MES
+    gasto_previsto = ritmo * meses_restantes
+    sobra = np.maximum(saldo - gasto_previsto, 0)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dias_ate_esgotar = np.where(ritmo > 0, np.maximum(saldo, 0) / ritmo * DIAS_POR_MES, np.inf)
+        sigma = desvio * np.sqrt(meses_restantes)
+        z = (saldo - gasto_previsto) / sigma
+    # sem variação no gasto: sobra ou não sobra, sem meio termo
+    risco = np.where(sigma > 0, _normal_cdf(np.clip(np.nan_to_num(z), -40, 40)), (sobra > 0.005).astype(float))
+    risco = np.where(saldo > 0.005, risco, 0.0)
+
+    return {
+        "pago": pago,
+        "saldo": saldo,
+        "ritmo": ritmo,
+        "desvio": desvio,
+        "dias_ate_esgotar": dias_ate_esgotar,
+        "esgota_antes_do_fim": hoje_ord + dias_ate_esgotar <= conv["fim"],
+        "sobra": sobra,
+        "risco": risco,
+        "faixa": np.select(
+            [risco >= limite for limite, _ in FAIXAS_RISCO],
+            [codigo for _, codigo in FAIXAS_RISCO],
+            default=RISCO_BAIXO,
+        ),
+    }
+
+
+@dataclass
+class Previsao:
+    hoje: date
+    janela: int
+    conv: np.ndarray
+    metricas: dict
+    # linhas (convênio x mês) da série de pagamentos lidas do banco
+    meses_com_pagamento: int = 0
+    tempos: dict = field(default_factory=dict)
+
+    def __len__(self):
+        return len(self.conv)
+
+    def resumo(self):
+        m = self.metricas
+        return {
+            "convenios": len(self),
+            "por_risco": {codigo: int(np.count_nonzero(m["faixa"] == codigo)) for codigo in RISCOS},
+            "saldo": round(float(m["saldo"].sum()), 2),
+            "sobra_prevista": round(float(m["sobra"].sum()), 2),
+            "esgotam_antes_do_fim": int(np.count_nonzero(m["esgota_antes_do_fim"])),
+        }
+
+    def linhas(self, limite=100, risco=None):
+        """Convênios em ordem de risco (e sobra prevista) decrescente, com número e órgão."""
+        m = self.metricas
+        selecionados = np.flatnonzero(m["faixa"] == risco) if risco else np.arange(len(self))
+        ordem = selecionados[np.lexsort((-m["sobra"][selecionados], -m["risco"][selecionados]))][:limite]
+
+        ids = self.conv["id"][ordem].tolist()
+        convenios = Convenio.objects.only(
+            "id", "numero_convenio", "orgao_concedente", "vigencia_fim"
+        ).in_bulk(ids)
+        for i, pk in zip(ordem.tolist(), ids):
+            convenio = convenios.get(pk)
+            if convenio is None:  # apagado entre as queries
+                continue
+            dias = m["dias_ate_esgotar"][i]
+            yield {
+                "id": pk,
+                "numero_convenio": convenio.numero_convenio,
+                "orgao_concedente": convenio.orgao_concedente,
+                "vigencia_fim": convenio.vigencia_fim,
+                "valor_total": round(float(self.conv["valor"][i]), 2),
+                "pago": round(float(m["pago"][i]), 2),
+                "saldo": round(float(m["saldo"][i]), 2),
+                "ritmo_mensal": round(float(m["ritmo"][i]), 2),
+                "esgotamento_previsto": (
+                    self.hoje + timedelta(days=int(dias)) if np.isfinite(dias) else None
+                ),
+                "esgota_antes_do_fim": bool(m["esgota_antes_do_fim"][i]),
+                "sobra_prevista": round(float(m["sobra"][i]), 2),
+                "risco_sobra": round(float(m["risco"][i]), 4),
+                "faixa_risco": str(m["faixa"][i]),
+            }
+
+
+def prever(params=None, hoje=None, janela=None) -> Previsao:
+    """Previsão dos convênios ativos (opcionalmente com os filtros de convenios.filtros)."""
+    hoje = hoje or timezone.localdate()
+    janela = janela or settings.RELATORIOS_PREVISAO_JANELA_MESES
+    qs = convenios_ativos(hoje)
+    if params:
+        qs = aplicar_filtros(params, qs)
+
+    inicio = time.perf_counter()
+    conv, serie = carregar(qs)
+    consulta = time.perf_counter()
+    metricas = calcular(conv, serie, hoje, janela)
+    fim = time.perf_counter()
+    return Previsao(
+        hoje=hoje,
+        janela=janela,
+        conv=conv,
+        metricas=metricas,
+        meses_com_pagamento=len(serie[0]),
+        tempos={
+            "consulta_ms": round((consulta - inicio) * 1000, 1),
+            "calculo_ms": round((fim - consulta) * 1000, 1),
+        },
+    )
@@ -0,0 +1,80 @@
+"""
+Mantém o CuboConvenios atualizado a partir das alterações em Convenio.
+
+Como em convenios/signals.py, os meses afetados são acumulados na transação e
+recalculados uma única vez no commit. Um save que muda vigencia_inicio afeta dois
+meses: o antigo é lido no pre_save (1 query por pk) e agendado junto com o novo.
+"""
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from convenios.models import Convenio
+
+from . import cubo
+
+_pendentes = threading.local()
+
+# campos de Convenio que entram no cubo (dimensões e medidas)
+CAMPOS_CUBO = {
+    "vigencia_inicio",
+    "tipo",
+    "status",
+    "orgao_concedente",
+    "repasse_recebido",
+    "valor_repasse",
+    "valor_contrapartida",
+}
+
+
+def _processar_pendentes():
+    meses = getattr(_pendentes, "meses", set())
+    _pendentes.meses, _pendentes.agendado = set(), False
+    cubo.atualizar_meses(meses)
+
+
+def agendar_meses(*meses):
+    if not hasattr(_pendentes, "meses"):
+        _pendentes.meses, _pendentes.agendado = set(), False
+    _pendentes.meses.update(m for m in map(cubo.mes_de, meses) if m is not None)
+
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _processar_pendentes()
+        return
+
+    # após rollback o callback some da fila: agenda de novo
+    agendado = _pendentes.agendado and any(
+        func is _processar_pendentes for _, func, _ in connection.run_on_commit
+    )
+    if not agendado:
+        _pendentes.agendado = True
+        transaction.on_commit(_processar_pendentes)
+
+
+def _afeta_cubo(update_fields):
+    return update_fields is None or bool(CAMPOS_CUBO & set(update_fields))
+
+
+@receiver(pre_save, sender=Convenio)
+def _guardar_mes_anterior(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._cubo_mes_anterior = None
+    if raw or instance.pk is None or not _afeta_cubo(update_fields):
+        return
+    instance._cubo_mes_anterior = (
+        Convenio.objects.filter(pk=instance.pk).values_list("vigencia_inicio", flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Convenio)
+def _convenio_salvo(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not _afeta_cubo(update_fields):
+        return
+    agendar_meses(instance.vigencia_inicio, getattr(instance, "_cubo_mes_anterior", None))
+
+
+@receiver(post_delete, sender=Convenio)
+def _convenio_apagado(sender, instance, **kwargs):
+    agendar_meses(instance.vigencia_inicio)
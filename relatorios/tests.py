@@ -1,3 +1,578 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
+from django.db import connection
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from contratos.models import Contrato, Empresa
+from convenios.filtros import aplicar_filtros
+from convenios.models import Convenio
+from financeiro.models import Pagamento
+
+from . import aquecimento, cubo, graficos, jobs, pdf_cache, views
+from .models import CuboConvenios, ReportJob
+
+
+def criar_convenio(**kwargs):
+    dados = dict(
+        tipo=Convenio.Tipo.FEDERAL,
+        orgao_concedente="Ministério da Saúde",
+        objeto="Objeto",
+        valor_repasse=Decimal("1000.50"),
+        valor_contrapartida=Decimal("100.00"),
+        vigencia_inicio=date(2025, 1, 1),
+        vigencia_fim=date(2026, 12, 31),
+    )
+    dados.update(kwargs)
+    return Convenio.objects.create(**dados)
+
+
+class RelatorioCsvTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        criar_convenio(numero_convenio="CV-1", repasse_recebido=True)
+        criar_convenio(numero_convenio="CV-2", orgao_concedente="Secretaria de Educação")
+        criar_convenio(numero_convenio="CV-3", orgao_concedente="Secretaria de Obras", tipo=Convenio.Tipo.ESTADUAL)
+
+    def _ler(self, **params):
+        response = views.relatorio_csv(RequestFactory().get("/relatorios/csv/", params))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        conteudo = b"".join(response.streaming_content).decode("utf-8").lstrip("﻿")
+        return list(csv.reader(conteudo.splitlines(), delimiter=";"))
+
+    def test_csv_completo(self):
+        linhas = self._ler()
+        self.assertEqual(linhas[0][0], "ID")
+        self.assertEqual(len(linhas), 4)
+        cv1 = next(r for r in linhas if r[1] == "CV-1")
+        self.assertEqual(cv1[6], "Sim")
+        self.assertEqual(cv1[7], "1000,50")
+        self.assertEqual(cv1[10], "31/12/2026")
+
+    def test_csv_usa_filtros(self):
+        linhas = self._ler(orgao="secretaria", tipo="ESTADUAL")
+        self.assertEqual([r[1] for r in linhas[1:]], ["CV-3"])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), RELATORIOS_EXECUTOR="db")
+class ReportJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        criar_convenio(numero_convenio="CV-1")
+
+    def _post(self, params=None):
+        request = RequestFactory().post("/relatorios/pdf/jobs/", params or {})
+        request.user = AnonymousUser()
+        return views.relatorio_pdf_job(request)
+
+    def test_fluxo_completo(self):
+        response = self._post({"orgao": "Ministério", "csrfmiddlewaretoken": "x"})
+        self.assertEqual(response.status_code, 202)
+        job_id = json.loads(response.content)["job_id"]
+
+        job = ReportJob.objects.get(pk=job_id)
+        self.assertEqual(job.status, ReportJob.Status.PENDENTE)
+        self.assertEqual(job.filtros, {"orgao": "Ministério"})
+
+        self.assertEqual(jobs.processar_pendentes(), 1)
+        self.assertFalse(jobs.processar(job_id))  # já processado: não reserva de novo
+
+        data = json.loads(views.relatorio_pdf_job_status(RequestFactory().get("/"), job_id).content)
+        self.assertEqual(data["status"], ReportJob.Status.CONCLUIDO)
+        self.assertIn("download_url", data)
+
+        response = views.relatorio_pdf_job_download(RequestFactory().get("/"), job_id)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF"))
+        response.close()
+
+    def test_download_antes_de_concluir(self):
+        job_id = json.loads(self._post().content)["job_id"]
+        with self.assertRaises(Http404):
+            views.relatorio_pdf_job_download(RequestFactory().get("/"), job_id)
+
+    def test_erro_na_geracao(self):
+        job_id = json.loads(self._post().content)["job_id"]
+        with mock.patch.object(views, "gerar_relatorio_pdf", side_effect=RuntimeError("falhou")), \
+                self.assertLogs("relatorios.jobs", "ERROR"):
+            jobs.processar(job_id)
+        job = ReportJob.objects.get(pk=job_id)
+        self.assertEqual(job.status, ReportJob.Status.ERRO)
+        self.assertEqual(job.erro, "falhou")
+
+    def test_limpar_expirados(self):
+        job_id = json.loads(self._post().content)["job_id"]
+        jobs.processar(job_id)
+        job = ReportJob.objects.get(pk=job_id)
+        caminho = job.arquivo.path
+        self.assertTrue(os.path.exists(caminho))
+
+        ReportJob.objects.filter(pk=job_id).update(expira_em=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(jobs.limpar_expirados(), 1)
+        self.assertFalse(ReportJob.objects.exists())
+        self.assertFalse(os.path.exists(caminho))
+
+    def test_recupera_job_travado(self):
+        job_id = json.loads(self._post().content)["job_id"]
+        ReportJob.objects.filter(pk=job_id).update(
+            status=ReportJob.Status.PROCESSANDO, iniciado_em=timezone.now() - timedelta(hours=2)
+        )
+        self.assertEqual(jobs.processar_pendentes(), 1)
+        self.assertEqual(ReportJob.objects.get(pk=job_id).status, ReportJob.Status.CONCLUIDO)
+
+    @override_settings(RELATORIOS_EXECUTOR="thread")
+    def test_manutencao_no_modo_thread(self):
+        travado, pendente, expirado = (json.loads(self._post().content)["job_id"] for _ in range(3))
+        ReportJob.objects.filter(pk=travado).update(
+            status=ReportJob.Status.PROCESSANDO, iniciado_em=timezone.now() - timedelta(hours=2)
+        )
+        ReportJob.objects.filter(pk=expirado).update(
+            status=ReportJob.Status.CONCLUIDO, expira_em=timezone.now() - timedelta(minutes=1)
+        )
+
+        executor = mock.Mock()
+        with mock.patch.object(jobs, "_get_executor", return_value=executor), \
+                mock.patch.object(jobs, "_ultima_manutencao", None):
+            # consultar o status agenda a manutenção uma vez só no intervalo
+            views.relatorio_pdf_job_status(RequestFactory().get("/"), pendente)
+            views.relatorio_pdf_job_status(RequestFactory().get("/"), pendente)
+            executor.submit.assert_called_once_with(jobs._manutencao_em_thread)
+
+            executor.reset_mock()
+            self.assertEqual(jobs.manutencao(), 2)
+        self.assertEqual(
+            [c.args for c in executor.submit.call_args_list],
+            [(jobs._processar_em_thread, travado), (jobs._processar_em_thread, pendente)],
+        )
+        self.assertFalse(ReportJob.objects.filter(pk=expirado).exists())
+
+
+@override_settings(RELATORIOS_PDF_CACHE_DIR=tempfile.mkdtemp(), RELATORIOS_GRAFICOS_DIR=tempfile.mkdtemp())
+class RelatorioPdfCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        criar_convenio(numero_convenio="CV-1")
+
+    def setUp(self):
+        pdf_cache.limpar()
+
+    def _get(self, **params):
+        return views.relatorio_pdf(RequestFactory().get("/relatorios/pdf/", params))
+
+    def test_segundo_download_vem_do_cache(self):
+        with mock.patch.object(views, "gerar_relatorio_pdf", wraps=views.gerar_relatorio_pdf) as gerar:
+            primeiro = self._get(orgao="Ministério", tipo="")
+            segundo = self._get(tipo="", orgao="Ministério ")
+        self.assertEqual(gerar.call_count, 1)
+
+        corpo = b"".join(segundo.streaming_content)
+        segundo.close()
+        self.assertEqual(corpo, primeiro.content)
+        self.assertEqual(int(segundo["Content-Length"]), len(corpo))
+        self.assertEqual(segundo["Content-Type"], "application/pdf")
+
+    def test_alteracao_de_dados_invalida(self):
+        with mock.patch.object(views, "gerar_relatorio_pdf", wraps=views.gerar_relatorio_pdf) as gerar:
+            self._get()
+            criar_convenio(numero_convenio="CV-2")
+            self._get()
+        self.assertEqual(gerar.call_count, 2)
+
+    @override_settings(RELATORIOS_PDF_CACHE_MAX_MB=1200 / (1024 * 1024))
+    def test_remocao_lru(self):
+        a = pdf_cache.guardar("a", b"x" * 500)
+        b = pdf_cache.guardar("b", b"x" * 500)
+        os.utime(a, (1000, 1000))
+        os.utime(b, (2000, 2000))
+        pdf_cache.obter("a")  # "a" passa a ser o mais recente
+
+        pdf_cache.guardar("c", b"x" * 500)
+
+        self.assertIsNotNone(pdf_cache.obter("a"))
+        self.assertIsNone(pdf_cache.obter("b"))
+        self.assertIsNotNone(pdf_cache.obter("c"))
+
+
+class GraficosTests(TestCase):
+    pedidos = [
+        ("bar", ["FEDERAL", "ESTADUAL"], [3, 1], "Convênios por Tipo"),
+        ("pie", ["PROPOSTA"], [4], "Convênios por Status"),
+        ("line", ["2025-01", "2025-02"], [10.0, 20.0], "Repasse por mês"),
+    ]
+
+    def setUp(self):
+        graficos.limpar_memo()
+
+    @override_settings(RELATORIOS_GRAFICOS_PROCESSOS=0)
+    def test_svg_e_memo(self):
+        with mock.patch.object(graficos, "renderizar", wraps=graficos.renderizar) as renderizar:
+            srcs = graficos.graficos_src(self.pedidos, saida="svg")
+            de_novo = graficos.graficos_src(self.pedidos, saida="svg")
+        self.assertEqual(renderizar.call_count, 3)
+        self.assertEqual(srcs, de_novo)
+        self.assertTrue(all(s.startswith("data:image/svg+xml") for s in srcs))
+
+    @override_settings(RELATORIOS_GRAFICOS_PROCESSOS=0, RELATORIOS_GRAFICOS_SAIDA="png")
+    def test_png_base64(self):
+        png = views.chart_bar(["A"], [1], "T")
+        self.assertTrue(png.startswith("data:image/png;base64,iVBOR"))
+
+    @override_settings(RELATORIOS_GRAFICOS_PROCESSOS=0, RELATORIOS_GRAFICOS_DIR=tempfile.mkdtemp())
+    def test_saida_arquivo(self):
+        src = graficos.graficos_src([("line", ["a", "b"], [1, 2], "T")], saida="arquivo")[0]
+        self.assertTrue(src.startswith("file://"))
+        caminho = src[len("file://"):]
+        self.assertTrue(os.path.exists(caminho))
+
+    @override_settings(RELATORIOS_GRAFICOS_PROCESSOS=0, RELATORIOS_GRAFICOS_DIR=tempfile.mkdtemp())
+    def test_saida_arquivo_lru_e_limpeza(self):
+        def caminho(src):
+            return src[len("file://"):]
+
+        a = caminho(graficos.graficos_src([("bar", ["a"], [1], "A")], saida="arquivo")[0])
+        tamanho = os.path.getsize(a)
+        os.utime(a, (1000, 1000))
+        b = caminho(graficos.graficos_src([("bar", ["b"], [2], "B")], saida="arquivo")[0])
+        os.utime(b, (2000, 2000))
+        graficos.graficos_src([("bar", ["a"], [1], "A")], saida="arquivo")  # memo: "a" passa a ser o mais recente
+
+        with override_settings(RELATORIOS_GRAFICOS_MAX_MB=2.5 * tamanho / (1024 * 1024)):
+            c = caminho(graficos.graficos_src([("bar", ["c"], [3], "C")], saida="arquivo")[0])
+        self.assertTrue(os.path.exists(a))
+        self.assertFalse(os.path.exists(b))
+        self.assertTrue(os.path.exists(c))
+
+        # o memo não devolve a URI de um arquivo removido
+        self.assertTrue(os.path.exists(caminho(graficos.graficos_src([("bar", ["b"], [2], "B")], saida="arquivo")[0])))
+
+        with override_settings(RELATORIOS_PDF_CACHE_DIR=tempfile.mkdtemp()):
+            pdf_cache.limpar()
+        self.assertEqual(os.listdir(os.path.dirname(a)), [])
+
+    @override_settings(RELATORIOS_GRAFICOS_PROCESSOS=2)
+    def test_pool_de_processos(self):
+        srcs = graficos.graficos_src(self.pedidos, saida="svg")
+        self.assertEqual(len(srcs), 3)
+        self.assertTrue(all(s.startswith("data:image/svg+xml") for s in srcs))
+
+
+class RelatoriosDadosTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # os signals recalculam o cubo no commit
+        with cls.captureOnCommitCallbacks(execute=True):
+            criar_convenio(numero_convenio="CV-1", vigencia_inicio=date(2025, 1, 10))
+            criar_convenio(numero_convenio="CV-2", vigencia_inicio=date(2025, 1, 20), status=Convenio.Status.EXECUCAO)
+            criar_convenio(
+                numero_convenio="CV-3",
+                vigencia_inicio=date(2025, 3, 5),
+                tipo=Convenio.Tipo.ESTADUAL,
+                valor_repasse=Decimal("10.00"),
+                valor_contrapartida=Decimal("0"),
+            )
+
+    def _dados(self, **params):
+        response = views.relatorios_dados(RequestFactory().get("/relatorios/dados/", params))
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def test_totais_e_quebras(self):
+        data = self._dados()
+        self.assertEqual(data["qtd_total"], 3)
+        self.assertEqual(data["total_repasse"], 2011.0)
+        self.assertEqual(data["total_contrapartida"], 200.0)
+        self.assertEqual(data["por_tipo"], [{"tipo": "ESTADUAL", "qtd": 1}, {"tipo": "FEDERAL", "qtd": 2}])
+        self.assertEqual(data["por_status"], [{"status": "EXECUCAO", "qtd": 1}, {"status": "PROPOSTA", "qtd": 2}])
+        self.assertEqual(
+            data["repasse_por_mes"],
+            [{"mes": "2025-01", "repasse": 2001.0}, {"mes": "2025-03", "repasse": 10.0}],
+        )
+        self.assertEqual(len(data["lista"]), 3)
+
+    def test_filtro_sem_distinct(self):
+        qs = views._apply_filters(RequestFactory().get("/", {"orgao": "saúde", "tipo": "FEDERAL"}), Convenio.objects.all())
+        self.assertFalse(qs.query.distinct)
+        self.assertEqual(self._dados(tipo="FEDERAL")["qtd_total"], 2)
+
+    def test_busca_livre(self):
+        Convenio.objects.filter(numero_convenio="CV-3").update(objeto="Pavimentação da avenida")
+        self.assertEqual(self._dados(q="pavimenta")["qtd_total"], 1)
+        self.assertEqual(self._dados(q="CV-")["qtd_total"], 3)
+        self.assertEqual(self._dados(q="CV-", tipo="FEDERAL")["qtd_total"], 2)
+
+    def test_tres_queries(self):
+        # aggregate de totais + UNION ALL das quebras + lista
+        with self.assertNumQueries(3):
+            self._dados(tipo="FEDERAL")
+
+
+class CuboTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        with cls.captureOnCommitCallbacks(execute=True):
+            for n, (tipo, status, orgao, inicio, recebido) in enumerate((
+                (Convenio.Tipo.FEDERAL, Convenio.Status.EXECUCAO, "Ministério da Saúde", date(2025, 1, 10), True),
+                (Convenio.Tipo.FEDERAL, Convenio.Status.EXECUCAO, "Ministério da Saúde", date(2025, 1, 31), True),
+                (Convenio.Tipo.FEDERAL, Convenio.Status.PROPOSTA, "Ministério da Educação", date(2025, 2, 1), False),
+                (Convenio.Tipo.ESTADUAL, Convenio.Status.CONCLUIDO, "Secretaria de Saúde", date(2025, 2, 28), False),
+                (Convenio.Tipo.ESPECIAL, Convenio.Status.EXECUCAO, "Secretaria de Obras", date(2024, 12, 1), True),
+            )):
+                criar_convenio(
+                    numero_convenio=f"CB-{n}", tipo=tipo, status=status, orgao_concedente=orgao,
+                    vigencia_inicio=inicio, repasse_recebido=recebido,
+                    valor_repasse=Decimal(100 * (n + 1)), valor_contrapartida=Decimal(n),
+                )
+
+    def _celulas(self):
+        return set(CuboConvenios.objects.values_list(*cubo.DIMENSOES, "qtd", "total_repasse", "total_contrapartida"))
+
+    def test_mesmo_resumo_que_os_convenios(self):
+        self.assertEqual(CuboConvenios.objects.count(), 4)
+        for params in (
+            {},
+            {"tipo": "federal"},
+            {"status": "EXECUCAO", "repasse_recebido": "1"},
+            {"orgao": "saude"},
+            {"data_ini": "2025-01-01", "tipo": "FED"},
+            {"data_fim": "data-invalida", "repasse_recebido": "0"},
+        ):
+            with self.subTest(params=params):
+                celulas = cubo.filtrar(params)
+                self.assertIsNotNone(celulas)
+                self.assertEqual(
+                    views._resumo_filtrado(celulas, sobre_cubo=True),
+                    views._resumo_filtrado(aplicar_filtros(params, Convenio.objects.all())),
+                )
+
+    def test_filtros_fora_do_cubo(self):
+        for params in (
+            {"data_fim": "2026-01-01"},
+            {"status": "Vencendo"},
+            {"data_ini": "2025-01-15"},
+            {"q": "CB-1"},
+            {"parlamentar": "Fulano"},
+        ):
+            with self.subTest(params=params):
+                self.assertIsNone(cubo.filtrar(params))
+        with override_settings(RELATORIOS_CUBO=False):
+            self.assertIsNone(cubo.filtrar({}))
+
+    def test_fallback_responde_pelos_convenios(self):
+        response = views.relatorios_dados(RequestFactory().get("/relatorios/dados/", {"q": "CB-1"}))
+        self.assertEqual(json.loads(response.content)["qtd_total"], 1)
+
+    def test_signals_recalculam_mes_antigo_e_novo(self):
+        convenio = Convenio.objects.get(numero_convenio="CB-0")
+        with self.captureOnCommitCallbacks(execute=True):
+            convenio.vigencia_inicio = date(2025, 3, 5)
+            convenio.status = Convenio.Status.CONCLUIDO
+            convenio.save()
+            Convenio.objects.get(numero_convenio="CB-4").delete()
+        incremental = self._celulas()
+
+        cubo.reconstruir()
+        self.assertEqual(incremental, self._celulas())
+        self.assertEqual(CuboConvenios.objects.get(mes=date(2025, 1, 1)).qtd, 1)
+        self.assertFalse(CuboConvenios.objects.filter(mes=date(2024, 12, 1)).exists())
+
+    def test_save_sem_campos_do_cubo_nao_recalcula(self):
+        convenio = Convenio.objects.get(numero_convenio="CB-0")
+        with self.captureOnCommitCallbacks() as callbacks:
+            convenio.save(update_fields=["observacoes"])
+        self.assertFalse([c for c in callbacks if getattr(c, "__module__", "") == "relatorios.signals"])
+
+    def test_rebuild_cubo(self):
+        esperado = self._celulas()
+        CuboConvenios.objects.all().delete()
+        saida = StringIO()
+        call_command("rebuild_cubo", stdout=saida)
+        self.assertIn("4 célula(s)", saida.getvalue())
+        self.assertEqual(self._celulas(), esperado)
+
+
+class PrevisaoTests(TestCase):
+    HOJE = date(2025, 7, 15)
+
+    @classmethod
+    def setUpTestData(cls):
+        empresa = Empresa.objects.create(cnpj="00.000.000/0001-00", razao_social="Empresa Teste")
+
+        def convenio(numero, inicio, fim, valor, pagamentos, **kwargs):
+            c = criar_convenio(
+                numero_convenio=numero, vigencia_inicio=inicio, vigencia_fim=fim,
+                valor_repasse=Decimal(valor), valor_contrapartida=Decimal("0"), **kwargs,
+            )
+            contrato = Contrato.objects.create(
+                convenio=c, empresa=empresa, numero_contrato=f"CT-{numero}", objeto_contratado="Obra",
+                valor_contratado=Decimal(valor), data_inicio=inicio,
+            )
+            Pagamento.objects.bulk_create(
+                Pagamento(contrato=contrato, data=data, valor_pago=Decimal(v)) for data, v in pagamentos
+            )
+            return c
+
+        # gasto constante: R$ 100/mês, sobra o que não cabe até 31/12
+        convenio("CONSTANTE", date(2025, 1, 1), date(2025, 12, 31), "1200",
+                 [(date(2025, m, 10), "100") for m in range(1, 7)])
+        # um único pagamento em junho: ritmo baixo e irregular
+        convenio("IRREGULAR", date(2025, 1, 1), date(2025, 9, 30), "1000", [(date(2025, 6, 5), "500")])
+        # começou em abril e gasta rápido: esgota antes do fim (o pagamento de julho não entra no ritmo)
+        convenio("RAPIDO", date(2025, 4, 1), date(2025, 12, 31), "1000",
+                 [(date(2025, m, 1), "300") for m in (4, 5, 6)] + [(date(2025, 7, 1), "50")])
+        # fora da carteira ativa
+        convenio("CONCLUIDO", date(2025, 1, 1), date(2025, 12, 31), "1000", [], status=Convenio.Status.CONCLUIDO)
+        convenio("FUTURO", date(2025, 8, 1), date(2026, 12, 31), "1000", [])
+
+    def _linhas(self, **kwargs):
+        from . import previsao
+
+        p = previsao.prever(hoje=self.HOJE, janela=6, **kwargs)
+        return p, {linha["numero_convenio"]: linha for linha in p.linhas()}
+
+    def test_metricas(self):
+        p, linhas = self._linhas()
+        self.assertEqual(set(linhas), {"CONSTANTE", "IRREGULAR", "RAPIDO"})
+
+        constante = linhas["CONSTANTE"]
+        self.assertEqual((constante["pago"], constante["saldo"], constante["ritmo_mensal"]), (600.0, 600.0, 100.0))
+        # 169 dias até o fim a R$ 100/mês
+        self.assertAlmostEqual(constante["sobra_prevista"], 600 - 100 * 169 / (365.25 / 12), places=2)
+        self.assertEqual(constante["esgotamento_previsto"], self.HOJE + timedelta(days=182))
+        self.assertEqual((constante["risco_sobra"], constante["faixa_risco"]), (1.0, "ALTO"))
+
+        irregular = linhas["IRREGULAR"]
+        self.assertAlmostEqual(irregular["ritmo_mensal"], 83.33, places=2)
+        self.assertTrue(0.8 < irregular["risco_sobra"] < 0.9)
+
+        rapido = linhas["RAPIDO"]
+        self.assertEqual((rapido["pago"], rapido["ritmo_mensal"]), (950.0, 300.0))
+        self.assertTrue(rapido["esgota_antes_do_fim"])
+        self.assertEqual((rapido["sobra_prevista"], rapido["risco_sobra"], rapido["faixa_risco"]), (0.0, 0.0, "BAIXO"))
+
+        # ordem: maior risco primeiro
+        self.assertEqual([linha["numero_convenio"] for linha in p.linhas()], ["CONSTANTE", "IRREGULAR", "RAPIDO"])
+        self.assertEqual(p.resumo()["por_risco"], {"ALTO": 2, "MEDIO": 0, "BAIXO": 1})
+        self.assertEqual(p.resumo()["esgotam_antes_do_fim"], 1)
+
+    def test_filtros_dos_relatorios(self):
+        _, linhas = self._linhas(params={"q": "RAPIDO"})
+        self.assertEqual(set(linhas), {"RAPIDO"})
+
+    def test_endpoint_e_relatorio(self):
+        with mock.patch("django.utils.timezone.localdate", return_value=self.HOJE):
+            # convênios + série de pagamentos + número/órgão das linhas exibidas
+            with self.assertNumQueries(3):
+                response = self.client.get("/relatorios/previsao/dados/", {"risco": "alto", "tamanho": "1"})
+            data = response.json()
+            self.assertEqual(data["resumo"]["convenios"], 3)
+            self.assertEqual([c["numero_convenio"] for c in data["convenios"]], ["CONSTANTE"])
+            self.assertEqual(data["convenios"][0]["esgotamento_previsto"], "2026-01-13")
+
+            response = self.client.get("/relatorios/previsao/", {"risco": "BAIXO"})
+        self.assertContains(response, "RAPIDO")
+        self.assertNotContains(response, "IRREGULAR")
+
+
+class IndicesTests(TestCase):
+    """
+    EXPLAIN das queries de filtro: confirma que os índices de convenios/financeiro são usados.
+    No PostgreSQL o seq scan é desligado, senão o planner prefere varrer tabelas pequenas.
+    """
+
+    def _explain(self, qs):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        return qs.explain()
+
+    def _filtrado(self, **params):
+        return views._apply_filters(RequestFactory().get("/relatorios/", params), Convenio.objects.all())
+
+    def test_filtros_usam_indices(self):
+        casos = [
+            ({"data_ini": "2025-01-01"}, ("convenio_viginicio_idx", "convenio_tipo_viginicio_idx")),
+            ({"status": "Vencidos"}, ("convenio_vigfim_orgao_idx", "convenio_status_vigfim_idx")),
+            ({"status": "EXECUCAO"}, ("convenio_status_vigfim_idx",)),
+            ({"tipo": "federal", "data_ini": "2025-01-01"}, ("convenio_tipo_viginicio_idx",)),
+            ({"repasse_recebido": "0"}, ("convenio_repasse_pend_idx",)),
+        ]
+        for params, indices in casos:
+            with self.subTest(params=params):
+                # sem ORDER BY: é assim que rodam o aggregate e o UNION ALL de _resumo_filtrado
+                plano = self._explain(self._filtrado(**params).order_by())
+                self.assertTrue(any(i in plano for i in indices), plano)
+
+    def test_listagem_ordenada_repasse_pendente(self):
+        plano = self._explain(self._filtrado(repasse_recebido="0"))
+        self.assertIn("convenio_repasse_pend_idx", plano)
+
+    def test_pagamentos_por_contrato(self):
+        plano = self._explain(Pagamento.objects.filter(contrato_id=1).order_by("data"))
+        self.assertIn("pagamento_contrato_data_id_idx", plano)
+
+
+class ImportTardioTests(TestCase):
+    def test_urlconf_carrega_sem_weasyprint_e_matplotlib(self):
+        # processo novo, com os dois imports bloqueados (None em sys.modules -> ImportError)
+        script = (
+            "import sys; sys.modules['weasyprint'] = sys.modules['matplotlib'] = sys.modules['numpy'] = None\n"
+            "import django; django.setup()\n"
+            "from django.urls import resolve; resolve('/relatorios/pdf/'); resolve('/relatorios/previsao/')\n"
+            "resolve('/dashboard/')\n"
+            "print('ok')"
+        )
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": settings.SETTINGS_MODULE, "RELATORIOS_PRECARREGAR": "0"}
+        proc = subprocess.run(
+            [sys.executable, "-c", script], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        self.assertEqual(proc.stdout.strip(), "ok")
+
+    def test_aquecer_idempotente(self):
+        with mock.patch.multiple(aquecimento, _importado=False, _aquecido=False), \
+                mock.patch.object(aquecimento, "importar", wraps=aquecimento.importar) as importar:
+            self.assertGreater(aquecimento.aquecer(renderizar=False), 0)
+            self.assertEqual(aquecimento.aquecer(renderizar=False), 0)
+            self.assertGreater(aquecimento.aquecer(), 0)
+            self.assertEqual(aquecimento.aquecer(), 0)
+        self.assertEqual(importar.call_count, 1)
+
+    @override_settings(RELATORIOS_GRAFICOS_PROCESSOS=2)
+    def test_aquecer_desenha_no_pool(self):
+        pool = mock.Mock()
+        with mock.patch.multiple(aquecimento, _importado=False, _aquecido=False), \
+                mock.patch.object(graficos, "_get_pool", return_value=pool):
+            aquecimento.aquecer()
+        pool.submit.assert_called_once_with(graficos.renderizar, "bar", ["a"], [1], "aquecimento")
+
+        # o processo web importa só o WeasyPrint; o matplotlib fica nos processos do pool
+        script = (
+            "import sys, django; django.setup()\n"
+            "from relatorios import aquecimento; aquecimento.importar()\n"
+            "print('matplotlib' in sys.modules)"
+        )
+        # com override_settings, settings.SETTINGS_MODULE é None: herda DJANGO_SETTINGS_MODULE do ambiente
+        env = {**os.environ, "RELATORIOS_PRECARREGAR": "0", "RELATORIOS_GRAFICOS_PROCESSOS": "2"}
+        proc = subprocess.run(
+            [sys.executable, "-c", script], cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        self.assertEqual(proc.stdout.strip(), "False", proc.stderr)
+
+    def test_precarregar_ignora_falha(self):
+        with mock.patch.object(aquecimento, "importar", side_effect=OSError("sem libpango")):
+            with self.assertLogs("relatorios.aquecimento", "ERROR"):
+                aquecimento.precarregar("1")
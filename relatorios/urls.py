@@ -7,4 +7,14 @@ urlpatterns = [
     path("", views.relatorios_home, name="relatorios_home"),          # /relatorios/
     path("dados/", views.relatorios_dados, name="relatorios_dados"),  # /relatorios/dados/
     path("pdf/", views.relatorio_pdf, name="relatorio_pdf"),          # /relatorios/pdf/
+    path("csv/", views.relatorio_csv, name="relatorio_csv"),          # /relatorios/csv/
+
+    # previsão de execução financeira (convênios ativos)
+    path("previsao/", views.previsao_relatorio, name="previsao"),
+    path("previsao/dados/", views.previsao_dados, name="previsao_dados"),
+
+    # PDF em segundo plano
+    path("pdf/jobs/", views.relatorio_pdf_job, name="relatorio_pdf_job"),
+    path("pdf/jobs/<int:pk>/", views.relatorio_pdf_job_status, name="relatorio_pdf_job_status"),
+    path("pdf/jobs/<int:pk>/download/", views.relatorio_pdf_job_download, name="relatorio_pdf_job_download"),
 ]
@@ -1,66 +1,38 @@
-import base64
-from io import BytesIO
-import matplotlib
-
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-
+import csv
 from decimal import Decimal
-from datetime import datetime, time, timedelta
 
-from django.http import HttpResponse, JsonResponse
-from django.shortcuts import render
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
 from django.template.loader import render_to_string
+from django.urls import reverse
 from django.utils import timezone
-from django.utils.dateparse import parse_date
-from django.db.models import Sum, Count, Q
-from django.db.models.functions import Coalesce, TruncMonth
+from django.utils.http import urlencode
+from django.db.models import CharField, Count, F, Sum, Value
+from django.db.models.functions import Cast, Coalesce, TruncMonth
+from django.views.decorators.http import require_POST
 
-from weasyprint import HTML
+from convenios.filtros import aplicar_filtros as _aplicar_filtros, filtros_dict as _filtros_dict
 from convenios.models import Convenio
+from core.paginacao import tamanho_pagina
+
+from . import cubo, graficos, jobs, pdf_cache
+from .models import ReportJob
 
 
 # =========================
 # Helpers de gráfico (PDF)
 # =========================
 
-def _fig_to_base64(fig) -> str:
-    buf = BytesIO()
-    fig.tight_layout()
-    fig.savefig(buf, format="png", dpi=160)
-    plt.close(fig)
-    return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode("utf-8")
-
-
 def chart_bar(labels, values, title):
-    fig = plt.figure(figsize=(8, 3.2))
-    ax = fig.add_subplot(111)
-    ax.bar(labels, values)
-    ax.set_title(title)
-    ax.set_ylabel("Qtd")
-    ax.tick_params(axis="x", rotation=15)
-    return _fig_to_base64(fig)
+    return graficos.graficos_src([("bar", labels, values, title)])[0]
 
 
 def chart_pie(labels, values, title):
-    fig = plt.figure(figsize=(7, 3.2))
-    ax = fig.add_subplot(111)
-    if sum(values) == 0:
-        ax.text(0.5, 0.5, "Sem dados", ha="center", va="center")
-    else:
-        ax.pie(values, labels=labels, autopct="%1.0f%%", startangle=90)
-    ax.set_title(title)
-    return _fig_to_base64(fig)
+    return graficos.graficos_src([("pie", labels, values, title)])[0]
 
 
 def chart_line(labels, values, title):
-    fig = plt.figure(figsize=(8, 3.2))
-    ax = fig.add_subplot(111)
-    ax.plot(labels, values, marker="o")
-    ax.set_title(title)
-    ax.set_ylabel("R$")
-    ax.tick_params(axis="x", rotation=25)
-    return _fig_to_base64(fig)
+    return graficos.graficos_src([("line", labels, values, title)])[0]
 
 
 # =========================
@@ -72,78 +44,72 @@ def relatorios_home(request):
 
 
 def _apply_filters(request, qs):
+    return _aplicar_filtros(request.GET, qs)
+
+
+def _medidas(sobre_cubo=False):
+    """(quantidade, repasse, contrapartida, mês, campo de data) sobre Convenio ou sobre o CuboConvenios."""
+    if sobre_cubo:
+        return Sum("qtd"), "total_repasse", "total_contrapartida", F("mes"), "mes"
+    return Count("id"), "valor_repasse", "valor_contrapartida", TruncMonth("vigencia_inicio"), "vigencia_inicio"
+
+
+def _resumo_filtrado(qs, sobre_cubo=False):
     """
-    Aplica filtros do GET no queryset de convênios.
-    Compatível com DateField ou DateTimeField.
-    Suporta filtro especial de "status":
-      - OK / Vencendo / Vencidos  -> baseado em vigencia_fim
-    E filtro por:
-      - repasse_recebido (1/0)
-      - parlamentar (texto)
+    Totais e quebras do queryset filtrado (convênios ou células do cubo) em 2 queries:
+      - 1 aggregate com quantidade e totais;
+      - 1 UNION ALL com as quebras por tipo, por status e repasse por mês.
+    O UNION ALL é SQL padrão (PostgreSQL, SQLite, MySQL), sem ramo por banco.
     """
-    data_ini = parse_date((request.GET.get("data_ini") or "").strip())
-    data_fim = parse_date((request.GET.get("data_fim") or "").strip())
-
-    status = (request.GET.get("status") or "").strip()
-    orgao = (request.GET.get("orgao") or "").strip()  # input name="orgao"
-    tipo = (request.GET.get("tipo") or "").strip()
-    modalidade = (request.GET.get("modalidade") or "").strip()
-
-    # ✅ parlamentar (input name="parlamentar")
-    parlamentar = (request.GET.get("parlamentar") or "").strip()
-
-    # ✅ repasse_recebido (select name="repasse_recebido")
-    repasse_recebido = (request.GET.get("repasse_recebido") or "").strip()
-
-    ini_is_dt = Convenio._meta.get_field("vigencia_inicio").get_internal_type() == "DateTimeField"
-    fim_is_dt = Convenio._meta.get_field("vigencia_fim").get_internal_type() == "DateTimeField"
-
-    # Datas (mantendo NULL também)
-    if data_ini:
-        if ini_is_dt:
-            dt_ini = timezone.make_aware(datetime.combine(data_ini, time.min))
-            qs = qs.filter(Q(vigencia_inicio__isnull=True) | Q(vigencia_inicio__gte=dt_ini))
-        else:
-            qs = qs.filter(Q(vigencia_inicio__isnull=True) | Q(vigencia_inicio__gte=data_ini))
-
-    if data_fim:
-        if fim_is_dt:
-            dt_fim = timezone.make_aware(datetime.combine(data_fim, time.max))
-            qs = qs.filter(Q(vigencia_fim__isnull=True) | Q(vigencia_fim__lte=dt_fim))
-        else:
-            qs = qs.filter(Q(vigencia_fim__isnull=True) | Q(vigencia_fim__lte=data_fim))
-
-    # Status especial ou status do banco
-    if status:
-        hoje = timezone.localdate()
-        st = status.upper()
-        if st == "VENCIDOS":
-            qs = qs.filter(vigencia_fim__lt=hoje)
-        elif st == "VENCENDO":
-            qs = qs.filter(vigencia_fim__gte=hoje, vigencia_fim__lte=hoje + timedelta(days=30))
-        elif st == "OK":
-            qs = qs.filter(vigencia_fim__gt=hoje + timedelta(days=30))
-        else:
-            qs = qs.filter(status__iexact=status)
-
-    if orgao:
-        qs = qs.filter(orgao_concedente__icontains=orgao)
-
-    if tipo:
-        qs = qs.filter(tipo__icontains=tipo)
-
-    if modalidade:
-        qs = qs.filter(modalidade__icontains=modalidade)
-
-    if parlamentar:
-        qs = qs.filter(parlamentar_nome__icontains=parlamentar)
-
-    if repasse_recebido == "1":
-        qs = qs.filter(repasse_recebido=True)
-    elif repasse_recebido == "0":
-        qs = qs.filter(repasse_recebido=False)
-
-    return qs.distinct()
+    qs = qs.order_by()
+    qtd, repasse, contrapartida, mes, campo_data = _medidas(sobre_cubo)
+
+    totais = qs.aggregate(
+        qtd_total=Coalesce(qtd, 0),
+        total_repasse=Coalesce(Sum(repasse), Decimal("0")),
+        total_contrapartida=Coalesce(Sum(contrapartida), Decimal("0")),
+    )
+
+    def grupo(dimensao, chave, base=qs):
+        return (
+            base.annotate(_dim=Value(dimensao, output_field=CharField()), _chave=chave)
+                .values("_dim", "_chave")
+                .annotate(qtd=Coalesce(qtd, 0), repasse=Coalesce(Sum(repasse), Decimal("0")))
+                .order_by()
+        )
+
+    grupos = grupo("tipo", Cast("tipo", CharField())).union(
+        grupo("status", Cast("status", CharField())),
+        grupo(
+            "mes",
+            Cast(mes, CharField()),
+            base=qs.exclude(**{f"{campo_data}__isnull": True}),
+        ),
+        all=True,
+    )
+
+    quebras = {"tipo": [], "status": [], "mes": []}
+    for r in grupos:
+        quebras[r["_dim"]].append(r)
+
+    def ordenadas(linhas):
+        return sorted(linhas, key=lambda r: (r["_chave"] is None, r["_chave"] or ""))
+
+    return {
+        **totais,
+        "por_tipo": [(r["_chave"] or "Não informado", r["qtd"]) for r in ordenadas(quebras["tipo"])],
+        "por_status": [(r["_chave"] or "Não informado", r["qtd"]) for r in ordenadas(quebras["status"])],
+        # "2025-01-01" (SQLite) ou "2025-01-01 00:00:00" (PostgreSQL) -> "2025-01"
+        "repasse_por_mes": [(r["_chave"][:7], r["repasse"]) for r in ordenadas(quebras["mes"])],
+    }
+
+
+def _resumo(params, qs):
+    """Resumo pelo cubo mensal quando os filtros cabem nas dimensões dele; senão, pelos convênios filtrados."""
+    celulas = cubo.filtrar(params)
+    if celulas is not None:
+        return _resumo_filtrado(celulas, sobre_cubo=True)
+    return _resumo_filtrado(qs)
 
 
 def relatorios_dados(request):
@@ -161,40 +127,9 @@ def relatorios_dados(request):
     try:
         qs = _apply_filters(request, Convenio.objects.all())
 
-        totais = qs.aggregate(
-            total_repasse=Coalesce(Sum("valor_repasse"), Decimal("0")),
-            total_contrapartida=Coalesce(Sum("valor_contrapartida"), Decimal("0")),
-        )
-        total_repasse = totais["total_repasse"] or Decimal("0")
-        total_contra = totais["total_contrapartida"] or Decimal("0")
-
-        por_tipo = list(
-            qs.values("tipo")
-              .annotate(qtd=Count("id", distinct=True))
-              .order_by("tipo")
-        )
-        for i in por_tipo:
-            i["tipo"] = i["tipo"] or "Não informado"
-
-        por_status = list(
-            qs.values("status")
-              .annotate(qtd=Count("id", distinct=True))
-              .order_by("status")
-        )
-        for i in por_status:
-            i["status"] = i["status"] or "Não informado"
-
-        repasse_por_mes = list(
-            qs.exclude(vigencia_inicio__isnull=True)
-              .annotate(mes=TruncMonth("vigencia_inicio"))
-              .values("mes")
-              .annotate(repasse=Coalesce(Sum("valor_repasse"), Decimal("0")))
-              .order_by("mes")
-        )
-        repasse_por_mes_fmt = [
-            {"mes": r["mes"].strftime("%Y-%m"), "repasse": float(r["repasse"])}
-            for r in repasse_por_mes
-        ]
+        resumo = _resumo(request.GET, qs)
+        total_repasse = resumo["total_repasse"]
+        total_contra = resumo["total_contrapartida"]
 
         lista = list(
             qs.order_by("-vigencia_fim")
@@ -215,13 +150,13 @@ def relatorios_dados(request):
 
         return JsonResponse({
             "ok": True,
-            "qtd_total": qs.count(),
+            "qtd_total": resumo["qtd_total"],
             "total_repasse": float(total_repasse),
             "total_contrapartida": float(total_contra),
             "total_geral": float(total_repasse + total_contra),
-            "por_tipo": por_tipo,
-            "por_status": por_status,
-            "repasse_por_mes": repasse_por_mes_fmt,
+            "por_tipo": [{"tipo": t, "qtd": n} for t, n in resumo["por_tipo"]],
+            "por_status": [{"status": st, "qtd": n} for st, n in resumo["por_status"]],
+            "repasse_por_mes": [{"mes": m, "repasse": float(v)} for m, v in resumo["repasse_por_mes"]],
             "lista": lista,
         })
 
@@ -230,7 +165,35 @@ def relatorios_dados(request):
 
 
 def relatorio_pdf(request):
-    qs = _apply_filters(request, Convenio.objects.all().order_by("-vigencia_fim"))
+    # mesmo filtro + mesmos dados -> serve o PDF já gerado direto do disco
+    chave = pdf_cache.chave(_filtros_dict(request.GET))
+    caminho = pdf_cache.obter(chave)
+    if caminho is not None:
+        try:
+            return FileResponse(
+                open(caminho, "rb"),
+                as_attachment=True,
+                filename="relatorio_convenios.pdf",
+                content_type="application/pdf",
+            )
+        except FileNotFoundError:
+            pass  # removido pelo LRU entre obter() e open(): gera de novo
+
+    pdf = gerar_relatorio_pdf(request.GET, base_url=request.build_absolute_uri("/"))
+    pdf_cache.guardar(chave, pdf)
+
+    response = HttpResponse(pdf, content_type="application/pdf")
+    response["Content-Disposition"] = 'attachment; filename="relatorio_convenios.pdf"'
+    response["Content-Length"] = len(pdf)
+    return response
+
+
+def gerar_relatorio_pdf(params, base_url=None) -> bytes:
+    """
+    Renderiza o PDF do relatório (gráficos + tabela) para os filtros informados.
+    Usado pela view síncrona e pelos jobs em segundo plano (relatorios/jobs.py).
+    """
+    qs = _aplicar_filtros(params, Convenio.objects.all().order_by("-vigencia_fim"))
 
     def pick(obj, *fields, default="-"):
         for f in fields:
@@ -269,65 +232,202 @@ def relatorio_pdf(request):
             "total": repasse + contrapartida,
         })
 
-    totais = qs.aggregate(
-        total_repasse=Coalesce(Sum("valor_repasse"), Decimal("0")),
-        total_contrapartida=Coalesce(Sum("valor_contrapartida"), Decimal("0")),
-    )
-    total_repasse = totais["total_repasse"] or Decimal("0")
-    total_contra = totais["total_contrapartida"] or Decimal("0")
+    resumo = _resumo(params, qs)
+    total_repasse = resumo["total_repasse"]
+    total_contra = resumo["total_contrapartida"]
 
     # =========================
     # ✅ GRÁFICOS PARA O PDF
     # =========================
 
-    por_tipo = list(
-        qs.values("tipo")
-          .annotate(qtd=Count("id", distinct=True))
-          .order_by("tipo")
-    )
-    labels_tipo = [(i["tipo"] or "Não informado") for i in por_tipo]
-    values_tipo = [int(i["qtd"]) for i in por_tipo]
-    grafico_tipo = chart_bar(labels_tipo, values_tipo, "Convênios por Tipo")
-
-    por_status = list(
-        qs.values("status")
-          .annotate(qtd=Count("id", distinct=True))
-          .order_by("status")
-    )
-    labels_status = [(i["status"] or "Não informado") for i in por_status]
-    values_status = [int(i["qtd"]) for i in por_status]
-    grafico_status = chart_pie(labels_status, values_status, "Convênios por Status")
-
-    repasse_por_mes = list(
-        qs.exclude(vigencia_inicio__isnull=True)
-          .annotate(mes=TruncMonth("vigencia_inicio"))
-          .values("mes")
-          .annotate(repasse=Coalesce(Sum("valor_repasse"), Decimal("0")))
-          .order_by("mes")
-    )
-    labels_mes = [r["mes"].strftime("%Y-%m") for r in repasse_por_mes]
-    values_mes = [float(r["repasse"]) for r in repasse_por_mes]
-    grafico_mes = chart_line(labels_mes, values_mes, "Repasse por mês")
+    labels_tipo = [t for t, _ in resumo["por_tipo"]]
+    values_tipo = [int(n) for _, n in resumo["por_tipo"]]
+
+    labels_status = [st for st, _ in resumo["por_status"]]
+    values_status = [int(n) for _, n in resumo["por_status"]]
+
+    labels_mes = [m for m, _ in resumo["repasse_por_mes"]]
+    values_mes = [float(v) for _, v in resumo["repasse_por_mes"]]
+
+    # os três gráficos são renderizados em paralelo (e memorizados) por relatorios/graficos.py
+    grafico_tipo, grafico_status, grafico_mes = graficos.graficos_src([
+        ("bar", labels_tipo, values_tipo, "Convênios por Tipo"),
+        ("pie", labels_status, values_status, "Convênios por Status"),
+        ("line", labels_mes, values_mes, "Repasse por mês"),
+    ])
 
     context = {
         "titulo": "Relatório Geral de Convênios",
         "rows": rows,
-        "qtd_convenios": qs.count(),
+        "qtd_convenios": resumo["qtd_total"],
         "total_repasse": total_repasse,
         "total_contrapartida": total_contra,
         "total_geral": total_repasse + total_contra,
         "gerado_em": timezone.now(),
-        "filtros": request.GET.dict(),
+        "filtros": _filtros_dict(params),
 
-        # ✅ gráficos como imagem (base64)
+        # ✅ gráficos como imagem (src: data URI SVG/PNG ou arquivo)
         "grafico_tipo": grafico_tipo,
         "grafico_status": grafico_status,
         "grafico_mes": grafico_mes,
     }
 
     html_string = render_to_string("relatorios/pdf.html", context)
-    pdf = HTML(string=html_string, base_url=request.build_absolute_uri("/")).write_pdf()
+    # import tardio: WeasyPrint (e suas libs nativas) só carrega quando algum PDF é gerado
+    from weasyprint import HTML
 
-    response = HttpResponse(pdf, content_type="application/pdf")
-    response["Content-Disposition"] = 'attachment; filename="relatorio_convenios.pdf"'
+    return HTML(string=html_string, base_url=base_url).write_pdf()
+
+
+# =========================
+# Previsão de execução financeira
+# =========================
+
+def _previsao(params):
+    # import tardio: NumPy só carrega quando alguma previsão é pedida (como a pilha de PDF)
+    from . import previsao
+
+    risco = (params.get("risco") or "").strip().upper()
+    if risco not in previsao.RISCOS:
+        risco = ""
+    resultado = previsao.prever(_filtros_dict(params))
+    limite = tamanho_pagina(params, 100, 1000)
+    return resultado, risco, list(resultado.linhas(limite=limite, risco=risco or None))
+
+
+def previsao_relatorio(request):
+    """Convênios ativos com maior risco de terminar a vigência com saldo sobrando."""
+    resultado, risco, linhas = _previsao(request.GET)
+    return render(request, "relatorios/previsao.html", {
+        "resumo": resultado.resumo(),
+        "linhas": linhas,
+        "risco": risco,
+        "hoje": resultado.hoje,
+        "janela": resultado.janela,
+        "base_qs": urlencode(_filtros_dict(request.GET)),
+    })
+
+
+def previsao_dados(request):
+    """
+    JSON da previsão: resumo da carteira ativa (com os filtros dos relatórios) e os
+    convênios em ordem de risco de sobra (`risco`=ALTO/MEDIO/BAIXO, `tamanho` até 1000).
+    """
+    resultado, risco, linhas = _previsao(request.GET)
+    return JsonResponse({
+        "ok": True,
+        "hoje": resultado.hoje,
+        "janela_meses": resultado.janela,
+        "resumo": resultado.resumo(),
+        "tempos": resultado.tempos,
+        "convenios": linhas,
+    })
+
+
+# =========================
+# PDF em segundo plano (jobs)
+# =========================
+
+def _job_json(job: ReportJob):
+    data = {
+        "ok": True,
+        "job_id": job.pk,
+        "status": job.status,
+        "status_url": reverse("relatorios:relatorio_pdf_job_status", args=[job.pk]),
+    }
+    if job.status == ReportJob.Status.CONCLUIDO:
+        data["download_url"] = reverse("relatorios:relatorio_pdf_job_download", args=[job.pk])
+    if job.status == ReportJob.Status.ERRO:
+        data["error"] = job.erro
+    return data
+
+
+@require_POST
+def relatorio_pdf_job(request):
+    """
+    Enfileira a geração do PDF com os filtros enviados e responde 202 com o id do job.
+    O front consulta relatorio_pdf_job_status até o PDF ficar pronto.
+    """
+    job = jobs.enfileirar(
+        _filtros_dict(request.POST or request.GET),
+        base_url=request.build_absolute_uri("/"),
+        user=request.user,
+    )
+    return JsonResponse(_job_json(job), status=202)
+
+
+def relatorio_pdf_job_status(request, pk):
+    # modo thread: um job que perdeu a thread num reinício volta à fila enquanto é consultado
+    jobs.manter_fila()
+    job = get_object_or_404(ReportJob, pk=pk)
+    return JsonResponse(_job_json(job))
+
+
+def relatorio_pdf_job_download(request, pk):
+    job = get_object_or_404(ReportJob, pk=pk)
+    if job.status != ReportJob.Status.CONCLUIDO or not job.arquivo:
+        raise Http404("Relatório ainda não disponível.")
+    return FileResponse(job.arquivo.open("rb"), as_attachment=True, filename="relatorio_convenios.pdf")
+
+
+# =========================
+# Exportação CSV (streaming)
+# =========================
+
+CSV_CHUNK_SIZE = 2000
+
+CSV_COLUNAS = (
+    ("id", "ID"),
+    ("numero_convenio", "Nº Convênio"),
+    ("orgao_concedente", "Órgão"),
+    ("parlamentar_nome", "Parlamentar"),
+    ("tipo", "Tipo"),
+    ("status", "Status"),
+    ("repasse_recebido", "Repasse recebido"),
+    ("valor_repasse", "Repasse"),
+    ("valor_contrapartida", "Contrapartida"),
+    ("vigencia_inicio", "Início"),
+    ("vigencia_fim", "Fim"),
+    ("objeto", "Objeto"),
+)
+
+
+class _Echo:
+    """Pseudo-buffer: csv.writer escreve e a linha volta direto para o StreamingHttpResponse."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_valor(v):
+    if v is None:
+        return ""
+    if isinstance(v, bool):
+        return "Sim" if v else "Não"
+    if isinstance(v, Decimal):
+        return f"{v:.2f}".replace(".", ",")
+    if hasattr(v, "strftime"):
+        return v.strftime("%d/%m/%Y")
+    return v
+
+
+def relatorio_csv(request):
+    """
+    CSV (separador ";", formato Excel pt-BR) com os convênios filtrados.
+    As linhas são geradas sob demanda a partir de um iterator(): a memória
+    não cresce com o tamanho do resultado e os primeiros bytes saem antes
+    de a query terminar de ser lida.
+    """
+    qs = _apply_filters(request, Convenio.objects.all()).order_by("-vigencia_fim", "-id")
+    campos = [c for c, _ in CSV_COLUNAS]
+    writer = csv.writer(_Echo(), delimiter=";")
+
+    def linhas():
+        yield "\ufeff"  # BOM: Excel reconhece UTF-8 (acentos)
+        yield writer.writerow([titulo for _, titulo in CSV_COLUNAS])
+        for row in qs.values_list(*campos).iterator(chunk_size=CSV_CHUNK_SIZE):
+            yield writer.writerow([_csv_valor(v) for v in row])
+
+    response = StreamingHttpResponse(linhas(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = 'attachment; filename="relatorio_convenios.csv"'
     return response